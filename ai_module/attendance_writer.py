@@ -0,0 +1,277 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from ai_module import common
+from ai_module import events
+from ai_module import db
+
+log = common.get_logger('attendance_writer')
+
+# Event kinds accepted by the writer
+ATTENDANCE = 'attendance'
+DISAPPEARED = 'disappeared'
+LAST_SEEN = 'last_seen'
+_FLUSH = 'flush'
+
+
+class AttendanceWriter:
+    """
+    Write-behind attendance logger.
+
+    The AI thread only enqueues events (never touches the disk). A dedicated
+    writer thread drains the bounded queue and commits everything that
+    arrived within `flush_interval` seconds (or `max_batch` events) in a
+    single transaction, so a class walking in at once costs one fsync
+    instead of forty.
+
+    A batch that still fails after its retries is handed to `on_dropped`
+    (the attendance / disappearance events in it), so the producer can
+    forget those sightings and log them again.
+    """
+
+    def __init__(self, db_path=None, max_queue=2000, flush_interval=0.5, max_batch=200, on_dropped=None):
+        self.db_path = db_path
+        self.on_dropped = on_dropped
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._running = False
+        self._student_ids = {}    # name -> students.id cache
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'committed_events': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+        }
+
+    # ── Lifecycle ─────────────────────────────────────
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="attendance-writer")
+        self._thread.start()
+        log.info("Attendance writer started.")
+
+    def stop(self, flush=True, timeout=5.0):
+        """Stop the writer thread, committing everything still queued if `flush`."""
+        if not self._running:
+            return
+        if flush:
+            self.flush(timeout=timeout)
+        self._running = False
+        try:
+            self._queue.put_nowait((_FLUSH, threading.Event()))  # wake the writer thread
+        except queue.Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        log.info("Attendance writer stopped.")
+
+    def flush(self, timeout=5.0):
+        """Block until every event queued before this call is committed."""
+        if not self._running:
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    # ── Producer API (non-blocking) ───────────────────
+
+    def _submit(self, event):
+        if not self._running:
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+        return True
+
+    def log_attendance(self, name, status, schedule_id=None, last_seen=None):
+        """Queue a first-sighting row. Returns False if the queue is full."""
+        return self._submit((ATTENDANCE, name, status, schedule_id, last_seen))
+
+    def log_disappearance(self, name, notes=''):
+        return self._submit((DISAPPEARED, name, notes))
+
+    def update_last_seen(self, entries):
+        """
+        Queue a presence heartbeat: [(name, schedule_id, last_seen_iso), ...].
+        All entries are applied with one executemany UPDATE.
+        """
+        return self._submit((LAST_SEEN, None, list(entries)))
+
+    # ── Metrics ───────────────────────────────────────
+
+    def metrics(self):
+        with self._stats_lock:
+            data = dict(self._stats)
+        data['queue_depth'] = self._queue.qsize()
+        data['running'] = self._running
+        return data
+
+    # ── Writer thread ─────────────────────────────────
+
+    def _connect(self):
+        # The writer thread owns one connection for its lifetime (WAL: readers never block it)
+        return db.dedicated(self.db_path or common.DB_PATH)
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while self._running or not self._queue.empty():
+                batch, waiters = self._collect()
+                if batch:
+                    self._commit(conn, batch)
+                for done in waiters:
+                    done.set()
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """Wait for the first event, then gather until the interval or batch size is hit."""
+        batch, waiters = [], []
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch, waiters
+
+        deadline = time.monotonic() + self.flush_interval
+        event = first
+        while True:
+            if event[0] == _FLUSH:
+                waiters.append(event[1])
+                break  # commit now so the flush caller can return
+            batch.append(event)
+            if len(batch) >= self.max_batch:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return batch, waiters
+
+    def _student_id(self, cursor, name):
+        if name not in self._student_ids:
+            row = cursor.execute("SELECT id FROM students WHERE name = ?", (name,)).fetchone()
+            if not row:
+                return None
+            self._student_ids[name] = row[0]
+        return self._student_ids[name]
+
+    def _commit(self, conn, batch):
+        start = time.perf_counter()
+        for attempt in range(3):
+            try:
+                rows = self._write_batch(conn, batch)
+                break
+            except sqlite3.Error as e:
+                conn.rollback()
+                self._student_ids.clear()
+                if attempt == 2:
+                    log.error(f"Attendance batch of {len(batch)} dropped: {e}")
+                    with self._stats_lock:
+                        self._stats['failed_batches'] += 1
+                    self._report_dropped(batch)
+                    return
+                time.sleep(0.2 * (attempt + 1))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['committed_events'] += len(batch)
+            self._stats['last_commit_ms'] = round(elapsed_ms, 2)
+            self._stats['max_commit_ms'] = round(max(self._stats['max_commit_ms'], elapsed_ms), 2)
+
+        if rows:
+            # One counters query per committed batch, shared by every dashboard
+            events.publish(events.ATTENDANCE, {'action': 'created', 'rows': rows})
+            events.publish_stats(conn)
+
+    def _report_dropped(self, batch):
+        lost = [event for event in batch if event[0] in (ATTENDANCE, DISAPPEARED)]
+        if lost and self.on_dropped:
+            try:
+                self.on_dropped(lost)
+            except Exception as e:
+                log.error(f"Dropped-batch callback failed: {e}")
+
+    def _write_batch(self, conn, batch):
+        cursor = conn.cursor()
+        inserts, disappeared, last_seen = [], [], {}
+
+        for event in batch:
+            kind, name = event[0], event[1]
+            if kind == LAST_SEEN:
+                # Coalesce: only the newest timestamp per session survives
+                for hb_name, schedule_id, seen in event[2]:
+                    student_id = self._student_id(cursor, hb_name)
+                    if student_id is not None:
+                        last_seen[(student_id, schedule_id)] = seen
+                continue
+
+            student_id = self._student_id(cursor, name)
+            if student_id is None:
+                log.warning(f"Unknown student '{name}', event dropped")
+                continue
+            if kind == ATTENDANCE:
+                _, _, status, schedule_id, seen = event
+                inserts.append((student_id, status, schedule_id, seen))
+                log.info(f"[ATTENDANCE] {name} → {status}")
+            elif kind == DISAPPEARED:
+                disappeared.append((student_id, event[2]))
+                log.warning(f"[DISAPPEARED] {name}")
+
+        # Ids of exactly this batch's rows: a MAX(id) watermark would also pick up
+        # rows other connections (manual marks) commit between it and the INSERTs
+        new_ids = []
+        for student_id, status, schedule_id, seen in inserts:
+            cursor.execute(
+                "INSERT INTO attendance_logs (student_id, status, source, schedule_id, last_seen) VALUES (?, ?, 'ai', ?, ?)",
+                (student_id, status, schedule_id, seen))
+            new_ids.append(cursor.lastrowid)
+        for student_id, notes in disappeared:
+            cursor.execute(
+                "INSERT INTO attendance_logs (student_id, status, source, notes) VALUES (?, 'Disappeared', 'ai', ?)",
+                (student_id, notes))
+            new_ids.append(cursor.lastrowid)
+        if last_seen:
+            cursor.executemany("""
+                UPDATE attendance_logs SET last_seen = ?
+                WHERE id = (SELECT id FROM attendance_logs
+                            WHERE student_id = ? AND source = 'ai' AND schedule_id IS ?
+                              AND status != 'Disappeared'
+                            ORDER BY id DESC LIMIT 1)
+            """, [(seen, sid, sched) for (sid, sched), seen in last_seen.items()])
+
+        rows = []
+        if new_ids:
+            # Read the new rows back (rowid lookups) for the /api/events feed
+            rows = [dict(zip(('id', 'name', 'timestamp', 'log_date', 'status', 'source', 'notes', 'schedule_id'), r))
+                    for r in cursor.execute(f"""
+                        SELECT al.id, s.name, al.timestamp, al.log_date, al.status, al.source, al.notes,
+                               al.schedule_id
+                        FROM attendance_logs al JOIN students s ON al.student_id = s.id
+                        WHERE al.id IN ({','.join('?' * len(new_ids))}) ORDER BY al.id
+                    """, new_ids)]
+        conn.commit()
+        return rows
@@ -0,0 +1,97 @@
+import math
+import time
+
+from ai_module import common
+
+log = common.get_logger('cadence')
+
+
+class CadenceController:
+    """
+    Decides which captured frames get full detection + encoding.
+
+    Between detections the tracker pool's correlation trackers carry the
+    boxes. A detection is forced early when any tracker's confidence (dlib
+    PSR) falls below `confidence_floor`, i.e. a face moved too fast or was
+    occluded. Otherwise detection runs every K frames, where K is the larger
+    of FRAME_SKIP and the interval that keeps detection within `cpu_budget`
+    of one core: K >= detect_latency / (frame_interval * cpu_budget).
+    """
+
+    def __init__(self, frame_skip=3, cpu_budget=None, max_skip=None, confidence_floor=None):
+        self.frame_skip = max(1, int(frame_skip))
+        self.cpu_budget = cpu_budget or common.DETECTION_CPU_BUDGET
+        self.max_skip = max_skip or common.MAX_FRAME_SKIP
+        self.confidence_floor = confidence_floor or common.TRACKER_CONFIDENCE_FLOOR
+
+        self.k = self.frame_skip
+        self._last_detect_seq = None
+        self._last_seq = None
+        self._last_seq_time = None
+        self.detect_latency = None   # EMA, seconds
+        self.frame_interval = None   # EMA, seconds between captured frames
+
+        self.frames = 0
+        self.detections = 0
+        self.forced = 0
+
+    def set_frame_skip(self, frame_skip):
+        self.frame_skip = max(1, int(frame_skip))
+        self._adapt()
+
+    # ── Decisions ─────────────────────────────────────
+
+    def observe_frame(self, seq, now=None):
+        """Record that capture reached frame `seq` (used to estimate the frame rate)."""
+        now = time.monotonic() if now is None else now
+        if self._last_seq is not None and seq > self._last_seq:
+            interval = (now - self._last_seq_time) / (seq - self._last_seq)
+            self.frame_interval = _ema(self.frame_interval, interval)
+        self._last_seq, self._last_seq_time = seq, now
+
+    def should_detect(self, seq, tracking_confidence=None):
+        """True if frame `seq` should get a full detection pass."""
+        self.frames += 1
+        if self._last_detect_seq is None:
+            return True
+        if tracking_confidence is not None and tracking_confidence < self.confidence_floor:
+            self.forced += 1
+            return True
+        return seq - self._last_detect_seq >= self.k
+
+    def detected(self, seq, latency):
+        """Report a finished detection pass on frame `seq` that took `latency` seconds."""
+        self._last_detect_seq = seq
+        self.detections += 1
+        self.detect_latency = _ema(self.detect_latency, latency)
+        self._adapt()
+
+    def skipped(self, seq):
+        """Frame `seq` was due for detection but a later stage (motion gate) skipped it."""
+        self._last_detect_seq = seq
+
+    def _adapt(self):
+        k = self.frame_skip
+        if self.detect_latency and self.frame_interval:
+            k = max(k, math.ceil(self.detect_latency / (self.frame_interval * self.cpu_budget)))
+        k = min(k, max(self.max_skip, self.frame_skip))
+        if k != self.k:
+            log.debug(f"Detection cadence: every {k} frames")
+        self.k = k
+
+    # ── Metrics ───────────────────────────────────────
+
+    def metrics(self):
+        return {
+            'detect_every': self.k,
+            'frame_skip': self.frame_skip,
+            'detect_ms': round(self.detect_latency * 1000, 1) if self.detect_latency else None,
+            'capture_fps': round(1.0 / self.frame_interval, 1) if self.frame_interval else None,
+            'frames': self.frames,
+            'detections': self.detections,
+            'forced_detections': self.forced,
+        }
+
+
+def _ema(previous, value, alpha=0.2):
+    return value if previous is None else previous + alpha * (value - previous)
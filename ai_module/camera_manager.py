@@ -5,6 +5,7 @@ import sys
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ai_module import common
+from ai_module import db
 
 class CameraManager:
     """
@@ -19,8 +20,7 @@ class CameraManager:
         Returns dict with 'source', 'type', 'name' or None.
         """
         try:
-            with sqlite3.connect(common.DB_PATH) as conn:
-                conn.row_factory = sqlite3.Row
+            with db.connect(row_factory=sqlite3.Row) as conn:
                 # Get the first active camera, prioritizing by ID (creation order)
                 row = conn.execute("""
                     SELECT * FROM cameras 
@@ -45,8 +45,7 @@ class CameraManager:
     def get_all_cameras():
         """List all cameras for API."""
         try:
-            with sqlite3.connect(common.DB_PATH) as conn:
-                conn.row_factory = sqlite3.Row
+            with db.connect(row_factory=sqlite3.Row) as conn:
                 rows = conn.execute("SELECT * FROM cameras ORDER BY id ASC").fetchall()
                 return [dict(r) for r in rows]
         except Exception:
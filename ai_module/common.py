@@ -3,7 +3,8 @@ import logging
 
 # ── Paths ──
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-ENCODINGS_PATH = os.path.join(PROJECT_ROOT, "ai_module", "encodings.pickle")
+ENCODINGS_PATH = os.path.join(PROJECT_ROOT, "ai_module", "encodings.pickle")  # Legacy, migrated on first start
+ENCODINGS_STORE_DIR = os.path.join(PROJECT_ROOT, "ai_module", "face_store")
 DB_PATH = os.path.join(PROJECT_ROOT, "web_app", "database", "attendance.db")
 CRASH_REPORTS_DIR = os.path.join(PROJECT_ROOT, "crash_reports")
 ENV_PATH = os.path.join(PROJECT_ROOT, ".env")
@@ -36,12 +37,48 @@ COLOR_ORANGE = (0, 165, 255)
 TOLERANCE = 0.5
 DETECTION_SCALE = 0.5
 FRAME_SKIP = 30  # Legacy
+DETECTION_CPU_BUDGET = 0.35     # Max fraction of one core spent on detection + encoding
+MAX_FRAME_SKIP = 30             # Upper bound on frames between detections
+TRACKER_CONFIDENCE_FLOOR = 7.0  # dlib tracker PSR below this forces a re-detect
+TRACKING_SCALE = 0.5            # Correlation trackers run on a frame downscaled by this factor
+TRACKER_TIMEOUT = 0.05          # Seconds a tracking round waits before reusing stale boxes
+MOTION_THRESHOLD = 25           # Grey-level change that counts as motion (0-255)
+MOTION_MIN_AREA = 0.002         # Ignore changed blobs smaller than this fraction of the frame
+MOTION_REGION_MAX = 0.5         # Changed area above this fraction → full-frame detection
+MOTION_MAX_IDLE = 10            # Seconds: force a full detection even in a static scene
+ROI_SWEEP_INTERVAL = 5          # Seconds between full-frame sweeps while in ROI mode (0 = off)
+TRACK_REVERIFY_INTERVAL = 10    # Seconds before a settled track is re-encoded anyway
+TRACK_MIN_CONFIDENCE = 0.6      # Re-encode a track whose leading identity share drops below this
 
 # ── Scheduling & Tagging ──
 LATE_THRESHOLD = 10       # Minutes after class start → "Late"
 DISAPPEAR_THRESHOLD = 15  # Minutes unseen → "Disappeared"
 RECHECK_INTERVAL = 300    # Seconds between disappearance scans (5 min)
 SYSTEM_MODE = 'auto'      # 'auto' | 'force_on' | 'force_off'
+PRESENCE_FLUSH_INTERVAL = 5   # Seconds between bulk last_seen heartbeats
+PRESENCE_MIN_DELTA = 30       # Per-student: only re-write last_seen after this many seconds
+IDLE_DETECT_INTERVAL = 2.0    # Seconds between detections outside class (faces labelled, nothing logged)
+
+# ── Database (see ai_module/db.py) ──
+DB_POOL_SIZE = 8               # Idle connections kept per database file
+DB_BUSY_TIMEOUT_MS = 5000      # Wait this long for a lock before "database is locked"
+DB_CACHE_KIB = 16384           # Page cache per connection
+DB_MMAP_BYTES = 256 * 1024 * 1024
+DB_STATEMENT_CACHE = 256       # Prepared statements kept per connection
+ATTENDANCE_PAGE_SIZE = 50      # Default rows per GET /api/attendance page
+ATTENDANCE_PAGE_MAX = 500      # Largest ?limit= a client may ask for
+
+# ── Export ──
+EXPORT_FETCH_ROWS = 2000               # Rows pulled from the cursor per fetchmany()
+EXPORT_SPOOL_BYTES = 8 * 1024 * 1024   # XLSX exports larger than this spill to disk
+
+# ── Email queue (see web_app/mail_queue.py) ──
+MAIL_WORKERS = 2               # Sender threads, each with its own SMTP session
+MAIL_MAX_ATTEMPTS = 5          # Tries per message before it is marked failed
+MAIL_BACKOFF = 30              # Seconds before the first retry; doubles per attempt
+MAIL_BACKOFF_MAX = 900
+MAIL_SESSION_IDLE = 60         # Close a sender's SMTP session after this many idle seconds
+MAIL_POLL_INTERVAL = 5         # Max seconds an idle sender sleeps between outbox checks
 
 # ── Auth ──
 SETTINGS_PIN = os.environ.get('SETTINGS_PIN', '1234')
@@ -57,6 +94,11 @@ LOG_LEVEL = logging.INFO
 VALID_STATUSES = ['On Time', 'Present', 'Late', 'Absent', 'Disappeared',
                   'Early Leave', 'Permitted', 'Excused']
 
+# Which status wins when a student has several logs for one class on one day
+# (daily_attendance_summary.best_status); higher is better
+STATUS_PRIORITY = {'On Time': 8, 'Present': 7, 'Late': 6, 'Early Leave': 5,
+                   'Excused': 4, 'Permitted': 3, 'Disappeared': 2, 'Absent': 1}
+
 # ── Setup Logger ──
 def get_logger(name='smartpresence'):
     logger = logging.getLogger(name)
@@ -0,0 +1,202 @@
+"""
+Shared SQLite connection layer for the web app and the AI modules.
+
+Every connection is opened in WAL mode with synchronous=NORMAL, a memory
+map, a larger page cache and a busy timeout, so the AI attendance writer
+and dashboard readers no longer block each other: readers see the last
+committed snapshot while the writer appends to the WAL.
+
+connect() hands out pooled connections. Closing one (or leaving its `with`
+block) rolls back anything uncommitted and returns it to a per-file LIFO
+pool instead of closing it, so requests skip the open + PRAGMA cost and
+keep each connection's prepared-statement cache warm. dedicated() opens an
+unpooled connection with the same settings for long-lived owners such as
+the writer thread.
+"""
+import os
+import sqlite3
+import threading
+from collections import deque
+
+from ai_module import common
+
+log = common.get_logger('db')
+
+
+def configure(conn):
+    """Apply the shared PRAGMAs to a freshly opened connection."""
+    conn.execute(f"PRAGMA busy_timeout = {int(common.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA journal_mode = WAL")      # Persistent; a no-op once set
+    conn.execute("PRAGMA synchronous = NORMAL")    # Safe in WAL: fsync at checkpoints only
+    conn.execute(f"PRAGMA cache_size = -{int(common.DB_CACHE_KIB)}")
+    conn.execute(f"PRAGMA mmap_size = {int(common.DB_MMAP_BYTES)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _file_id(path):
+    """(device, inode) of the database file, to notice it being replaced."""
+    try:
+        st = os.stat(path)
+        return st.st_dev, st.st_ino
+    except OSError:
+        return None
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection whose close() returns it to its pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._idle = False
+
+    def close(self):
+        if self._pool is None:
+            super().close()
+        else:
+            self._pool.release(self)
+
+    def __exit__(self, exc_type, exc, tb):
+        # Commit / roll back like sqlite3, then hand the connection back
+        result = super().__exit__(exc_type, exc, tb)
+        self.close()
+        return result
+
+
+class ConnectionPool:
+    """Idle connections to one database file, reused most-recent-first."""
+
+    def __init__(self, path, size=None):
+        self.path = path
+        self.size = size or common.DB_POOL_SIZE
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._file = _file_id(path)
+        self.closed = False
+
+        self.created = 0
+        self.reused = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.discarded = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False,
+                               timeout=common.DB_BUSY_TIMEOUT_MS / 1000.0,
+                               cached_statements=common.DB_STATEMENT_CACHE)
+        configure(conn)
+        conn._pool = self
+        if self._file is None:
+            self._file = _file_id(self.path)
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            if conn is not None:
+                self.reused += 1
+                conn._idle = False
+                return conn
+            self.created += 1
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self.in_use -= 1
+            raise
+
+    def release(self, conn):
+        if conn._idle:
+            return   # Already back in the pool (double close)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            keep = True
+        except sqlite3.Error:
+            keep = False
+        with self._lock:
+            self.in_use -= 1
+            if keep and not self.closed and len(self._idle) < self.size:
+                conn._idle = True
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        sqlite3.Connection.close(conn)
+
+    def close(self):
+        """Close every idle connection; busy ones are closed when released."""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+    def stale(self):
+        """True once the file on disk is no longer the one the pool opened."""
+        return self._file is not None and _file_id(self.path) != self._file
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_for(path):
+    path = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is not None and pool.stale():
+            # The database was replaced (restore, test fixture): never serve the old file
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def connect(path=None, row_factory=None):
+    """
+    A pooled, configured connection to `path` (default common.DB_PATH).
+    Use it as `with db.connect() as conn:` or call conn.close() when done.
+    """
+    conn = _pool_for(path or common.DB_PATH).acquire()
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    return conn
+
+
+def dedicated(path=None, **kwargs):
+    """An unpooled connection with the same PRAGMAs, for a long-lived owner."""
+    kwargs.setdefault('timeout', common.DB_BUSY_TIMEOUT_MS / 1000.0)
+    kwargs.setdefault('cached_statements', common.DB_STATEMENT_CACHE)
+    return configure(sqlite3.connect(path or common.DB_PATH, **kwargs))
+
+
+def close_all():
+    """Close every pool (shutdown, or before the database file is deleted)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def metrics():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {path: pool.metrics() for path, pool in pools.items()}
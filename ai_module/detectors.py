@@ -3,6 +3,7 @@ import face_recognition
 import numpy as np
 from abc import ABC, abstractmethod
 from ai_module import common
+from ai_module.motion_gate import merge_boxes
 
 try:
     import mediapipe as mp
@@ -14,7 +15,14 @@ except ImportError:
     HAS_MEDIAPIPE = False
 
 
+MOSAIC_GAP = 16       # Blank pixels between mosaic tiles so no window spans two crops
+
+
 class BaseDetector(ABC):
+    # True if the detector is translation-invariant and scale-preserving (HOG),
+    # so several crops can be tiled into one image and detected in one call.
+    supports_mosaic = False
+
     @abstractmethod
     def detect_faces(self, frame):
         """
@@ -26,12 +34,94 @@ class BaseDetector(ABC):
         """
         pass
 
+    def detect(self, frame, scale=1.0):
+        """
+        Detect faces in a shared Frame at `scale`, reusing its cached views.
+        Returns boxes in the coordinates of the scaled view.
+        """
+        return self.detect_faces(frame.small_bgr(scale))
+
+    def detect_regions(self, frame, regions):
+        """
+        Detect faces only inside `regions` ((top, right, bottom, left) boxes).
+        Returns boxes in FRAME coordinates.
+        """
+        crops = []
+        for top, right, bottom, left in regions:
+            crop = frame[top:bottom, left:right]
+            if crop.size:
+                crops.append((crop, top, left))
+        if not crops:
+            return []
+        if self.supports_mosaic and len(crops) > 1:
+            return self._detect_mosaic(crops)
+
+        boxes = []
+        for crop, top, left in crops:
+            for t, r, b, l in self.detect_faces(crop):
+                boxes.append((t + top, r + left, b + top, l + left))
+        return boxes
+
+    def detect_rois(self, frame, tracks, pad=0.5):
+        """
+        ROI mode: detect only in padded crops around known face boxes
+        (e.g. current tracker positions). Overlapping crops are merged.
+        """
+        h, w = frame.shape[:2]
+        regions = []
+        for top, right, bottom, left in tracks:
+            ph, pw = int((bottom - top) * pad), int((right - left) * pad)
+            regions.append((max(0, top - ph), min(w, right + pw), min(h, bottom + ph), max(0, left - pw)))
+        return self.detect_regions(frame, merge_boxes(regions))
+
+    def _detect_mosaic(self, crops):
+        """Tile crops on shelves into one image, detect once, map boxes back."""
+        crops = sorted(crops, key=lambda c: c[0].shape[0], reverse=True)
+        total = sum(c[0].shape[0] * c[0].shape[1] for c in crops)
+        width = max(max(c[0].shape[1] for c in crops), int(np.sqrt(total) * 1.5))
+
+        placed, x, y, shelf = [], 0, 0, 0
+        for crop, top, left in crops:
+            ch, cw = crop.shape[:2]
+            if x and x + cw > width:
+                x, y, shelf = 0, y + shelf + MOSAIC_GAP, 0
+            placed.append((crop, top, left, y, x))
+            x += cw + MOSAIC_GAP
+            shelf = max(shelf, ch)
+
+        mosaic = np.zeros((y + shelf, width, 3), dtype=crops[0][0].dtype)
+        for crop, _, _, my, mx in placed:
+            mosaic[my:my + crop.shape[0], mx:mx + crop.shape[1]] = crop
+
+        boxes = []
+        for t, r, b, l in self.detect_faces(mosaic):
+            cy, cx = (t + b) // 2, (l + r) // 2
+            for crop, top, left, my, mx in placed:
+                ch, cw = crop.shape[:2]
+                if my <= cy < my + ch and mx <= cx < mx + cw:
+                    # Clip to the tile, then shift back into frame coordinates
+                    boxes.append((max(t, my) - my + top, min(r, mx + cw) - mx + left,
+                                  min(b, my + ch) - my + top, max(l, mx) - mx + left))
+                    break
+        return boxes
+
+
 class DlibDetector(BaseDetector):
+    supports_mosaic = True
+
     def detect_faces(self, frame):
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         return face_recognition.face_locations(rgb_frame, model="hog")
 
+    def detect(self, frame, scale=1.0):
+        # The RGB view is shared with the encoder, so no second conversion
+        return face_recognition.face_locations(frame.small_rgb(scale), model="hog")
+
 class MediaPipeDetector(BaseDetector):
+    # The short-range model rescales its input to 128x128, so a mosaic would
+    # shrink every face; crops are detected one by one instead.
+    supports_mosaic = False
+
     def __init__(self):
         if not HAS_MEDIAPIPE:
             raise ImportError("MediaPipe not installed.")
@@ -43,13 +133,18 @@ class MediaPipeDetector(BaseDetector):
         )
     
     def detect_faces(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self._detect_rgb(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def detect(self, frame, scale=1.0):
+        return self._detect_rgb(frame.small_rgb(scale))
+
+    def _detect_rgb(self, rgb_frame):
         results = self.detector.process(rgb_frame)
         
         if not results.detections:
             return []
             
-        h, w, _ = frame.shape
+        h, w, _ = rgb_frame.shape
         boxes = []
         for detection in results.detections:
             bboxC = detection.location_data.relative_bounding_box
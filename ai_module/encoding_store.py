@@ -0,0 +1,317 @@
+"""
+SmartPresence — Binary Face Encoding Store
+
+Replaces encodings.pickle with a versioned directory:
+
+  header.json   → {"format", "version", "dim", "dtype", "count", "names_bytes", "deleted"}
+  vectors.f32   → raw little-endian float32 rows, `count` x `dim`, opened with np.memmap
+  names.jsonl   → one {"name": ...} record per row, in row order
+
+`count` and `names_bytes` in the header are the commit point: anything past
+them in the data files is a torn write and is ignored by readers and
+truncated by the next writer. The header itself is replaced atomically.
+Writers in any process serialise on an OS lock of `.lock` in the store dir.
+
+compact() writes the three files into a fresh `gen-NNNNNN/` directory and
+switches to it by atomically replacing the `CURRENT` pointer file, so a
+reader or a crash never sees a header from one generation over data from
+another. Without `CURRENT` the files live in the store dir itself.
+"""
+import os
+import sys
+import json
+import pickle
+import shutil
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_module import common
+
+log = common.get_logger('encoding_store')
+
+FORMAT_NAME = 'smartpresence-encodings'
+FORMAT_VERSION = 1
+DTYPE = '<f4'
+
+HEADER_FILE = 'header.json'
+VECTORS_FILE = 'vectors.f32'
+NAMES_FILE = 'names.jsonl'
+LOCK_FILE = '.lock'
+CURRENT_FILE = 'CURRENT'     # Names the generation directory written by compact()
+GENERATION_PREFIX = 'gen-'
+
+
+class EncodingStoreError(Exception):
+    pass
+
+
+class EncodingStore:
+    """
+    Append-only, memory-mapped store of enrolled face encodings.
+
+    Readers map the vector file copy-on-write, so startup does no parsing
+    and several processes share the same page cache. Writers append a row
+    and a name record, fsync, then atomically bump the header: O(1) per
+    enrollment instead of rewriting the whole gallery.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or common.ENCODINGS_STORE_DIR
+
+    # ── Files ─────────────────────────────────────────
+
+    def _data_dir(self):
+        """Directory holding the live data files (the current generation)."""
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), 'r', encoding='utf-8') as f:
+                return os.path.join(self.path, f.read().strip())
+        except FileNotFoundError:
+            return self.path
+
+    def _file(self, name, base=None):
+        return os.path.join(base or self._data_dir(), name)
+
+    def exists(self):
+        return os.path.exists(self._file(HEADER_FILE))
+
+    @contextmanager
+    def _locked(self):
+        """
+        Exclusive write lock, held across the whole read-header → write →
+        header-bump sequence. An OS file lock, so it also excludes writers in
+        other processes (enroll_student.py next to the web app).
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def read_header(self, base=None):
+        with open(self._file(HEADER_FILE, base), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('format') != FORMAT_NAME:
+            raise EncodingStoreError(f"Not an encoding store: {self.path}")
+        if header.get('version', 0) > FORMAT_VERSION:
+            raise EncodingStoreError(f"Store version {header['version']} is newer than supported ({FORMAT_VERSION})")
+        return header
+
+    @staticmethod
+    def _replace(path, text):
+        """Atomic file replace: write temp file, fsync, rename over the old one."""
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _write_header(self, header, base=None):
+        self._replace(self._file(HEADER_FILE, base), json.dumps(header))
+
+    def create(self, dim=128):
+        """Initialise an empty store (no-op if one already exists)."""
+        with self._locked():
+            if not self.exists():
+                self._init_files(self.path, dim)
+
+    def _init_files(self, base, dim):
+        os.makedirs(base, exist_ok=True)
+        for name in (VECTORS_FILE, NAMES_FILE):
+            open(self._file(name, base), 'wb').close()
+        self._write_header({
+            'format': FORMAT_NAME, 'version': FORMAT_VERSION,
+            'dim': dim, 'dtype': DTYPE,
+            'count': 0, 'names_bytes': 0, 'deleted': [],
+        }, base)
+
+    # ── Read ──────────────────────────────────────────
+
+    def load(self):
+        """
+        Return {"names": [...], "encodings": (N x dim) float32 array}.
+        Deleted rows are filtered out. With no deletions the array is the
+        copy-on-write memmap itself, so nothing is copied at startup.
+        """
+        for attempt in range(3):
+            base = self._data_dir()
+            if not os.path.exists(self._file(HEADER_FILE, base)):
+                return {"names": [], "encodings": np.zeros((0, 128), dtype=np.float32)}
+            try:
+                return self._load(base)
+            except FileNotFoundError:
+                if attempt == 2:   # compact() retired this generation under us: read the new one
+                    raise
+
+    def _load(self, base):
+        header = self.read_header(base)
+        count, dim = header['count'], header['dim']
+
+        with open(self._file(NAMES_FILE, base), 'rb') as f:
+            raw = f.read(header['names_bytes'])
+        names = [json.loads(line)['name'] for line in raw.decode('utf-8').splitlines()[:count]]
+
+        if count == 0:
+            matrix = np.zeros((0, dim), dtype=np.float32)
+        else:
+            matrix = np.memmap(self._file(VECTORS_FILE, base), dtype=header['dtype'],
+                               mode='c', shape=(count, dim))
+
+        deleted = set(header.get('deleted', []))
+        if deleted:
+            keep = [i for i in range(count) if i not in deleted]
+            matrix = np.ascontiguousarray(matrix[keep])
+            names = [names[i] for i in keep]
+        return {"names": names, "encodings": matrix}
+
+    # ── Write ─────────────────────────────────────────
+
+    def append(self, name, encoding):
+        """Append one enrollment. Returns its row index."""
+        return self.extend([name], [encoding])[0]
+
+    def extend(self, names, encodings):
+        """Append several enrollments in one commit. Returns their row indices."""
+        block = np.asarray(encodings, dtype=DTYPE)
+        with self._locked():
+            if not self.exists():
+                self._init_files(self.path, block.shape[-1] if block.ndim == 2 else 128)
+            return self._append(self._data_dir(), names, block)
+
+    def _append(self, base, names, block):
+        header = self.read_header(base)
+        dim, count = header['dim'], header['count']
+        block = block.reshape(-1, dim)
+        if len(block) != len(names):
+            raise EncodingStoreError("names and encodings length mismatch")
+
+        row_bytes = dim * np.dtype(DTYPE).itemsize
+        with open(self._file(VECTORS_FILE, base), 'r+b') as f:
+            f.truncate(count * row_bytes)     # drop any torn tail
+            f.seek(count * row_bytes)
+            f.write(block.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        records = ''.join(json.dumps({'name': n}) + '\n' for n in names).encode('utf-8')
+        with open(self._file(NAMES_FILE, base), 'r+b') as f:
+            f.truncate(header['names_bytes'])
+            f.seek(header['names_bytes'])
+            f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+
+        header['count'] = count + len(block)
+        header['names_bytes'] += len(records)
+        self._write_header(header, base)
+        return list(range(count, count + len(block)))
+
+    def remove(self, name):
+        """Tombstone every row enrolled under `name`. Returns the number removed."""
+        with self._locked():
+            if not self.exists():
+                return 0
+            base = self._data_dir()
+            header = self.read_header(base)
+            with open(self._file(NAMES_FILE, base), 'rb') as f:
+                raw = f.read(header['names_bytes'])
+            deleted = set(header.get('deleted', []))
+            rows = [i for i, line in enumerate(raw.decode('utf-8').splitlines()[:header['count']])
+                    if json.loads(line)['name'] == name and i not in deleted]
+            if rows:
+                header['deleted'] = sorted(deleted.union(rows))
+                self._write_header(header, base)
+            return len(rows)
+
+    def compact(self):
+        """
+        Rewrite the store without tombstoned rows into a new generation
+        directory, then switch CURRENT to it in one atomic rename.
+        """
+        with self._locked():
+            if not self.exists():
+                return
+            old = self._data_dir()
+            data = self._load(old)
+            number = int(os.path.basename(old)[len(GENERATION_PREFIX):]) if old != self.path else 0
+            generation = f"{GENERATION_PREFIX}{number + 1:06d}"
+            new = os.path.join(self.path, generation)
+            shutil.rmtree(new, ignore_errors=True)     # Left by a compaction that crashed
+            self._init_files(new, self.read_header(old)['dim'])
+            if data['names']:
+                self._append(new, data['names'], np.asarray(data['encodings'], dtype=DTYPE))
+            self._replace(os.path.join(self.path, CURRENT_FILE), generation)
+
+            # Retire older generations (readers that mapped them keep their pages)
+            if old == self.path:
+                for name in (HEADER_FILE, VECTORS_FILE, NAMES_FILE):
+                    try:
+                        os.remove(self._file(name, old))
+                    except OSError:
+                        pass    # Still mapped (Windows): ignored now that CURRENT exists
+            for entry in os.listdir(self.path):
+                if entry.startswith(GENERATION_PREFIX) and entry != generation:
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+
+# ── Legacy pickle migration ─────────────────────────
+
+def migrate_from_pickle(pickle_path=None, store=None):
+    """
+    One-shot migration of encodings.pickle into the binary store.
+    The pickle is renamed to *.migrated afterwards so it is never re-imported.
+    Returns the number of encodings migrated (0 if there was nothing to do).
+    """
+    pickle_path = pickle_path or common.ENCODINGS_PATH
+    store = store or EncodingStore()
+    if not os.path.exists(pickle_path):
+        return 0
+    if store.exists():
+        log.warning(f"Store already exists at {store.path}; leaving {pickle_path} untouched")
+        return 0
+
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+    names = list(data.get('names', [])) if isinstance(data, dict) else []
+    encodings = list(data.get('encodings', [])) if isinstance(data, dict) else []
+    n = min(len(names), len(encodings))
+
+    store.create()
+    if n:
+        store.extend(names[:n], encodings[:n])
+    os.replace(pickle_path, pickle_path + '.migrated')
+    log.info(f"Migrated {n} encodings from {pickle_path} to {store.path}")
+    return n
+
+
+def open_store(path=None):
+    """Return the default store, migrating a legacy pickle on first use."""
+    store = EncodingStore(path)
+    if not store.exists() and path is None:
+        try:
+            migrate_from_pickle(store=store)
+        except Exception as e:
+            log.error(f"Pickle migration failed: {e}")
+    return store
+
+
+if __name__ == "__main__":
+    count = migrate_from_pickle()
+    print(f"[INFO] Migrated {count} encodings to {EncodingStore().path}")
@@ -1,31 +1,12 @@
 import cv2
 import face_recognition
-import pickle
 import os
 import sys
 
 # Add project root to path to import common
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ai_module import common
-
-def load_encodings():
-    if os.path.exists(common.ENCODINGS_PATH):
-        try:
-            with open(common.ENCODINGS_PATH, "rb") as f:
-                data = pickle.load(f)
-            return data
-        except Exception as e:
-            print(f"[ERROR] Could not load encodings: {e}")
-            return {"names": [], "encodings": []}
-    return {"names": [], "encodings": []}
-
-def save_encodings(data):
-    try:
-        with open(common.ENCODINGS_PATH, "wb") as f:
-            pickle.dump(data, f)
-        print(f"[INFO] Encodings saved to {common.ENCODINGS_PATH}")
-    except Exception as e:
-        print(f"[ERROR] Could not save encodings: {e}")
+from ai_module.encoding_store import open_store
 
 def enroll_student():
     print("[INFO] Starting Webcam...")
@@ -90,12 +71,12 @@ def enroll_student():
                 name = input("Enter Student Name: ").strip()
                 
                 if name:
-                    # 4. Save to Pickle
-                    data = load_encodings()
-                    data["names"].append(name)
-                    data["encodings"].append(new_encoding)
-                    save_encodings(data)
-                    print(f"[SUCCESS] Enrolled {name}!")
+                    # 4. Append to the encoding store
+                    try:
+                        open_store().append(name, new_encoding)
+                        print(f"[SUCCESS] Enrolled {name}!")
+                    except Exception as e:
+                        print(f"[ERROR] Could not save encoding: {e}")
                 else:
                     print("[INFO] Enrollment cancelled (empty name).")
             else:
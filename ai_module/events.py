@@ -0,0 +1,190 @@
+"""
+In-process event bus behind the /api/events Server-Sent Events stream.
+
+Producers (attendance writer, AI loop, API handlers) publish small deltas —
+new attendance rows, AI status changes, schedule edits, dashboard counters.
+Every browser tab holds one SSE connection and waits on a shared Condition
+instead of polling /api/stats, /api/attendance and /api/system/status, so
+the counters are queried once per change rather than once per client per
+poll.
+
+Recent events are kept in a bounded ring so a reconnecting client can
+resume from its Last-Event-ID; if it fell further behind than the ring
+reaches it gets a `reset` event and reloads. The newest `status` and
+`stats` payloads are also kept so a fresh client starts from current state.
+"""
+import itertools
+import json
+import threading
+from collections import deque, namedtuple
+from datetime import datetime
+
+from ai_module import common
+
+log = common.get_logger('events')
+
+# Event kinds
+ATTENDANCE = 'attendance'   # {'action': 'created'|'updated'|'deleted', 'rows'|'row'|'id': ...}
+STATUS = 'status'           # {'ai_running', 'system_mode', 'active_schedule'}
+SCHEDULE = 'schedule'       # {'action': 'created'|'updated'|'deleted', 'id': ...}
+STATS = 'stats'             # Dashboard counters, see stats_snapshot()
+RESET = 'reset'             # Client missed events: reload everything
+
+SNAPSHOT_KINDS = (STATUS, STATS)   # Replayed to new subscribers
+HISTORY = 256                      # Events kept for Last-Event-ID resume
+KEEPALIVE = 15                     # Seconds between SSE comment pings
+
+Event = namedtuple('Event', ['id', 'kind', 'data'])
+
+PRESENT_STATUSES = ('Present', 'On Time', 'Late')
+
+
+class EventBus:
+    """Ring buffer of recent events plus a Condition subscribers block on."""
+
+    def __init__(self, history=HISTORY):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._latest = {}          # kind -> newest Event, for SNAPSHOT_KINDS
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._generation = 0       # Bumped by close() to wake every stream
+
+        self.published = 0
+        self.subscribers = 0
+
+    # ── Producer ──────────────────────────────────────
+
+    def publish(self, kind, data):
+        """Append an event and wake all subscribers. Never blocks on clients."""
+        with self._cond:
+            event = Event(next(self._ids), kind, data)
+            self._events.append(event)
+            if kind in SNAPSHOT_KINDS:
+                self._latest[kind] = event
+            self._last_id = event.id
+            self.published += 1
+            self._cond.notify_all()
+        return event.id
+
+    def close(self):
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+
+    # ── Consumers ─────────────────────────────────────
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def latest(self, kind):
+        event = self._latest.get(kind)
+        return event.data if event else None
+
+    def since(self, last_id):
+        """
+        Events newer than `last_id`, oldest first. Returns None when
+        `last_id` has already fallen out of the ring (the caller missed
+        events and must resync).
+        """
+        with self._cond:
+            return self._since(last_id)
+
+    def _since(self, last_id):
+        if last_id >= self._last_id:
+            return []
+        if not self._events or self._events[0].id > last_id + 1:
+            return None
+        return [e for e in self._events if e.id > last_id]
+
+    def wait(self, last_id, timeout=KEEPALIVE):
+        """Block until there is something newer than `last_id` (or timeout / close)."""
+        with self._cond:
+            generation = self._generation
+            self._cond.wait_for(lambda: self._last_id > last_id or self._generation != generation, timeout)
+            return self._since(last_id)
+
+    def stream(self, last_id=None, is_running=lambda: True, keepalive=KEEPALIVE):
+        """
+        SSE text generator for one client. Without `last_id` the client gets
+        the current status/stats snapshots first; with it, everything it
+        missed (or a `reset` if that is no longer available).
+        """
+        with self._cond:
+            self.subscribers += 1
+            head = self._last_id
+            if last_id is None:
+                backlog = sorted(self._latest.values())
+            else:
+                backlog = self._since(last_id)
+        try:
+            yield "retry: 3000\n\n"
+            if backlog is None:
+                yield format_event(Event(head, RESET, {}))
+            else:
+                for event in backlog:
+                    yield format_event(event)
+            last_id = head
+            while is_running():
+                events = self.wait(last_id, keepalive)
+                if events is None:
+                    last_id = self._last_id
+                    yield format_event(Event(last_id, RESET, {}))
+                elif events:
+                    last_id = events[-1].id
+                    yield ''.join(format_event(e) for e in events)
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def metrics(self):
+        return {
+            'subscribers': self.subscribers,
+            'published': self.published,
+            'last_id': self._last_id,
+        }
+
+
+def format_event(event):
+    """One SSE frame: id, event name and a single-line JSON payload."""
+    payload = json.dumps(event.data, default=str, separators=(',', ':'))
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {payload}\n\n"
+
+
+def stats_snapshot(conn):
+    """Dashboard counters (the /api/stats payload) from an open connection."""
+    today = datetime.now().strftime('%Y-%m-%d')
+    total_students = conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+    present_today = conn.execute("""
+        SELECT COUNT(DISTINCT student_id) FROM daily_attendance_summary
+        WHERE date = ? AND best_status IN ({})
+    """.format(','.join('?' * len(PRESENT_STATUSES))), (today, *PRESENT_STATUSES)).fetchone()[0]
+    total_logs = conn.execute("SELECT COUNT(*) FROM attendance_logs").fetchone()[0]
+    return {
+        "total_students": total_students,
+        "present_today": present_today,
+        "absent_today": total_students - present_today,
+        "total_logs": total_logs,
+        "date": today
+    }
+
+
+# ── Module-level bus ──────────────────────────────────
+
+bus = EventBus()
+
+
+def publish(kind, data):
+    return bus.publish(kind, data)
+
+
+def publish_stats(conn):
+    """Recompute the counters once and push them to every subscriber."""
+    try:
+        return bus.publish(STATS, stats_snapshot(conn))
+    except Exception as e:
+        log.warning(f"Stats refresh failed: {e}")
+        return None
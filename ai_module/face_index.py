@@ -0,0 +1,184 @@
+"""
+Pluggable nearest-neighbour indexes over enrolled face encodings.
+
+  exact → GalleryMatcher, one brute-force (M x N) scan (default for small galleries)
+  ivf   → IVFIndex, k-means coarse quantiser + exact re-ranking of the probed lists
+
+Both expose the same interface: add / extend / remove / match / name_of / len().
+"""
+import threading
+import numpy as np
+
+from ai_module import common
+from ai_module.gallery import (GalleryMatcher, Match, ENCODING_DIM,
+                               as_probes, pairwise_distances, best_matches)
+from ai_module.settings import SettingsManager
+
+log = common.get_logger('face_index')
+
+INDEX_KINDS = ('auto', 'exact', 'ivf')
+IVF_MIN_SIZE = 5000        # 'auto' switches to IVF from this many encodings
+KMEANS_SAMPLE = 20000      # Rows used to train the coarse quantiser
+KMEANS_ITERATIONS = 10
+
+
+def _kmeans(data, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd's k-means on float32 rows. Returns (k x dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    data_sq = np.einsum('ij,ij->i', data, data)
+    for _ in range(iterations):
+        assign = _nearest(data, data_sq, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random points so every list is used
+        if not filled.all():
+            centroids[~filled] = data[rng.choice(len(data), size=int((~filled).sum()))]
+    return centroids
+
+
+def _nearest(data, data_sq, centroids, chunk=8192):
+    """Index of the closest centroid for every row, computed in chunks."""
+    c_sq = np.einsum('ij,ij->i', centroids, centroids)
+    out = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), chunk):
+        block = data[start:start + chunk]
+        d2 = data_sq[start:start + chunk, None] + c_sq[None, :] - 2.0 * (block @ centroids.T)
+        out[start:start + chunk] = np.argmin(d2, axis=1)
+    return out
+
+
+class IVFIndex:
+    """
+    Inverted-file index written in NumPy.
+
+    Rows live in a GalleryMatcher (stable row ids, tombstoned deletes); the
+    index only adds a coarse quantiser on top. A probe is compared against its
+    `nprobe` closest centroids and then exactly against the rows in those
+    lists, so cost is O(C + nprobe * N/C) instead of O(N). C defaults to
+    2·√N, which keeps a 100k gallery well under a millisecond per face.
+    """
+
+    def __init__(self, encodings=None, names=None, nlist=None, nprobe=8, dim=ENCODING_DIM):
+        self.dim = dim
+        self.store = GalleryMatcher(encodings, names, dim=dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._centroids = None
+        self._lists = []
+        self._trained_size = 0
+        self.train()
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def names(self):
+        return self.store.names
+
+    def name_of(self, index):
+        return self.store.name_of(index)
+
+    # ── Training ──────────────────────────────────────
+
+    def train(self):
+        """(Re)build the coarse quantiser and inverted lists from the live rows."""
+        matrix, sq_norms, _ = self.store._snapshot()
+        live = np.flatnonzero(np.isfinite(sq_norms))
+        if len(live) < 2:
+            with self._lock:
+                self._centroids, self._lists, self._trained_size = None, [], len(live)
+            return
+
+        k = self.nlist or max(1, int(2 * np.sqrt(len(live))))
+        k = min(k, len(live))
+        rng = np.random.default_rng(0)
+        sample = live if len(live) <= KMEANS_SAMPLE else rng.choice(live, KMEANS_SAMPLE, replace=False)
+        centroids = _kmeans(matrix[sample], k)
+
+        assign = _nearest(matrix[live], sq_norms[live], centroids)
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(k + 1))
+        lists = []
+        for c in range(k):
+            ids = live[order[bounds[c]:bounds[c + 1]]]
+            lists.append((ids, matrix[ids]))
+
+        with self._lock:
+            self._centroids, self._lists, self._trained_size = centroids, lists, len(live)
+        log.info(f"IVF index trained: {len(live)} encodings, {k} lists, nprobe={self.nprobe}")
+
+    # ── Mutation ──────────────────────────────────────
+
+    def extend(self, names, encodings):
+        start = self.store._count
+        self.store.extend(names, encodings)
+        new_ids = np.arange(start, self.store._count)
+        if not len(new_ids):
+            return
+
+        if self._centroids is None or len(self.store) > 2 * max(self._trained_size, 1):
+            # Gallery doubled since training: cluster shape is stale, retrain.
+            self.train()
+            return
+
+        matrix, sq_norms, _ = self.store._snapshot()
+        assign = _nearest(matrix[new_ids], sq_norms[new_ids], self._centroids)
+        with self._lock:
+            for c in np.unique(assign):
+                ids, vecs = self._lists[c]
+                added = new_ids[assign == c]
+                self._lists[c] = (np.concatenate([ids, added]), np.concatenate([vecs, matrix[added]]))
+
+    def add(self, name, encoding):
+        self.extend([name], [encoding])
+
+    def remove(self, name):
+        # Tombstoned rows stay in their list but can never win; train() drops them.
+        return self.store.remove(name)
+
+    # ── Matching ──────────────────────────────────────
+
+    def match(self, encodings, exact=False):
+        probes = as_probes(encodings, self.dim)
+        with self._lock:
+            centroids, lists = self._centroids, list(self._lists)
+        if exact or centroids is None:
+            return self.store.match(probes)
+
+        _, sq_norms, labels = self.store._snapshot()
+        nprobe = min(self.nprobe, len(centroids))
+        c_dist = pairwise_distances(probes, centroids, np.einsum('ij,ij->i', centroids, centroids))
+        probed = np.argpartition(c_dist, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for probe, cells in zip(probes, probed):
+            # Score each probed list in place (contiguous copy per list), so
+            # no large gather of candidate rows is needed.
+            ids = np.concatenate([lists[c][0] for c in cells])
+            if not len(ids):
+                results.append(Match(-1, float('inf'), float('inf')))
+                continue
+            dots = np.concatenate([lists[c][1] @ probe for c in cells])
+            d2 = float(probe @ probe) + sq_norms[ids] - 2.0 * dots
+            dist = np.sqrt(np.maximum(d2, 0.0))[None, :]
+            m = best_matches(dist, labels[ids])[0]
+            results.append(m._replace(index=int(ids[m.index])) if m.index >= 0 else m)
+        return results
+
+
+def build_index(encodings, names, kind=None):
+    """Create the index selected by the MATCH_INDEX setting ('auto' | 'exact' | 'ivf')."""
+    if kind is None:
+        kind = SettingsManager.get('MATCH_INDEX', default='auto')
+    if kind not in INDEX_KINDS:
+        log.warning(f"Unknown MATCH_INDEX '{kind}', falling back to exact matching")
+        kind = 'exact'
+
+    if kind == 'ivf' or (kind == 'auto' and len(encodings) >= IVF_MIN_SIZE):
+        return IVFIndex(encodings, names)
+    return GalleryMatcher(encodings, names)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import cv2
+
+
+class Frame:
+    """
+    One captured camera frame, shared read-only by every pipeline stage.
+
+    The BGR pixels are marked non-writeable, so the capture thread, AI loop,
+    tracker pool and motion gate can all hold a reference to the same array
+    instead of copying it; the last reference dropped frees it. Derived views
+    (downscaled BGR/RGB, grey) are computed lazily, at most once per frame,
+    and cached on the frame so every stage that needs the same view shares it.
+    """
+
+    __slots__ = ('seq', 'timestamp', '_bgr', '_views', '_lock')
+
+    def __init__(self, bgr, seq=0, timestamp=None):
+        bgr.flags.writeable = False
+        self._bgr = bgr
+        self.seq = seq
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._views = {}
+        self._lock = threading.RLock()   # Views build on other views
+
+    @property
+    def bgr(self):
+        return self._bgr
+
+    @property
+    def shape(self):
+        return self._bgr.shape
+
+    def _view(self, key, build):
+        view = self._views.get(key)
+        if view is not None:
+            return view
+        with self._lock:
+            view = self._views.get(key)
+            if view is None:
+                view = build()
+                view.flags.writeable = False
+                self._views[key] = view
+        return view
+
+    # ── Derived views ─────────────────────────────────
+
+    def small_bgr(self, scale):
+        if scale == 1.0:
+            return self._bgr
+        return self._view(('bgr', scale), lambda: cv2.resize(self._bgr, (0, 0), fx=scale, fy=scale))
+
+    def small_rgb(self, scale):
+        # Resize first, then convert: the colour pass touches scale² of the pixels
+        return self._view(('rgb', scale), lambda: cv2.cvtColor(self.small_bgr(scale), cv2.COLOR_BGR2RGB))
+
+    def gray(self, scale=1.0):
+        return self._view(('gray', scale), lambda: cv2.cvtColor(self.small_bgr(scale), cv2.COLOR_BGR2GRAY))
+
+    def annotated(self):
+        """Writeable copy for drawing overlays (the only full-frame copy per frame)."""
+        return self._bgr.copy()
@@ -0,0 +1,169 @@
+import threading
+import numpy as np
+from collections import namedtuple
+
+# Result of matching one probe face against the gallery.
+#   index    → row of the closest enrolled encoding (-1 if the gallery is empty)
+#   distance → Euclidean distance to that row (same metric as face_recognition.face_distance)
+#   margin   → distance gap to the closest encoding of a *different* student (inf if none)
+Match = namedtuple('Match', ['index', 'distance', 'margin'])
+
+ENCODING_DIM = 128
+
+
+class GalleryMatcher:
+    """
+    Enrolled face encodings held as one contiguous float32 matrix.
+
+    Squared norms are precomputed once per row, so matching M faces against
+    N enrolled encodings is a single (M x N) matrix product instead of
+    M separate list → array conversions inside face_recognition.
+    """
+
+    def __init__(self, encodings=None, names=None, dim=ENCODING_DIM):
+        self.dim = dim
+        self.names = []
+        self._label_of = {}          # name -> integer label
+        self._labels = np.zeros(0, dtype=np.int32)
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._count = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+        names = [] if names is None else list(names)
+        if isinstance(encodings, np.ndarray) and encodings.ndim == 2 and encodings.dtype == np.float32:
+            self._adopt(encodings[:len(names)], names)
+        elif encodings is not None and len(encodings):
+            encodings = list(encodings)
+            self.extend(names[:len(encodings)], encodings[:len(names)])
+
+    def __len__(self):
+        return self._active
+
+    # ── Mutation ──────────────────────────────────────
+
+    def _reserve(self, needed):
+        """Grow backing arrays geometrically so appends stay amortised O(1)."""
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_cap = max(needed, capacity * 2, 64)
+        matrix = np.zeros((new_cap, self.dim), dtype=np.float32)
+        matrix[:self._count] = self._matrix[:self._count]
+        sq_norms = np.zeros(new_cap, dtype=np.float32)
+        sq_norms[:self._count] = self._sq_norms[:self._count]
+        labels = np.zeros(new_cap, dtype=np.int32)
+        labels[:self._count] = self._labels[:self._count]
+        self._matrix, self._sq_norms, self._labels = matrix, sq_norms, labels
+
+    def _adopt(self, matrix, names):
+        """
+        Use an existing float32 matrix (e.g. the encoding store's memmap) as
+        backing storage without copying it; the first append reallocates.
+        """
+        self._matrix = matrix
+        self._sq_norms = np.einsum('ij,ij->i', matrix, matrix).astype(np.float32)
+        self._labels = np.array([self._label(n) for n in names[:len(matrix)]], dtype=np.int32)
+        self.names = list(names[:len(matrix)])
+        self._count = self._active = len(matrix)
+
+    def _label(self, name):
+        if name not in self._label_of:
+            self._label_of[name] = len(self._label_of)
+        return self._label_of[name]
+
+    def extend(self, names, encodings):
+        """Append several (name, encoding) pairs in one copy."""
+        if not len(encodings):
+            return
+        block = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            start = self._count
+            self._reserve(start + len(block))
+            self._matrix[start:start + len(block)] = block
+            self._sq_norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+            self._labels[start:start + len(block)] = [self._label(n) for n in names]
+            self.names.extend(names)
+            self._count = start + len(block)
+            self._active += len(block)
+
+    def add(self, name, encoding):
+        """Append a single newly enrolled face."""
+        self.extend([name], [encoding])
+
+    def remove(self, name):
+        """
+        Tombstone every encoding of a student. Row indices stay stable, the
+        rows just become infinitely far away. Returns the number removed.
+        """
+        with self._lock:
+            label = self._label_of.pop(name, None)
+            if label is None:
+                return 0
+            rows = np.flatnonzero((self._labels[:self._count] == label)
+                                  & np.isfinite(self._sq_norms[:self._count]))
+            self._matrix[rows] = 0.0
+            self._sq_norms[rows] = np.inf
+            self._active -= len(rows)
+            return len(rows)
+
+    # ── Matching ──────────────────────────────────────
+
+    def _snapshot(self):
+        with self._lock:
+            n = self._count
+            return self._matrix[:n], self._sq_norms[:n], self._labels[:n]
+
+    def distances(self, encodings):
+        """Return an (M x N) float32 matrix of Euclidean distances."""
+        matrix, sq_norms, _ = self._snapshot()
+        return pairwise_distances(as_probes(encodings, self.dim), matrix, sq_norms)
+
+    def match(self, encodings):
+        """
+        Match every probe face of a frame in one batched computation.
+        Returns a list of Match tuples, one per probe, in input order.
+        """
+        matrix, sq_norms, labels = self._snapshot()
+        dist = pairwise_distances(as_probes(encodings, self.dim), matrix, sq_norms)
+        return best_matches(dist, labels)
+
+    def name_of(self, index):
+        return self.names[index] if 0 <= index < len(self.names) else "Unknown"
+
+
+def as_probes(encodings, dim=ENCODING_DIM):
+    return np.asarray(encodings, dtype=np.float32).reshape(-1, dim)
+
+
+def pairwise_distances(probes, matrix, sq_norms):
+    """Euclidean distances via |a|² + |b|² − 2a·b, using precomputed row norms."""
+    if not len(matrix) or not len(probes):
+        return np.zeros((len(probes), len(matrix)), dtype=np.float32)
+    probe_sq = np.einsum('ij,ij->i', probes, probes)
+    d2 = probe_sq[:, None] + sq_norms[None, :] - 2.0 * (probes @ matrix.T)
+    np.maximum(d2, 0.0, out=d2)
+    return np.sqrt(d2, out=d2)
+
+
+def best_matches(dist, labels):
+    """Reduce an (M x N) distance matrix to one Match per row."""
+    if dist.shape[0] == 0:
+        return []
+    if dist.shape[1] == 0:
+        return [Match(-1, float('inf'), float('inf'))] * dist.shape[0]
+
+    rows = np.arange(dist.shape[0])
+    best = np.argmin(dist, axis=1)
+    best_dist = dist[rows, best]
+
+    # Runner-up must belong to a different student, otherwise several
+    # enrollment photos of the same person would look "ambiguous".
+    others = np.where(labels[None, :] == labels[best][:, None], np.inf, dist)
+    runner_up = others.min(axis=1)
+
+    return [Match(int(i), float(d), float(r - d)) if np.isfinite(d)
+            else Match(-1, float('inf'), float('inf'))
+            for i, d, r in zip(best, best_dist, runner_up)]
+
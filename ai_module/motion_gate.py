@@ -0,0 +1,128 @@
+import time
+import cv2
+import numpy as np
+
+from ai_module import common
+
+log = common.get_logger('motion_gate')
+
+# Gate decisions
+STATIC = 'static'     # Nothing moved: skip detection, keep current tracks
+REGIONS = 'regions'   # Only part of the frame changed: detect inside `regions`
+FULL = 'full'         # Large change (or idle timeout): detect on the whole frame
+
+
+class MotionGate:
+    """
+    Cheap change detector run before face detection.
+
+    Frames are shrunk to `width` pixels, blurred and differenced against the
+    last frame the gate looked at. Changed pixels are grouped into padded
+    bounding boxes in full-frame coordinates. A full frame is still forced
+    every `max_idle` seconds so seated, motionless students keep being
+    re-verified.
+    """
+
+    def __init__(self, width=160, threshold=None, min_area=None, max_region_fraction=None,
+                 max_idle=None, pad=0.5):
+        self.width = width
+        self.threshold = threshold or common.MOTION_THRESHOLD
+        self.min_area = min_area or common.MOTION_MIN_AREA
+        self.max_region_fraction = max_region_fraction or common.MOTION_REGION_MAX
+        self.max_idle = common.MOTION_MAX_IDLE if max_idle is None else max_idle
+        self.pad = pad
+
+        self._reference = None
+        self._last_full = 0.0
+        self._kernel = np.ones((3, 3), np.uint8)
+
+        self.frames = 0
+        self.static = 0
+        self.partial = 0
+
+    def _downsample(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.width / float(w)
+        small = cv2.resize(frame, (self.width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0), scale
+
+    def check(self, frame, now=None):
+        """
+        Classify `frame` (BGR). Returns (decision, regions) where regions is a
+        list of (top, right, bottom, left) boxes in `frame` pixels, only
+        non-empty for REGIONS.
+        """
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        gray, scale = self._downsample(frame)
+        reference, self._reference = self._reference, gray
+
+        if reference is None or reference.shape != gray.shape or now - self._last_full >= self.max_idle:
+            self._last_full = now
+            return FULL, []
+
+        diff = cv2.absdiff(gray, reference)
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, self._kernel, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_pixels = self.min_area * gray.size
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_pixels]
+        if not boxes:
+            self.static += 1
+            return STATIC, []
+
+        regions = merge_boxes([self._to_frame(b, scale, frame.shape) for b in boxes])
+        area = sum((b - t) * (r - l) for t, r, b, l in regions)
+        if area >= self.max_region_fraction * frame.shape[0] * frame.shape[1]:
+            self._last_full = now
+            return FULL, []
+
+        self.partial += 1
+        return REGIONS, regions
+
+    def _to_frame(self, box, scale, shape):
+        """Scale a small-image (x, y, w, h) box up to the frame and pad it."""
+        x, y, w, h = (v / scale for v in box)
+        px, py = w * self.pad, h * self.pad
+        top, left = max(0, int(y - py)), max(0, int(x - px))
+        bottom, right = min(shape[0], int(y + h + py)), min(shape[1], int(x + w + px))
+        return (top, right, bottom, left)
+
+    def reset(self):
+        self._reference = None
+
+    def metrics(self):
+        return {
+            'frames': self.frames,
+            'static_skips': self.static,
+            'region_frames': self.partial,
+            'skip_ratio': round(self.static / self.frames, 3) if self.frames else 0.0,
+        }
+
+
+def merge_boxes(regions):
+    """Union overlapping (top, right, bottom, left) boxes until none overlap."""
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for box in regions:
+            for i, other in enumerate(out):
+                if box[0] < other[2] and other[0] < box[2] and box[3] < other[1] and other[3] < box[1]:
+                    out[i] = (min(box[0], other[0]), max(box[1], other[1]),
+                              max(box[2], other[2]), min(box[3], other[3]))
+                    merged = True
+                    break
+            else:
+                out.append(box)
+        regions = out
+    return regions
+
+
+def overlaps(box, regions):
+    """True if a (top, right, bottom, left) box intersects any of `regions`."""
+    t, r, b, l = box
+    return any(t < rb and rt < b and l < rr and rl < r for rt, rr, rb, rl in regions)
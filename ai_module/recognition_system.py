@@ -1,13 +1,9 @@
-import numpy as np
 import cv2
 import face_recognition
-import pickle
 import os
 import sys
-import sqlite3
 import time
 import threading
-import dlib
 from datetime import datetime, timedelta
 
 # Add project root to path
@@ -15,6 +11,17 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ai_module import common
 from ai_module.settings import SettingsManager
 from ai_module import detectors
+from ai_module import encoding_store
+from ai_module.face_index import build_index
+from ai_module.attendance_writer import AttendanceWriter, ATTENDANCE
+from ai_module.cadence import CadenceController
+from ai_module import motion_gate
+from ai_module.track_manager import TrackManager
+from ai_module.tracker_pool import TrackerPool
+from ai_module.frame import Frame
+from ai_module import schedule_timeline
+from ai_module import events
+from ai_module import db
 
 log = common.get_logger('recognition')
 
@@ -22,11 +29,14 @@ log = common.get_logger('recognition')
 class FaceSystemThreaded:
     def __init__(self):
         self.encodings_data = self.load_encodings()
-        self.known_names = self.encodings_data.get("names", [])
-        self.known_encodings = self.encodings_data.get("encodings", [])
+        self.known_names = list(self.encodings_data.get("names", []))
+        self.gallery = build_index(self.encodings_data.get("encodings", []), self.known_names)
 
         # Shared Data
         self.latest_frame = None
+        self.frame_seq = 0                 # Bumped by the capture thread per frame
+        self.tracking_confidence = None    # Lowest tracker PSR on the latest frame
+        self.tracked_boxes = []            # Tracker positions on the latest frame
         self.new_results_available = False
         self.detected_results = []
 
@@ -36,18 +46,34 @@ class FaceSystemThreaded:
         self.show_debug = True
         
         # Detector
-        self.detector_name = SettingsManager.get('DETECTOR_MODEL', default='dlib')
+        self.settings = SettingsManager.snapshot()
+        self.detector_name = self.settings.detector_model
         self._init_detector()
 
-        # Trackers
-        self.trackers = []
-        self.tracking_names = []
+        # Trackers (updated off the capture thread on a downscaled frame)
+        self.tracker_pool = TrackerPool(on_update=self.report_tracking)
+
+        # Detection cadence (FRAME_SKIP, adapted to latency / CPU budget)
+        self.cadence = CadenceController(self.settings.frame_skip)
+        self.motion_gate = motion_gate.MotionGate()
+        self.last_full_sweep = 0
+
+        # Identity per tracked face (re-encode only when needed)
+        self.tracks = TrackManager()
 
         # Session tracking
         self.session_logged = {}
         self.last_seen = {}
+        self.last_seen_flushed = {}   # name -> last_seen value already sent to the DB
+        self.last_presence_flush = 0
         self.last_disappear_check = 0
 
+        # Write-behind DB logger (AI thread never blocks on disk)
+        self.writer = AttendanceWriter(on_dropped=self._forget_dropped)
+        self._published_status = None   # Last state pushed to /api/events
+        self._idle_until = 0.0          # No detection before this (monotonic) outside class
+        self._pending_settings = None   # Newest snapshot published by SettingsManager
+
         self.sync_students_to_db()
 
     def _init_detector(self):
@@ -63,73 +89,103 @@ class FaceSystemThreaded:
             log.error(f"Detector init failed: {e}. Fallback to Dlib.")
             self.detector = detectors.DlibDetector()
         
+    def _on_settings_published(self, settings):
+        """SettingsManager subscriber: hand the new snapshot to the AI loop."""
+        self._pending_settings = settings
+        self.wake()
+
     def _check_settings_change(self):
-        """Check if detector settings changed and reload if needed."""
-        new_model = SettingsManager.get('DETECTOR_MODEL', default='dlib')
+        """Apply a snapshot published since the last frame and reload the detector if needed."""
+        SettingsManager.poll()   # Edits by other processes publish through here
+        settings, self._pending_settings = self._pending_settings, None
+        if settings is None or settings.version <= self.settings.version:
+            return
+        self.settings = settings
+        self.cadence.set_frame_skip(settings.frame_skip)
+        new_model = settings.detector_model
         if new_model != self.detector_name:
             log.info(f"Detector change detected: {self.detector_name} -> {new_model}")
             self.detector_name = new_model
             self._init_detector()
 
     def load_encodings(self):
-        if os.path.exists(common.ENCODINGS_PATH):
-            try:
-                with open(common.ENCODINGS_PATH, "rb") as f:
-                    data = pickle.load(f)
-                if not isinstance(data, dict):
-                    return {"names": [], "encodings": []}
-                names = data.get("names", [])
-                encodings = data.get("encodings", [])
-                # Ensure lists
-                if not isinstance(names, list) or not isinstance(encodings, list):
-                    return {"names": [], "encodings": []}
-                # Truncate mismatch
-                min_len = min(len(names), len(encodings))
-                return {"names": names[:min_len], "encodings": encodings[:min_len]}
-            except Exception as e:
-                log.error(f"Could not load encodings: {e}")
+        try:
+            return encoding_store.open_store().load()
+        except Exception as e:
+            log.error(f"Could not load encodings: {e}")
         return {"names": [], "encodings": []}
 
+    def add_known_face(self, name, encoding):
+        """Register a newly enrolled face with the running system."""
+        self.known_names.append(name)
+        self.gallery.add(name, encoding)
+
+    def remove_known_face(self, name):
+        """Forget every encoding of a deleted student."""
+        self.known_names[:] = [n for n in self.known_names if n != name]
+        self.tracks.forget(name)
+        return self.gallery.remove(name)
+
     def sync_students_to_db(self):
         try:
-            with sqlite3.connect(common.DB_PATH) as conn:
+            with db.connect() as conn:
                 cursor = conn.cursor()
                 existing = {row[0] for row in cursor.execute("SELECT name FROM students").fetchall()}
                 for name in set(self.known_names):
                     if name not in existing:
                         cursor.execute("INSERT INTO students (name) VALUES (?)", (name,))
                         log.info(f"Auto-synced new student to DB: {name}")
-                conn.commit()
         except Exception as e:
             log.warning(f"Database sync failed: {e}")
 
+    # ── Capture Thread Hand-off ─────────────────────────
+
+    def submit_frame(self, image):
+        """
+        Wrap a captured BGR image in a shared, read-only Frame and publish it
+        to the AI loop and the tracker pool. Returns (frame, tracked) where
+        tracked is the latest [(box, name)] for the overlay.
+        """
+        with self.lock:
+            self.frame_seq += 1
+            frame = Frame(image, self.frame_seq)
+            self.latest_frame = frame
+        self.tracker_pool.submit(frame)
+        return frame, self.tracker_pool.positions()
+
+    def report_tracking(self, confidences, boxes=()):
+        """Capture thread → AI loop: tracker PSRs and positions measured on the latest frame."""
+        with self.lock:
+            self.tracking_confidence = min(confidences) if confidences else None
+            self.tracked_boxes = list(boxes)
+
     # ── Schedule Logic ──────────────────────────────────
 
     def get_active_schedule(self):
         """Check if current time falls inside any active class schedule."""
-        mode = SettingsManager.get('SYSTEM_MODE', default='auto')
+        mode = self.settings.system_mode
         if mode == 'force_on':
             return {'id': -1, 'class_name': 'Manual', 'start_time': '00:00', 'end_time': '23:59'}
         if mode == 'force_off':
             return None
 
-        now = datetime.now()
-        day_name = now.strftime('%A')
-        current_time = now.strftime('%H:%M')
-
         try:
-            with sqlite3.connect(common.DB_PATH) as conn:
-                conn.row_factory = sqlite3.Row
-                row = conn.execute("""
-                    SELECT * FROM class_schedules
-                    WHERE day_of_week = ? AND is_active = 1
-                      AND ? BETWEEN start_time AND end_time
-                    ORDER BY start_time LIMIT 1
-                """, (day_name, current_time)).fetchone()
-                return dict(row) if row else None
-        except Exception:
+            return schedule_timeline.timeline.active_at()
+        except Exception as e:
+            log.warning(f"Schedule lookup failed: {e}")
             return None
 
+    def publish_status(self, schedule=None):
+        """Push AI running state / mode / active class to /api/events when it changes."""
+        state = {
+            'ai_running': self.is_running,
+            'system_mode': self.settings.system_mode,
+            'active_schedule': schedule,
+        }
+        if state != self._published_status:
+            self._published_status = state
+            events.publish(events.STATUS, state)
+
     def determine_status(self, schedule):
         if not schedule or schedule.get('id') == -1:
             return 'Present'
@@ -137,7 +193,7 @@ class FaceSystemThreaded:
         try:
             s_time = schedule['start_time'].split(':')
             c_start = now.replace(hour=int(s_time[0]), minute=int(s_time[1]), second=0)
-            thresh = SettingsManager.get('LATE_THRESHOLD', type_cast=int)
+            thresh = self.settings.late_threshold
             if now <= c_start + timedelta(minutes=thresh):
                 return 'On Time'
             return 'Late'
@@ -156,33 +212,32 @@ class FaceSystemThreaded:
             self.last_seen[name] = time.time()
             return
 
-        try:
-            with sqlite3.connect(common.DB_PATH) as conn:
-                cursor = conn.cursor()
-                res = cursor.execute("SELECT id FROM students WHERE name = ?", (name,)).fetchone()
-                if res:
-                    student_id = res[0]
-                    status = self.determine_status(schedule)
-                    sid = schedule_id if schedule_id != -1 else None
-                    cursor.execute(
-                        "INSERT INTO attendance_logs (student_id, status, source, schedule_id, last_seen) VALUES (?, ?, 'ai', ?, ?)",
-                        (student_id, status, sid, datetime.now().isoformat())
-                    )
-                    conn.commit()
-                    self.session_logged[session_key] = True
-                    self.last_seen[name] = time.time()
-                    log.info(f"[ATTENDANCE] {name} → {status}")
-        except Exception as e:
-            log.error(f"Attendance log failed: {e}")
+        status = self.determine_status(schedule)
+        sid = schedule_id if schedule_id != -1 else None
+        # Queued for the writer thread; if the queue is full (or the batch fails, see
+        # _forget_dropped) the next sighting retries
+        if self.writer.log_attendance(name, status, sid, datetime.now().isoformat()):
+            self.session_logged[session_key] = True
+            self.last_seen[name] = time.time()
+
+    def _forget_dropped(self, dropped):
+        """Writer callback: un-mark sightings whose rows were lost, so the next one logs again."""
+        for event in dropped:
+            if event[0] == ATTENDANCE:
+                schedule_id = -1 if event[3] is None else event[3]
+                self.session_logged.pop(f"{event[1]}:{schedule_id}", None)
+            else:
+                self.session_logged.pop(f"{event[1]}:disappeared", None)
+        log.warning(f"Attendance for {len(dropped)} sighting(s) was not saved; will log again on next sighting")
 
     def check_disappearances(self):
         now = time.time()
-        interval = SettingsManager.get('RECHECK_INTERVAL', type_cast=int)
+        interval = self.settings.recheck_interval
         if now - self.last_disappear_check < interval:
             return
         self.last_disappear_check = now
 
-        threshold = SettingsManager.get('DISAPPEAR_THRESHOLD', type_cast=int) * 60
+        threshold = self.settings.disappear_threshold * 60
         schedule = self.get_active_schedule()
         if schedule is None:
             return
@@ -193,19 +248,83 @@ class FaceSystemThreaded:
                 session_key = f"{name}:disappeared"
                 if session_key in self.session_logged:
                     continue
-                try:
-                    with sqlite3.connect(common.DB_PATH) as conn:
-                        res = conn.execute("SELECT id FROM students WHERE name = ?", (name,)).fetchone()
-                        if res:
-                            conn.execute(
-                                "INSERT INTO attendance_logs (student_id, status, source, notes) VALUES (?, 'Disappeared', 'ai', ?)",
-                                (res[0], f"Last seen {int(elapsed/60)} min ago")
-                            )
-                            conn.commit()
-                            self.session_logged[session_key] = True
-                            log.warning(f"[DISAPPEARED] {name}")
-                except Exception:
-                    pass
+                if self.writer.log_disappearance(name, f"Last seen {int(elapsed/60)} min ago"):
+                    self.session_logged[session_key] = True
+
+    def flush_presence(self, schedule):
+        """
+        Presence heartbeat: every PRESENCE_FLUSH_INTERVAL seconds, push all
+        last_seen values that moved by at least PRESENCE_MIN_DELTA to the DB
+        as one bulk update, instead of writing on every sighting.
+        """
+        now = time.time()
+        if schedule is None or now - self.last_presence_flush < common.PRESENCE_FLUSH_INTERVAL:
+            return
+        self.last_presence_flush = now
+
+        sid = schedule.get('id') if schedule.get('id') != -1 else None
+        changed = [(name, seen) for name, seen in self.last_seen.items()
+                   if seen - self.last_seen_flushed.get(name, 0) >= common.PRESENCE_MIN_DELTA]
+        if not changed:
+            return
+        entries = [(name, sid, datetime.fromtimestamp(seen).isoformat()) for name, seen in changed]
+        if self.writer.update_last_seen(entries):
+            self.last_seen_flushed.update(changed)
+
+    def restore_session(self, schedule):
+        """
+        Reload who was already logged (and when they were last seen) in the
+        current session, so a restart neither re-logs students nor forgets
+        who to watch for disappearance.
+        """
+        sid = schedule.get('id') if schedule.get('id') != -1 else None
+        try:
+            h, m = (int(x) for x in schedule.get('start_time', '00:00').split(':'))
+            local_start = datetime.now().replace(hour=h, minute=m, second=0, microsecond=0)
+            # attendance_logs.timestamp defaults to CURRENT_TIMESTAMP (UTC)
+            utc_start = datetime.utcfromtimestamp(local_start.timestamp()).strftime('%Y-%m-%d %H:%M:%S')
+            with db.connect() as conn:
+                rows = conn.execute("""
+                    SELECT s.name, al.status, al.last_seen FROM attendance_logs al
+                    JOIN students s ON s.id = al.student_id
+                    WHERE al.source = 'ai' AND al.timestamp >= ?
+                      AND (al.schedule_id IS ? OR al.status = 'Disappeared')
+                """, (utc_start, sid)).fetchall()
+        except Exception as e:
+            log.warning(f"Could not restore session state: {e}")
+            return
+
+        for name, status, seen in rows:
+            if status == 'Disappeared':
+                self.session_logged[f"{name}:disappeared"] = True
+                continue
+            self.session_logged[f"{name}:{schedule.get('id')}"] = True
+            try:
+                ts = datetime.fromisoformat(seen).timestamp() if seen else time.time()
+            except ValueError:
+                ts = time.time()
+            self.last_seen[name] = max(ts, self.last_seen.get(name, 0))
+            self.last_seen_flushed[name] = self.last_seen[name]
+        if rows:
+            log.info(f"Restored {len(self.last_seen)} students into the current session")
+
+    def wake(self):
+        """End an idle pause early (timetable edit, settings change)."""
+        self._idle_until = 0.0
+
+    def pace_idle(self):
+        """
+        Outside class hours faces are still recognised and labelled but
+        nothing is logged, so detect only every IDLE_DETECT_INTERVAL seconds
+        (the trackers carry the boxes in between) and never past the next
+        timetable transition. wake() ends the pause early.
+        """
+        delay = common.IDLE_DETECT_INTERVAL
+        if self.settings.system_mode == 'auto':
+            until = schedule_timeline.timeline.seconds_until_transition()
+            if until is not None:
+                delay = min(delay, until)
+        self._idle_until = time.monotonic() + delay
 
     def maybe_reset_session(self, schedule):
         if schedule is None:
@@ -215,91 +334,124 @@ class FaceSystemThreaded:
             self._current_schedule_key = new_key
             self.session_logged.clear()
             self.last_seen.clear()
+            self.last_seen_flushed.clear()
             log.info(f"New class session: {schedule.get('class_name')}")
+            self.restore_session(schedule)
 
     # ── AI Loop ──────────────────────────────────────────
 
     def ai_loop(self):
         log.info("AI Thread Started.")
+        self.writer.start()
+        schedule_timeline.timeline.subscribe(self.wake)
+        SettingsManager.subscribe(self._on_settings_published)
+        self._pending_settings = SettingsManager.snapshot()   # Anything published since __init__
+        last_seq = 0
         while self.is_running:
             frame_to_process = None
             with self.lock:
-                if self.latest_frame is not None:
-                    frame_to_process = self.latest_frame.copy()
-            
+                seq = self.frame_seq
+                if self.latest_frame is not None and seq != last_seq:
+                    self.cadence.observe_frame(seq)
+                    if (time.monotonic() >= self._idle_until
+                            and self.cadence.should_detect(seq, self.tracking_confidence)):
+                        frame_to_process = self.latest_frame   # Shared, read-only: no copy
+                last_seq = seq
+
             if frame_to_process is not None:
-                # 1. Update Settings / Detector
+                detect_start = time.perf_counter()
+                # 1. Settings snapshot for this frame / Detector
                 self._check_settings_change()
                 
                 # 2. Schedule & Cleanup
                 schedule = self.get_active_schedule()
+                self.publish_status(schedule)
+                if schedule is None:
+                    self.pace_idle()
                 self.maybe_reset_session(schedule)
                 self.check_disappearances()
+                self.flush_presence(schedule)
 
-                # 3. Process Frame
-                scale = SettingsManager.get('DETECTION_SCALE', type_cast=float)
-                rgb_frame = cv2.cvtColor(frame_to_process, cv2.COLOR_BGR2RGB)
+                # 3. Motion gate: skip or narrow detection when the scene is static
+                decision, regions = self.motion_gate.check(frame_to_process.bgr)
+                with self.lock:
+                    previous = list(self.detected_results)
+                    tracked = list(self.tracked_boxes)
+                if decision == motion_gate.STATIC:
+                    # Nothing moved: current tracks are still valid and still present
+                    for _, name in previous:
+                        if name != "Unknown":
+                            self.log_attendance(name)
+                    self.cadence.skipped(seq)
+                    continue
 
-                if scale != 1.0:
-                    small_frame = cv2.resize(rgb_frame, (0, 0), fx=scale, fy=scale)
-                    small_frame_bgr = cv2.resize(frame_to_process, (0, 0), fx=scale, fy=scale)
-                else:
-                    small_frame = rgb_frame
-                    small_frame_bgr = frame_to_process
+                # 4. Prepare Frame (views are cached on the Frame and built on first use)
+                scale = self.settings.detection_scale
 
                 # DETECT (Uses selected model)
                 # Pass BGR because detectors convert if needed, or use BGR direct (Dlib HOG)
-                boxes = self.detector.detect_faces(small_frame_bgr)
-
-                results = []
-                if boxes:
-                    # RECOGNIZE (Always uses dlib/face_recognition for encodings)
-                    # face_encodings expects RGB, but helper converts. Passing small_frame (RGB) is safe.
-                    encodings = face_recognition.face_encodings(small_frame, boxes)
-
-                    for box, encoding in zip(boxes, encodings):
-                        tolerance = SettingsManager.get('TOLERANCE', type_cast=float)
-                        matches = face_recognition.compare_faces(self.known_encodings, encoding, tolerance=tolerance)
-                        name = "Unknown"
-                        
-                        if True in matches:
-                            face_distances = face_recognition.face_distance(self.known_encodings, encoding)
-                            best_match_index = int(np.argmin(face_distances))
-                            name = self.known_names[best_match_index]
-                            self.log_attendance(name)
+                carried = []
+                if decision == motion_gate.REGIONS:
+                    small_regions = [tuple(int(v * scale) for v in r) for r in regions]
+                    boxes = self.detector.detect_regions(frame_to_process.small_bgr(scale), small_regions)
+                    # Faces outside the changed area keep their last identity
+                    carried = [box for box, _ in previous if not motion_gate.overlaps(box, regions)]
+                elif tracked and time.monotonic() - self.last_full_sweep < common.ROI_SWEEP_INTERVAL:
+                    # ROI mode: re-detect around current tracks only; newcomers
+                    # are picked up by the next full-frame sweep
+                    small_tracks = [tuple(int(v * scale) for v in box) for box in tracked]
+                    boxes = self.detector.detect_rois(frame_to_process.small_bgr(scale), small_tracks)
+                else:
+                    boxes = self.detector.detect(frame_to_process, scale)
+                    self.last_full_sweep = time.monotonic()
 
-                        # Upscale coords for display
-                        if scale != 1.0:
-                            top, right, bottom, left = box
-                            top = int(top / scale)
-                            right = int(right / scale)
-                            bottom = int(bottom / scale)
-                            left = int(left / scale)
-                            box = (top, right, bottom, left)
+                # Full-resolution boxes for display/tracking, small ones for encoding
+                candidates = [(tuple(int(v / scale) for v in box), box) for box in boxes]
+                candidates += [(box, tuple(int(v * scale) for v in box)) for box in carried]
 
-                        results.append((box, name))
+                results = []
+                if candidates:
+                    tracks = self.tracks.associate([full for full, _ in candidates])
+                    pending = [i for i, track in enumerate(tracks) if self.tracks.needs_encoding(track)]
+                    if pending:
+                        # RECOGNIZE (Always uses dlib/face_recognition for encodings), but only
+                        # for new tracks, uncertain ones and those due for re-verification
+                        encodings = face_recognition.face_encodings(frame_to_process.small_rgb(scale),
+                                                                    [candidates[i][1] for i in pending])
+
+                        tolerance = self.settings.tolerance
+                        matches = self.gallery.match(encodings)
+
+                        for i, match in zip(pending, matches):
+                            name = "Unknown"
+                            if match.index >= 0 and match.distance <= tolerance:
+                                name = self.gallery.name_of(match.index)
+                            self.tracks.record_match(tracks[i], name, match.distance, tolerance)
+
+                    for (box, _), track in zip(candidates, tracks):
+                        if track.name != "Unknown":
+                            self.log_attendance(track.name)
+                        results.append((box, track.name))
 
                 # Init Trackers
-                new_trackers = []
-                new_tracking_names = []
                 if self.is_running:
-                    for box, name in results:
-                        top, right, bottom, left = box
-                        rect = dlib.rectangle(left, top, right, bottom)
-                        tracker = dlib.correlation_tracker()
-                        tracker.start_track(frame_to_process, rect)
-                        new_trackers.append(tracker)
-                        new_tracking_names.append(name)
+                    self.tracker_pool.reset(frame_to_process, results)
 
                 with self.lock:
                     self.detected_results = results
-                    self.trackers = new_trackers
-                    self.tracking_names = new_tracking_names
                     self.new_results_available = True
+                    # New trackers start from this frame; drop the old measurements
+                    self.tracking_confidence = None
+                    self.tracked_boxes = [box for box, _ in results]
 
-                time.sleep(0.03)
+                self.cadence.detected(seq, time.perf_counter() - detect_start)
             else:
-                time.sleep(0.1)
+                # Trackers carry the boxes until the next detection frame
+                time.sleep(0.005 if self.latest_frame is not None else 0.1)
+
+        schedule_timeline.timeline.unsubscribe(self.wake)
+        SettingsManager.unsubscribe(self._on_settings_published)
+        self.writer.flush()
 
     # ── Standalone Mode ──────────────────────────────────
 
@@ -353,19 +505,10 @@ class FaceSystemThreaded:
 
                 frame = cv2.flip(frame, 1)
 
-                with self.lock:
-                    self.latest_frame = frame
-                    current_trackers = list(self.trackers)
-                    current_names = list(self.tracking_names)
-
-                for i, tracker in enumerate(current_trackers):
-                    tracker.update(frame)
-                    pos = tracker.get_position()
-                    left = int(pos.left())
-                    top = int(pos.top())
-                    right = int(pos.right())
-                    bottom = int(pos.bottom())
-                    name = current_names[i]
+                shared, tracked = self.submit_frame(frame)
+                frame = shared.annotated()   # Draw on a copy; the Frame is shared with the AI / trackers
+
+                for (top, right, bottom, left), name in tracked:
                     color = common.COLOR_GREEN if name != "Unknown" else common.COLOR_RED
                     cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
                     cv2.putText(frame, name, (left, top - 10),
@@ -394,6 +537,8 @@ class FaceSystemThreaded:
 
         finally:
             self.is_running = False
+            self.tracker_pool.stop()
+            self.writer.stop()
             cap.release()
             cv2.destroyAllWindows()
             log.info("System Stopped.")
@@ -0,0 +1,166 @@
+"""
+In-memory class timetable.
+
+class_schedules is loaded once into a sorted list of elementary segments per
+weekday, each tagged with the class active during it. "Which class is on at
+time t" is then a bisect instead of a SQLite query on every AI frame, and the
+next start/end is known in advance so callers can sleep until it.
+
+The API invalidates the timeline whenever it edits class_schedules; it is also
+reloaded after MAX_AGE seconds to pick up edits made by other processes.
+"""
+import bisect
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from ai_module import common
+from ai_module import db
+
+log = common.get_logger('schedule_timeline')
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MAX_AGE = 300   # seconds before a reload even without an explicit invalidate()
+
+
+def _minutes(hhmm):
+    """'09:05' -> 545. Seconds, if present, are ignored like the old string compare did."""
+    h, m = hhmm.strip().split(':')[:2]
+    return int(h) * 60 + int(m)
+
+
+class ScheduleTimeline:
+    """
+    Active classes as per-weekday segments [start, end) in minutes.
+
+    Each boundary list is sorted and `owners[i]` is the schedule row active
+    from `bounds[i]` until `bounds[i + 1]` (None between classes). Where
+    classes overlap, the one that started first wins, matching the previous
+    `ORDER BY start_time LIMIT 1` query. End times are inclusive to the minute
+    (a class ending at 10:30 is still active at 10:30:59).
+    """
+
+    def __init__(self, db_path=None, max_age=MAX_AGE):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.version = 0
+        self._lock = threading.Lock()
+        self._days = None          # weekday index -> (bounds, owners)
+        self._loaded_at = 0.0
+        self._source = None        # DB path the cached timetable came from
+        self._subscribers = []
+
+    # ── Loading ───────────────────────────────────────
+
+    def invalidate(self):
+        """Drop the cached timetable; the next lookup reloads it from the DB."""
+        with self._lock:
+            self._days = None
+            self.version += 1
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback()
+            except Exception as e:
+                log.error(f"Timeline subscriber failed: {e}")
+
+    def subscribe(self, callback):
+        """Call `callback()` after every invalidate(), e.g. to wake a loop sleeping until a transition."""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _load(self, path):
+        with db.connect(path, row_factory=sqlite3.Row) as conn:
+            rows = conn.execute("""
+                SELECT * FROM class_schedules WHERE is_active = 1
+                ORDER BY start_time, id
+            """).fetchall()
+
+        per_day = {i: [] for i in range(len(DAYS))}
+        for row in rows:
+            try:
+                day = DAYS.index(row['day_of_week'])
+                start, end = _minutes(row['start_time']), _minutes(row['end_time']) + 1
+            except (ValueError, AttributeError):
+                log.warning(f"Skipping malformed schedule row {row['id']}")
+                continue
+            if end > start:
+                per_day[day].append((start, end, dict(row)))
+
+        days = {}
+        for day, intervals in per_day.items():
+            points = sorted({p for start, end, _ in intervals for p in (start, end)})
+            bounds, owners = [], []
+            for point in points:
+                # Earliest-starting class covering this point (intervals are start-ordered)
+                owner = next((r for start, end, r in intervals if start <= point < end), None)
+                if owners and owners[-1] is owner:
+                    continue
+                bounds.append(point)
+                owners.append(owner)
+            days[day] = (bounds, owners)
+
+        log.info(f"Schedule timeline loaded: {len(rows)} active classes")
+        return days
+
+    def _timeline(self):
+        path = self.db_path or common.DB_PATH
+        with self._lock:
+            if (self._days is not None and self._source == path
+                    and time.monotonic() - self._loaded_at < self.max_age):
+                return self._days
+            version = self.version
+        days = self._load(path)
+        with self._lock:
+            # An invalidate() during the load wins; the next call reloads again.
+            if version == self.version:
+                self._days, self._loaded_at, self._source = days, time.monotonic(), path
+        return days
+
+    # ── Queries ───────────────────────────────────────
+
+    def active_at(self, when=None):
+        """Schedule row (as a dict) active at `when` (local time), or None."""
+        when = when or datetime.now()
+        bounds, owners = self._timeline()[when.weekday()]
+        i = bisect.bisect_right(bounds, when.hour * 60 + when.minute) - 1
+        if i < 0 or owners[i] is None:
+            return None
+        return dict(owners[i])
+
+    def next_transition(self, when=None):
+        """
+        Local datetime of the next class start or end after `when`,
+        or None if the timetable is empty.
+        """
+        when = when or datetime.now()
+        days = self._timeline()
+        minute = when.hour * 60 + when.minute
+        midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(8):
+            bounds, _ = days[(when.weekday() + offset) % 7]
+            i = bisect.bisect_right(bounds, minute) if offset == 0 else 0
+            if i < len(bounds):
+                return midnight + timedelta(days=offset, minutes=bounds[i])
+        return None
+
+    def seconds_until_transition(self, when=None):
+        """Seconds until next_transition(), or None if nothing is scheduled."""
+        when = when or datetime.now()
+        nxt = self.next_transition(when)
+        return None if nxt is None else max(0.0, (nxt - when).total_seconds())
+
+
+# Process-wide timeline shared by the AI loop and the API
+timeline = ScheduleTimeline()
+
+
+def invalidate():
+    timeline.invalidate()
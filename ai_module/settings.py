@@ -1,16 +1,53 @@
 import sqlite3
 import logging
+import threading
+import time
+from collections import namedtuple
 from ai_module import common
+from ai_module import db
 
 log = common.get_logger('settings')
 
+# Typed, immutable view of every runtime setting. The AI loop takes one per
+# frame, so hot paths read attributes instead of parsing strings.
+SNAPSHOT_FIELDS = {
+    # key                  (attribute,            type)
+    'DETECTOR_MODEL':      ('detector_model',      str),
+    'TOLERANCE':           ('tolerance',           float),
+    'DETECTION_SCALE':     ('detection_scale',     float),
+    'LATE_THRESHOLD':      ('late_threshold',      int),
+    'DISAPPEAR_THRESHOLD': ('disappear_threshold', int),
+    'RECHECK_INTERVAL':    ('recheck_interval',    int),
+    'SYSTEM_MODE':         ('system_mode',         str),
+    'FRAME_SKIP':          ('frame_skip',          int),
+    'MATCH_INDEX':         ('match_index',         str),
+}
+SettingsSnapshot = namedtuple('SettingsSnapshot',
+                              [attr for attr, _ in SNAPSHOT_FIELDS.values()] + ['version'])
+
+
 class SettingsManager:
     """
     Manages persistent settings in the database.
     Falls back to defaults if DB is inaccessible or key is missing.
     """
     _cache = {}
-    
+
+    # Snapshot / pub-sub state
+    _snapshot = None
+    _snapshot_values = None
+    _version = 0
+    _subscribers = []
+    _lock = threading.Lock()
+
+    # Cross-process invalidation via PRAGMA data_version (None to disable)
+    WATCH_INTERVAL = 1.0
+    _watch_conn = None
+    _watch_path = None
+    _data_version = None
+    _marker = None            # settings_version.version as last seen by the watcher
+    _last_watch = 0.0
+
     DEFAULTS = {
         'DETECTOR_MODEL': 'dlib',
         'TOLERANCE': '0.5',
@@ -19,7 +56,8 @@ class SettingsManager:
         'DISAPPEAR_THRESHOLD': '15',
         'RECHECK_INTERVAL': '300',
         'SYSTEM_MODE': 'auto',
-        'FRAME_SKIP': '3'
+        'FRAME_SKIP': '3',
+        'MATCH_INDEX': 'auto'
     }
 
     @classmethod
@@ -55,11 +93,12 @@ class SettingsManager:
     def set(cls, key, value):
         """Update a setting."""
         try:
-            with sqlite3.connect(common.DB_PATH) as conn:
+            with db.connect() as conn:
                 conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", 
                              (key, str(value)))
-                conn.commit()
             cls._cache[key] = str(value) # Update cache
+            with cls._lock:
+                cls._snapshot = None
             return True
         except Exception as e:
             log.error(f"Failed to save setting {key}: {e}")
@@ -69,8 +108,7 @@ class SettingsManager:
     def get_all(cls):
         """Return all settings as dict."""
         try:
-            with sqlite3.connect(common.DB_PATH) as conn:
-                conn.row_factory = sqlite3.Row
+            with db.connect(row_factory=sqlite3.Row) as conn:
                 rows = conn.execute("SELECT key, value FROM settings").fetchall()
                 data = {row['key']: row['value'] for row in rows}
                 # Merge with defaults ensuring all keys exist
@@ -84,10 +122,141 @@ class SettingsManager:
     @classmethod
     def _fetch_from_db(cls, key):
         try:
-            with sqlite3.connect(common.DB_PATH) as conn:
+            with db.connect() as conn:
                 row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
                 if row:
                     return row[0]
         except Exception:
             pass
         return cls.DEFAULTS.get(key, '')
+
+    # ── Snapshot / Pub-Sub ────────────────────────────
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Current SettingsSnapshot. Cheap enough to call once per frame: it is
+        rebuilt only after set()/publish() or a write by another process.
+        """
+        cls._check_external_changes()
+        snap = cls._snapshot
+        if snap is None:
+            snap = cls.publish()
+        return snap
+
+    @classmethod
+    def poll(cls):
+        """
+        Publish a new snapshot if another process changed the settings.
+        For subscribers, who never call snapshot(); rate-limited like it.
+        """
+        cls._check_external_changes()
+
+    @classmethod
+    def _build_snapshot(cls, version):
+        raw = cls.get_all()
+        values = []
+        for key, (_, cast) in SNAPSHOT_FIELDS.items():
+            try:
+                values.append(cast(raw.get(key) or cls.DEFAULTS[key]))
+            except (TypeError, ValueError):
+                log.warning(f"Invalid value for {key}: {raw.get(key)!r}, using default")
+                values.append(cast(cls.DEFAULTS[key]))
+        return SettingsSnapshot(*values, version)
+
+    @classmethod
+    def publish(cls):
+        """
+        Rebuild the snapshot from the DB and, if any value changed, bump the
+        version and notify subscribers. Called by /api/settings after saving
+        a batch of keys.
+        """
+        with cls._lock:
+            previous = cls._snapshot_values
+            snap = cls._build_snapshot(cls._version + 1)
+            if previous is not None and tuple(snap[:-1]) == previous:
+                # Nothing actually changed (e.g. an unrelated table was written)
+                snap = snap._replace(version=cls._version)
+                cls._snapshot = snap
+                return snap
+            cls._version += 1
+            cls._snapshot, cls._snapshot_values = snap, tuple(snap[:-1])
+            subscribers = list(cls._subscribers)
+        for callback in subscribers:
+            try:
+                callback(snap)
+            except Exception as e:
+                log.error(f"Settings subscriber failed: {e}")
+        return snap
+
+    @classmethod
+    def subscribe(cls, callback):
+        """Call `callback(snapshot)` whenever a new snapshot is published."""
+        with cls._lock:
+            if callback not in cls._subscribers:
+                cls._subscribers.append(callback)
+
+    @classmethod
+    def unsubscribe(cls, callback):
+        with cls._lock:
+            if callback in cls._subscribers:
+                cls._subscribers.remove(callback)
+
+    @classmethod
+    def invalidate(cls):
+        """Forget every cached value; the next read goes back to the DB."""
+        with cls._lock:
+            cls._cache = {}
+            cls._snapshot = None
+            if cls._watch_conn is not None:
+                cls._watch_conn.close()
+            cls._watch_conn = None
+
+    @classmethod
+    def _read_marker(cls):
+        try:
+            row = cls._watch_conn.execute("SELECT version FROM settings_version WHERE id = 1").fetchone()
+        except sqlite3.OperationalError:
+            return None    # Not migrated yet: every commit counts as a possible settings change
+        return row[0] if row else None
+
+    @classmethod
+    def _check_external_changes(cls):
+        """
+        At most every WATCH_INTERVAL seconds, compare SQLite's data_version on
+        a dedicated connection. It changes whenever any *other* connection
+        commits, so edits from another process (or a manual sqlite3 session)
+        invalidate the cache without per-read queries. Most of those commits
+        are attendance rows, so only a bump of the trigger-maintained
+        settings_version marker actually reloads the settings.
+        """
+        if cls.WATCH_INTERVAL is None:
+            return
+        now = time.monotonic()
+        if now - cls._last_watch < cls.WATCH_INTERVAL:
+            return
+        cls._last_watch = now
+        try:
+            with cls._lock:
+                if cls._watch_conn is None or cls._watch_path != common.DB_PATH:
+                    if cls._watch_conn is not None:
+                        cls._watch_conn.close()
+                    # data_version is per connection: this one must stay out of the pool
+                    cls._watch_conn = db.dedicated(common.DB_PATH, check_same_thread=False)
+                    cls._watch_path = common.DB_PATH
+                    cls._data_version = None
+                version = cls._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+                first = cls._data_version is None
+                moved = not first and version != cls._data_version
+                cls._data_version = version
+                changed = False
+                if first or moved:
+                    marker = cls._read_marker()
+                    changed = moved and (marker is None or marker != cls._marker)
+                    cls._marker = marker
+        except sqlite3.Error as e:
+            log.warning(f"Settings change check failed: {e}")
+            return
+        if changed:
+            cls._cache = {}
+            cls.publish()
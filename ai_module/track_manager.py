@@ -0,0 +1,140 @@
+import itertools
+import time
+
+from ai_module import common
+
+log = common.get_logger('track_manager')
+
+UNKNOWN = "Unknown"
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if not inter:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+class Track:
+    """One face followed across detections, with accumulated identity votes."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, box, now):
+        self.id = next(self._ids)
+        self.box = box
+        self.votes = {}           # name -> decayed vote weight
+        self.name = UNKNOWN
+        self.confidence = 0.0     # Share of the leading name, eroded by jumpy associations
+        self.last_encoded = None
+        self.last_seen = now
+        self.misses = 0
+
+    def vote(self, name, weight, decay):
+        for key in self.votes:
+            self.votes[key] *= decay
+        self.votes[name] = self.votes.get(name, 0.0) + weight
+        total = sum(self.votes.values())
+        self.name = max(self.votes, key=self.votes.get)
+        self.confidence = self.votes[self.name] / total if total else 0.0
+
+
+class TrackManager:
+    """
+    Associates each frame's detections with existing tracks by IoU and keeps
+    a per-track identity vote. A track is only re-encoded (ResNet forward
+    pass + gallery match) when it is new, its identity confidence has decayed
+    below `min_confidence`, or `reverify_interval` seconds have passed since
+    its last encoding. Otherwise the detection inherits the track's identity.
+    """
+
+    def __init__(self, iou_threshold=0.3, min_confidence=None, reverify_interval=None,
+                 vote_decay=0.8, max_misses=3):
+        self.iou_threshold = iou_threshold
+        self.min_confidence = min_confidence or common.TRACK_MIN_CONFIDENCE
+        self.reverify_interval = reverify_interval or common.TRACK_REVERIFY_INTERVAL
+        self.vote_decay = vote_decay
+        self.max_misses = max_misses
+        self.tracks = []
+
+        self.encoded = 0
+        self.reused = 0
+
+    # ── Association ───────────────────────────────────
+
+    def associate(self, boxes, now=None):
+        """
+        Greedy IoU matching of `boxes` to live tracks. Unmatched boxes start
+        new tracks; tracks missed `max_misses` times in a row are dropped.
+        Returns the track for each box, in input order.
+        """
+        now = time.monotonic() if now is None else now
+        pairs = sorted(((iou(t.box, b), ti, bi) for ti, t in enumerate(self.tracks)
+                        for bi, b in enumerate(boxes)), reverse=True)
+        assigned, used = [None] * len(boxes), set()
+        for overlap, ti, bi in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if ti in used or assigned[bi] is not None:
+                continue
+            track = self.tracks[ti]
+            # A box that only loosely overlaps may be a different person: erode trust
+            track.confidence *= min(1.0, overlap / 0.5)
+            track.box, track.last_seen, track.misses = boxes[bi], now, 0
+            assigned[bi] = track
+            used.add(ti)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in used:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for bi, box in enumerate(boxes):
+            if assigned[bi] is None:
+                assigned[bi] = Track(box, now)
+                self.tracks.append(assigned[bi])
+        return assigned
+
+    # ── Identity ──────────────────────────────────────
+
+    def needs_encoding(self, track, now=None):
+        now = time.monotonic() if now is None else now
+        due = (track.last_encoded is None
+               or track.confidence < self.min_confidence
+               or now - track.last_encoded >= self.reverify_interval)
+        if not due:
+            self.reused += 1
+        return due
+
+    def record_match(self, track, name, distance, tolerance, now=None):
+        """Add one encoding's verdict to the track's votes."""
+        now = time.monotonic() if now is None else now
+        if name == UNKNOWN:
+            weight = 1.0
+        else:
+            # Closer matches count more; a borderline match still counts a little
+            weight = 1.0 + max(0.0, (tolerance - distance) / tolerance)
+        track.vote(name, weight, self.vote_decay)
+        track.last_encoded = now
+        self.encoded += 1
+
+    def forget(self, name):
+        """Drop votes for a deleted student so their tracks get re-encoded."""
+        for track in self.tracks:
+            if name in track.votes:
+                track.votes.clear()
+                track.name, track.confidence, track.last_encoded = UNKNOWN, 0.0, None
+
+    def metrics(self):
+        total = self.encoded + self.reused
+        return {
+            'active_tracks': len(self.tracks),
+            'encodings': self.encoded,
+            'reused_identities': self.reused,
+            'reuse_ratio': round(self.reused / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from ai_module import common
+
+log = common.get_logger('tracker_pool')
+
+try:
+    import dlib
+except ImportError:
+    dlib = None
+
+
+class _Entry:
+    """One correlation tracker plus its last published result."""
+    __slots__ = ('tracker', 'name', 'box', 'confidence', 'future')
+
+    def __init__(self, tracker, name, box):
+        self.tracker = tracker
+        self.name = name
+        self.box = box               # (top, right, bottom, left) in FULL-frame pixels
+        self.confidence = None
+        self.future = None           # In-flight update, if it overran its timeout
+
+
+class TrackerPool:
+    """
+    Tracking stage between detections.
+
+    Runs on its own thread: it always takes the newest submitted frame
+    (older ones are dropped), downscales it once, and updates every
+    dlib.correlation_tracker in parallel on a thread pool (dlib releases the
+    GIL inside update). A tracker that overruns `timeout` keeps its previous
+    box and is skipped until its update finishes, so one slow tracker never
+    stalls the round. The capture/overlay thread only reads `positions()`,
+    so capture FPS no longer depends on how many faces are tracked.
+    """
+
+    def __init__(self, scale=None, workers=None, timeout=None, on_update=None):
+        self.scale = scale or common.TRACKING_SCALE
+        self.timeout = timeout or common.TRACKER_TIMEOUT
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.on_update = on_update   # callback(confidences, boxes) after each round
+
+        self._entries = []
+        self._cond = threading.Condition()
+        self._pending = None         # Newest frame not yet tracked
+        self._executor = None
+        self._thread = None
+        self._running = False
+
+        self.rounds = 0
+        self.timeouts = 0
+        self.dropped_frames = 0
+        self.last_round_ms = 0.0
+
+    # ── Lifecycle ─────────────────────────────────────
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tracker")
+        self._thread = threading.Thread(target=self._run, daemon=True, name="tracker-pool")
+        self._thread.start()
+
+    def stop(self):
+        if not self._running:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self._executor.shutdown(wait=False)
+        self._thread = self._executor = None
+
+    # ── Inputs ────────────────────────────────────────
+
+    def reset(self, frame, results):
+        """Replace all trackers with new ones started at `results` [(box, name)] on a Frame."""
+        if dlib is None:
+            return
+        small = frame.small_bgr(self.scale)
+        entries = []
+        for box, name in results:
+            top, right, bottom, left = (int(v * self.scale) for v in box)
+            tracker = dlib.correlation_tracker()
+            tracker.start_track(small, dlib.rectangle(left, top, right, bottom))
+            entries.append(_Entry(tracker, name, box))
+        with self._cond:
+            self._entries = entries
+
+    def submit(self, frame):
+        """Hand the newest captured Frame to the tracking thread (never blocks)."""
+        if not self._running:
+            self.start()
+        with self._cond:
+            if self._pending is not None:
+                self.dropped_frames += 1
+            self._pending = frame
+            self._cond.notify()
+
+    # ── Outputs ───────────────────────────────────────
+
+    def positions(self):
+        """Latest [(box, name)] for the overlay, in full-frame pixels."""
+        with self._cond:
+            return [(e.box, e.name) for e in self._entries]
+
+    def metrics(self):
+        return {
+            'trackers': len(self._entries),
+            'workers': self.workers,
+            'rounds': self.rounds,
+            'timeouts': self.timeouts,
+            'dropped_frames': self.dropped_frames,
+            'last_round_ms': self.last_round_ms,
+        }
+
+    # ── Tracking thread ───────────────────────────────
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, self._pending = self._pending, None
+                entries = list(self._entries)
+            try:
+                self._round(frame, entries)
+            except Exception as e:
+                log.error(f"Tracking round failed: {e}")
+
+    def _round(self, frame, entries):
+        start = time.perf_counter()
+        small = frame.small_bgr(self.scale)   # Cached on the Frame, shared with other stages
+        jobs = {}
+        for entry in entries:
+            if entry.future is not None and not entry.future.done():
+                continue   # Still busy from an earlier round
+            entry.future = self._executor.submit(self._update, entry, small)
+            jobs[entry.future] = entry
+
+        _, late = wait(jobs, timeout=self.timeout)
+        self.timeouts += len(late)
+
+        with self._cond:
+            if entries == self._entries:
+                confidences = [e.confidence for e in entries if e.confidence is not None]
+                boxes = [e.box for e in entries]
+            else:
+                confidences, boxes = None, None   # reset() replaced the trackers meanwhile
+
+        self.rounds += 1
+        self.last_round_ms = round((time.perf_counter() - start) * 1000, 2)
+        if boxes is not None and self.on_update:
+            self.on_update(confidences, boxes)
+
+    def _update(self, entry, small):
+        try:
+            entry.confidence = entry.tracker.update(small)
+            pos = entry.tracker.get_position()
+            s = self.scale
+            entry.box = (int(pos.top() / s), int(pos.right() / s),
+                         int(pos.bottom() / s), int(pos.left() / s))
+        except Exception:
+            # Tracker can fail on edge-of-frame or corrupted data — keep the last box
+            entry.confidence = 0.0
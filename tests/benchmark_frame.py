@@ -0,0 +1,59 @@
+"""
+Per-frame preprocessing cost: legacy copies vs. the shared Frame.
+
+Legacy path (per 1080p frame): AI copy, full BGR→RGB, two resizes, a second
+BGR→RGB inside the detector, the output copy and one copy per stream client.
+Frame path: one resize + one colour conversion on the small view, shared by
+detector, encoder and tracker pool, and a single annotation copy.
+
+Run: python tests/benchmark_frame.py
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_module.frame import Frame
+
+SCALE = 0.5
+CLIENTS = 2
+ITERATIONS = 200
+
+
+def legacy(image):
+    copied = image.copy()                                            # ai_loop copy
+    rgb = cv2.cvtColor(copied, cv2.COLOR_BGR2RGB)
+    small_rgb = cv2.resize(rgb, (0, 0), fx=SCALE, fy=SCALE)
+    small_bgr = cv2.resize(copied, (0, 0), fx=SCALE, fy=SCALE)
+    cv2.cvtColor(small_bgr, cv2.COLOR_BGR2RGB)                       # detector re-converts
+    output = image.copy()                                            # output_frame copy
+    for _ in range(CLIENTS):
+        output.copy()                                                # per-client copy
+    return small_rgb
+
+
+def shared(image):
+    frame = Frame(image)
+    frame.small_bgr(SCALE)                                           # detector / tracker pool
+    small_rgb = frame.small_rgb(SCALE)                               # encoder (and dlib detector)
+    frame.annotated()                                                # overlay copy
+    return small_rgb
+
+
+def bench(fn):
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, size=(1080, 1920, 3), dtype=np.uint8) for _ in range(4)]
+    fn(images[0])
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(images[i % len(images)].copy())
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+if __name__ == "__main__":
+    full_mb = 1080 * 1920 * 3 / 1e6
+    print(f"Legacy : {bench(legacy):6.2f} ms/frame, ~{full_mb * (4 + CLIENTS):.1f} MB full-frame traffic")
+    print(f"Frame  : {bench(shared):6.2f} ms/frame, ~{full_mb * 1:.1f} MB full-frame traffic")
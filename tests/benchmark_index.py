@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_module.gallery import GalleryMatcher
+from ai_module.face_index import IVFIndex
+
+GALLERY_SIZES = [1000, 10000, 100000]
+PHOTOS_PER_STUDENT = 2
+QUERIES = 200
+
+
+def make_gallery(size, seed=0):
+    """Synthetic campus: unit-ish 128-D identities with a few noisy photos each."""
+    rng = np.random.default_rng(seed)
+    students = size // PHOTOS_PER_STUDENT
+    identities = rng.normal(0, 0.09, (students, 128)).astype(np.float32)
+    encodings = np.repeat(identities, PHOTOS_PER_STUDENT, axis=0)
+    encodings += rng.normal(0, 0.02, encodings.shape).astype(np.float32)
+    names = [f"student_{i // PHOTOS_PER_STUDENT}" for i in range(len(encodings))]
+
+    picks = rng.integers(0, students, QUERIES)
+    queries = identities[picks] + rng.normal(0, 0.02, (QUERIES, 128)).astype(np.float32)
+    return encodings, names, queries
+
+
+def time_per_query(index, queries):
+    start = time.perf_counter()
+    results = [index.match(q[None, :])[0] for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def run_benchmark():
+    print("==================================================")
+    print("   SMART PRESENCE - MATCH INDEX BENCHMARK         ")
+    print("==================================================")
+
+    for size in GALLERY_SIZES:
+        encodings, names, queries = make_gallery(size)
+        print(f"\n[GALLERY] {size} encodings")
+
+        exact = GalleryMatcher(encodings, names)
+        start = time.perf_counter()
+        ivf = IVFIndex(encodings, names)
+        build = time.perf_counter() - start
+
+        exact_t, truth = time_per_query(exact, queries)
+        ivf_t, approx = time_per_query(ivf, queries)
+        recall = np.mean([a.index == t.index for a, t in zip(approx, truth)])
+
+        print(f"  - Brute force : {exact_t * 1000:.3f} ms per face")
+        print(f"  - IVF         : {ivf_t * 1000:.3f} ms per face "
+              f"(build {build:.2f}s, {len(ivf._lists)} lists, nprobe={ivf.nprobe})")
+        print(f"  - Recall@1    : {recall * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -20,33 +20,46 @@ def app():
     original_db_path = common.DB_PATH
     common.DB_PATH = os.path.abspath(db_path)
     
-    app = create_app()
-    app.config.update({
+    # Initialize DB schema before create_app() starts the mail queue on it
+    from web_app.database.init_db import init_db
+    init_db(common.DB_PATH)
+
+    app = create_app({
         "TESTING": True,
         "DATABASE": common.DB_PATH,
+        "DB_PATH": common.DB_PATH,
         "WTF_CSRF_ENABLED": False,  # Disable CSRF for easier API testing
     })
 
-    # Initialize DB schema
-    with app.app_context():
-        from web_app.database.init_db import init_db
-        init_db()
-
     yield app
 
-    # Cleanup
+    # Cleanup: stop mail senders and close pooled / watch connections first so WAL files go with the DB
+    from web_app import mail_queue
+    mail_queue.stop_all()
     common.DB_PATH = original_db_path
-    if os.path.exists(db_path):
-        try:
-            os.remove(db_path)
-        except:
-            pass
+    SettingsManager.invalidate()
+    from ai_module import db
+    db.close_all()
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except:
+                pass
 
 @pytest.fixture
 def client(app):
     """A test client for the app."""
     return app.test_client()
 
+@pytest.fixture
+def auth_client(client):
+    """A test client logged in as user 1, with routes reading the test DB."""
+    client.application.config['DB_PATH'] = common.DB_PATH
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    return client
+
 @pytest.fixture
 def runner(app):
     """A test runner for the app's CLI commands."""
@@ -55,4 +68,6 @@ def runner(app):
 @pytest.fixture(autouse=True)
 def clean_settings():
     """Reset SettingsManager cache before each test."""
-    SettingsManager._cache = {}
+    SettingsManager.invalidate()
+    from ai_module import schedule_timeline
+    schedule_timeline.invalidate()
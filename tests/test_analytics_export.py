@@ -0,0 +1,73 @@
+import json
+import sqlite3
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from ai_module import common
+from ai_module import db
+from web_app import analytics_export
+
+
+@pytest.fixture
+def history(app, monkeypatch):
+    monkeypatch.setattr(common, 'EXPORT_FETCH_ROWS', 4)    # Several chunks per file
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name, student_id) VALUES ('lena', 'S-9')").lastrowid
+        sched = conn.execute("INSERT INTO class_schedules (day_of_week, start_time, end_time, class_name) "
+                             "VALUES ('Monday', '09:00', '10:00', 'Physics')").lastrowid
+        for n in range(10):
+            conn.execute("INSERT INTO attendance_logs (student_id, status, timestamp, schedule_id) "
+                         "VALUES (?, ?, ?, ?)", (sid, 'Late' if n % 2 else 'Present',
+                                                 f'2026-03-{2 + n // 4:02d} 12:{n:02d}:00', sched if n % 3 else None))
+    return sid, sched
+
+
+def test_npz_columns(history):
+    sid, sched = history
+    out = BytesIO()
+    with db.connect(common.DB_PATH) as conn:
+        assert analytics_export.write(conn, out, 'npz') == 10
+    out.seek(0)
+    cols = analytics_export.load_npz(out)
+
+    assert cols['timestamp'][0] == np.datetime64('2026-03-02T12:00:00')
+    assert str(cols['log_date'][0]) == '2026-03-02'          # Local date of a midday UTC log
+    assert list(cols['status'][:2]) == ['Present', 'Late']
+    assert list(cols['schedule_id'][:3]) == [-1, sched, sched]
+    assert list(cols['class_name'][:2]) == ['', 'Physics']
+    assert set(cols['student_code']) == {'S-9'} and (cols['student_id'] == sid).all()
+
+
+def test_snapshot_appends_new_days(history, tmp_path):
+    out = str(tmp_path / "export")
+    first = analytics_export.snapshot(out, 'npz', common.DB_PATH, until='2026-03-02')
+    assert first['rows'] == 4 and first['file'] == 'attendance_2026-03-02_2026-03-02.npz'
+    assert analytics_export.snapshot(out, 'npz', common.DB_PATH, until='2026-03-02') is None
+
+    second = analytics_export.snapshot(out, 'npz', common.DB_PATH, until='2026-03-31')
+    assert second['from'] == '2026-03-03' and second['rows'] == 6
+    with open(tmp_path / "export" / analytics_export.MANIFEST) as f:
+        manifest = json.load(f)
+    assert manifest['last_date'] == '2026-03-31' and len(manifest['parts']) == 2
+    ids = np.concatenate([analytics_export.load_npz(str(tmp_path / "export" / p['file']))['id']
+                          for p in manifest['parts']])
+    assert len(set(ids)) == 10
+
+
+def test_parquet_roundtrip(history):
+    pq = pytest.importorskip('pyarrow.parquet')
+    out = BytesIO()
+    with db.connect(common.DB_PATH) as conn:
+        analytics_export.write(conn, out, 'parquet', since='2026-03-03')
+    out.seek(0)
+    table = pq.read_table(out)
+    assert table.num_rows == 6 and table.column_names == analytics_export.COLUMNS
+
+
+def test_export_endpoint(auth_client, history):
+    resp = auth_client.get('/api/export?format=npz&date=2026-03-04')
+    assert resp.status_code == 200
+    assert 'attendance_2026-03-04.npz' in resp.headers['Content-Disposition']
+    assert len(analytics_export.load_npz(BytesIO(resp.get_data()))['id']) == 2
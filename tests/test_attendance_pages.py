@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from ai_module import common
+
+
+@pytest.fixture
+def logs(auth_client):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name) VALUES ('jade')").lastrowid
+        sched = conn.execute("INSERT INTO class_schedules (day_of_week, start_time, end_time) "
+                             "VALUES ('Monday', '09:00', '10:00')").lastrowid
+        ids = []
+        for n in range(25):
+            # Pairs share a timestamp so the id tie-break matters
+            ids.append(conn.execute(
+                "INSERT INTO attendance_logs (student_id, status, source, schedule_id, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sid, 'Late' if n % 5 == 0 else 'Present', 'manual' if n % 2 else 'ai',
+                 sched if n % 3 == 0 else None, f'2026-03-{1 + n // 10:02d} 09:{n // 2:02d}:00')).lastrowid)
+    return auth_client, ids, sched
+
+
+def _pages(client, query):
+    rows, cursor = [], None
+    while True:
+        data = client.get(f'/api/attendance?{query}' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        rows += data['rows']
+        cursor = data['next_cursor']
+        assert data['has_more'] == (cursor is not None)
+        if not cursor:
+            return rows
+
+
+def test_keyset_pages_cover_every_row_once(logs):
+    client, ids, _ = logs
+    rows = _pages(client, 'limit=4')
+    keys = [(r['timestamp'], r['id']) for r in rows]
+    assert keys == sorted(keys, reverse=True)
+    assert sorted(r['id'] for r in rows) == ids
+
+
+def test_filters(logs):
+    client, ids, sched = logs
+    late = _pages(client, 'limit=2&status=Late')
+    assert sorted(r['id'] for r in late) == ids[::5]
+
+    rows = _pages(client, f'limit=3&schedule_id={sched}&source=ai')
+    assert sorted(r['id'] for r in rows) == [i for n, i in enumerate(ids) if n % 3 == 0 and n % 2 == 0]
+
+    no_class = client.get('/api/attendance?schedule_id=0&limit=500').get_json()['rows']
+    assert len(no_class) == len([n for n in range(25) if n % 3])
+
+    day = client.get('/api/attendance?limit=500&from=2026-03-02&to=2026-03-02').get_json()['rows']
+    expected = sqlite3.connect(common.DB_PATH).execute(
+        "SELECT COUNT(*) FROM attendance_logs WHERE log_date = '2026-03-02'").fetchone()[0]
+    assert len(day) == expected
+
+
+def test_since_id_returns_only_newer_rows(logs):
+    client, ids, _ = logs
+    data = client.get(f'/api/attendance?since_id={ids[-3]}').get_json()
+    assert [r['id'] for r in data['rows']] == ids[-2:]
+    assert data['last_id'] == ids[-1] and not data['has_more']
+
+    data = client.get(f'/api/attendance?since_id={ids[-1]}').get_json()
+    assert data['rows'] == [] and data['last_id'] == ids[-1]
+
+    data = client.get(f'/api/attendance?since_id={ids[0]}&limit=5').get_json()
+    assert [r['id'] for r in data['rows']] == ids[1:6] and data['has_more']
+
+
+def test_bad_parameters(logs):
+    client, _, _ = logs
+    assert client.get('/api/attendance?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/attendance?since_id=abc').status_code == 400
@@ -0,0 +1,158 @@
+import sqlite3
+from ai_module import common
+from ai_module.attendance_writer import AttendanceWriter
+
+
+def _add_students(*names):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        for name in names:
+            conn.execute("INSERT INTO students (name) VALUES (?)", (name,))
+        conn.commit()
+
+
+def _logs():
+    with sqlite3.connect(common.DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(r) for r in conn.execute(
+            "SELECT al.*, s.name FROM attendance_logs al JOIN students s ON s.id = al.student_id ORDER BY al.id")]
+
+
+def test_batched_attendance_and_flush(app):
+    names = [f"student_{i}" for i in range(40)]
+    _add_students(*names)
+
+    writer = AttendanceWriter(flush_interval=5.0)
+    writer.start()
+    for name in names:
+        assert writer.log_attendance(name, 'On Time', None, '2026-01-01T09:00:00')
+    assert writer.flush(timeout=5)
+
+    rows = _logs()
+    assert len(rows) == 40
+    assert {r['status'] for r in rows} == {'On Time'}
+    metrics = writer.metrics()
+    assert metrics['committed_events'] == 40
+    assert metrics['batches'] == 1
+    assert metrics['queue_depth'] == 0
+    writer.stop()
+
+
+def test_last_seen_and_disappearance(app):
+    _add_students("alice")
+    writer = AttendanceWriter()
+    writer.start()
+    writer.log_attendance("alice", 'Late', None, '2026-01-01T09:00:00')
+    writer.update_last_seen([("alice", None, '2026-01-01T09:05:00')])
+    writer.update_last_seen([("alice", None, '2026-01-01T09:10:00'), ("ghost", None, '2026-01-01T09:10:00')])
+    writer.log_disappearance("alice", "Last seen 20 min ago")
+    writer.stop(flush=True)
+
+    rows = _logs()
+    assert [r['status'] for r in rows] == ['Late', 'Disappeared']
+    assert rows[0]['last_seen'] == '2026-01-01T09:10:00'
+
+
+def test_full_queue_never_blocks(app):
+    writer = AttendanceWriter(max_queue=2)
+    writer._running = True   # accept events without a consumer thread
+    assert writer.log_attendance("a", 'Present')
+    assert writer.log_attendance("b", 'Present')
+    assert writer.log_attendance("c", 'Present') is False
+    assert writer.metrics()['dropped'] == 1
+
+
+def test_stopped_writer_rejects_events(app):
+    writer = AttendanceWriter()
+    assert writer.log_attendance("alice", 'Present') is False
+
+
+def test_presence_heartbeat_is_rate_limited(app, tmp_path, monkeypatch):
+    from ai_module.recognition_system import FaceSystemThreaded
+    monkeypatch.setattr(common, 'ENCODINGS_STORE_DIR', str(tmp_path / "store"))
+    _add_students("alice", "bob")
+
+    system = FaceSystemThreaded()
+    sent = []
+    monkeypatch.setattr(system.writer, 'update_last_seen', lambda entries: sent.append(entries) or True)
+    schedule = {'id': -1, 'class_name': 'Manual', 'start_time': '00:00', 'end_time': '23:59'}
+
+    system.last_seen = {'alice': 1000.0, 'bob': 1000.0}
+    system.flush_presence(schedule)
+    assert sorted(e[0] for e in sent[0]) == ['alice', 'bob']
+
+    # Within the per-student delta nothing is re-sent, even after the interval
+    system.last_presence_flush = 0
+    system.last_seen['alice'] = 1000.0 + common.PRESENCE_MIN_DELTA - 1
+    system.last_seen['bob'] = 1000.0 + common.PRESENCE_MIN_DELTA
+    system.flush_presence(schedule)
+    assert [e[0] for e in sent[1]] == ['bob']
+
+
+def test_session_restored_after_restart(app, tmp_path, monkeypatch):
+    from ai_module.recognition_system import FaceSystemThreaded
+    monkeypatch.setattr(common, 'ENCODINGS_STORE_DIR', str(tmp_path / "store"))
+    _add_students("alice")
+
+    writer = AttendanceWriter()
+    writer.start()
+    writer.log_attendance("alice", 'Present', None, '2026-01-01T09:00:00')
+    writer.stop()
+
+    system = FaceSystemThreaded()
+    system.maybe_reset_session({'id': -1, 'class_name': 'Manual', 'start_time': '00:00', 'end_time': '23:59'})
+    assert "alice:-1" in system.session_logged
+    assert 'alice' in system.last_seen
+
+
+def test_batch_publishes_only_its_own_rows(app):
+    from ai_module import db
+    from ai_module.attendance_writer import ATTENDANCE
+    _add_students('ada', 'bob')
+
+    writer = AttendanceWriter()
+    conn = db.dedicated(common.DB_PATH)
+
+    def manual_mark(sql):
+        # Another connection commits just as the batch opens its transaction
+        if sql.startswith('BEGIN'):
+            conn.set_trace_callback(None)
+            with sqlite3.connect(common.DB_PATH) as other:
+                other.execute("INSERT INTO attendance_logs (student_id, status, source) "
+                              "SELECT id, 'Present', 'manual' FROM students WHERE name = 'bob'")
+
+    conn.set_trace_callback(manual_mark)
+    rows = writer._write_batch(conn, [(ATTENDANCE, 'ada', 'On Time', None, None)])
+    conn.close()
+
+    assert [(r['name'], r['source']) for r in rows] == [('ada', 'ai')]
+    assert len(_logs()) == 2
+
+
+def test_failed_batch_lets_the_student_be_logged_again(app, tmp_path, monkeypatch):
+    from ai_module import attendance_writer
+    from ai_module.recognition_system import FaceSystemThreaded
+    monkeypatch.setattr(common, 'ENCODINGS_STORE_DIR', str(tmp_path / "store"))
+    monkeypatch.setattr(attendance_writer.time, 'sleep', lambda s: None)   # Skip the retry backoff
+    _add_students("alice")
+
+    system = FaceSystemThreaded()
+    schedule = {'id': -1, 'class_name': 'Manual', 'start_time': '00:00', 'end_time': '23:59'}
+    monkeypatch.setattr(system, 'get_active_schedule', lambda: schedule)
+
+    write_batch = system.writer._write_batch
+
+    def locked(conn, batch):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(system.writer, '_write_batch', locked)
+    system.writer.start()
+    system.log_attendance("alice")
+    assert "alice:-1" in system.session_logged
+    assert system.writer.flush(timeout=5)
+    assert system.writer.metrics()['failed_batches'] == 1
+    assert "alice:-1" not in system.session_logged      # Forgotten: not silently lost
+
+    monkeypatch.setattr(system.writer, '_write_batch', write_batch)
+    system.log_attendance("alice")                       # The next sighting logs again
+    system.writer.stop(flush=True)
+    system.tracker_pool.stop()
+    assert [r['name'] for r in _logs()] == ['alice']
@@ -0,0 +1,29 @@
+from ai_module.cadence import CadenceController
+
+
+def test_detects_every_k_frames():
+    c = CadenceController(frame_skip=3, cpu_budget=1.0, max_skip=30, confidence_floor=7.0)
+    assert c.should_detect(1)
+    c.detected(1, 0.001)
+    assert [c.should_detect(seq) for seq in (2, 3, 4)] == [False, False, True]
+
+
+def test_low_tracker_confidence_forces_detection():
+    c = CadenceController(frame_skip=10, cpu_budget=1.0, confidence_floor=7.0)
+    c.should_detect(1)
+    c.detected(1, 0.001)
+    assert not c.should_detect(2, tracking_confidence=15.0)
+    assert c.should_detect(3, tracking_confidence=4.0)
+    assert c.metrics()['forced_detections'] == 1
+
+
+def test_k_adapts_to_latency_and_budget():
+    c = CadenceController(frame_skip=2, cpu_budget=0.25, max_skip=30)
+    for seq in range(10):
+        c.observe_frame(seq, now=seq / 30.0)        # 30 fps capture
+    c.detected(10, 0.100)                            # 100 ms per detection
+    # 0.1 s / (1/30 s * 0.25) = 12 frames between detections
+    assert c.k == 12
+
+    c.detected(22, 10.0)                             # pathological latency is capped
+    assert c.k == 30
@@ -0,0 +1,31 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from ai_module import common
+
+
+def _day(offset):
+    return (datetime.now() - timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+def test_chart_series_groups_by_day_and_fills_gaps(auth_client):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        a = conn.execute("INSERT INTO students (name) VALUES ('a')").lastrowid
+        b = conn.execute("INSERT INTO students (name) VALUES ('b')").lastrowid
+        conn.execute("INSERT INTO students (name) VALUES ('c')")
+        conn.executemany("INSERT INTO attendance_logs (student_id, status, timestamp) VALUES (?, ?, ?)", [
+            (a, 'On Time', f'{_day(0)} 08:00:00'),
+            (a, 'Present', f'{_day(0)} 13:00:00'),        # Same student twice: counted once
+            (b, 'Late', f'{_day(0)}T09:15:00'),            # ISO-style timestamps too
+            (b, 'Disappeared', f'{_day(2)} 10:00:00'),     # Neither present nor late
+            (a, 'Excused', f'{_day(2)} 08:00:00'),
+            (a, 'Late', f'{_day(7)} 08:00:00'),            # Outside a 7-day window
+        ])
+
+    data = auth_client.get('/api/stats/chart?days=7').get_json()
+
+    assert data['labels'] == [_day(i) for i in range(6, -1, -1)]
+    assert data['present'] == [0, 0, 0, 0, 1, 0, 1]
+    assert data['late'] == [0, 0, 0, 0, 0, 0, 1]
+    assert data['absent'] == [3, 3, 3, 3, 2, 3, 1]
+    assert data['total_students'] == 3
@@ -0,0 +1,89 @@
+import sqlite3
+
+from ai_module import common
+from web_app.database import daily_summary
+
+
+def _connect():
+    conn = sqlite3.connect(common.DB_PATH)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _summary(conn):
+    return conn.execute("""
+        SELECT date, schedule_id, student_id, best_status FROM daily_attendance_summary
+        ORDER BY date, schedule_id, student_id
+    """).fetchall()
+
+
+def _log(conn, sid, status, ts, schedule_id=None):
+    return conn.execute(
+        "INSERT INTO attendance_logs (student_id, status, timestamp, schedule_id) VALUES (?, ?, ?, ?)",
+        (sid, status, ts, schedule_id)).lastrowid
+
+
+def test_triggers_keep_best_status(app):
+    conn = _connect()
+    sid = conn.execute("INSERT INTO students (name) VALUES ('erin')").lastrowid
+    sched = conn.execute("INSERT INTO class_schedules (day_of_week, start_time, end_time) "
+                         "VALUES ('Monday', '09:00', '10:00')").lastrowid
+
+    late = _log(conn, sid, 'Late', '2026-03-02 09:20:00', sched)
+    _log(conn, sid, 'Disappeared', '2026-03-02 09:50:00')            # No class → schedule_id 0
+    assert _summary(conn) == [('2026-03-02', 0, sid, 'Disappeared'), ('2026-03-02', sched, sid, 'Late')]
+
+    ontime = _log(conn, sid, 'On Time', '2026-03-02 09:05:00', sched)
+    _log(conn, sid, 'Absent', '2026-03-02 09:30:00', sched)          # Lower rank: ignored
+    assert _summary(conn)[1][3] == 'On Time'
+
+    # Override downgrades the best row: the group is recomputed from the remaining logs
+    conn.execute("UPDATE attendance_logs SET status = 'Excused' WHERE id = ?", (ontime,))
+    assert _summary(conn)[1][3] == 'Late'
+
+    conn.execute("DELETE FROM attendance_logs WHERE id = ?", (late,))
+    assert _summary(conn)[1][3] == 'Excused'
+
+    # Heartbeats do not touch the summary; moving a log to another day does
+    conn.execute("UPDATE attendance_logs SET last_seen = '2026-03-02T10:00:00'")
+    conn.execute("UPDATE attendance_logs SET timestamp = '2026-03-03 09:05:00' WHERE id = ?", (ontime,))
+    assert [row[:1] + row[3:] for row in _summary(conn)] == [
+        ('2026-03-02', 'Disappeared'), ('2026-03-02', 'Absent'), ('2026-03-03', 'Excused')]
+
+    conn.execute("DELETE FROM attendance_logs")
+    assert _summary(conn) == []
+    conn.close()
+
+
+def test_rebuild_matches_incremental(app):
+    conn = _connect()
+    ids = [conn.execute("INSERT INTO students (name) VALUES (?)", (f"s{i}",)).lastrowid for i in range(4)]
+    sched = conn.execute("INSERT INTO class_schedules (day_of_week, start_time, end_time) "
+                         "VALUES ('Monday', '09:00', '10:00')").lastrowid
+    statuses = common.VALID_STATUSES
+    for n in range(60):
+        _log(conn, ids[n % 4], statuses[(n * 7) % len(statuses)], f'2026-03-{1 + n % 5:02d} 09:{n:02d}:00',
+             None if n % 3 else sched)
+    incremental = _summary(conn)
+
+    assert daily_summary.rebuild(conn) == len(incremental)
+    assert _summary(conn) == incremental
+
+    conn.execute("DELETE FROM daily_attendance_summary WHERE date >= '2026-03-04'")
+    daily_summary.rebuild(conn, since='2026-03-04')
+    assert _summary(conn) == incremental
+    conn.close()
+
+
+def test_rebuild_command(app, capsys):
+    conn = _connect()
+    sid = conn.execute("INSERT INTO students (name) VALUES ('frank')").lastrowid
+    _log(conn, sid, 'Present', '2026-03-02 09:00:00')
+    conn.execute("DELETE FROM daily_attendance_summary")
+    conn.commit()
+    conn.close()
+
+    daily_summary.main(['--rebuild', '--db', common.DB_PATH])
+    assert "Rebuilt 1 summary rows" in capsys.readouterr().out
+    with _connect() as conn:
+        assert _summary(conn) == [('2026-03-02', 0, sid, 'Present')]
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from ai_module import db
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "pool.db")
+    with db.connect(path) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    yield path
+    db.close_all()
+
+
+def test_pragmas(path):
+    conn = db.connect(path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1          # NORMAL
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+    conn.close()
+
+
+def test_close_returns_connection_to_pool(path):
+    first = db.connect(path, row_factory=sqlite3.Row)
+    first.execute("INSERT INTO t (v) VALUES ('uncommitted')")
+    first.close()
+    first.close()   # Double close must not put it in the pool twice
+
+    again = db.connect(path)
+    other = db.connect(path)
+    assert again is first and other is not first
+    assert again.row_factory is None                                     # Reset on release
+    assert again.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0    # Rolled back
+    again.close()
+    other.close()
+
+    stats = db.metrics()[os.path.abspath(path)]
+    assert stats['created'] == 2 and stats['reused'] == 2
+    assert stats['in_use'] == 0 and stats['idle'] == 2 and stats['max_in_use'] == 2
+
+
+def test_context_manager_commits_and_releases(path):
+    with db.connect(path) as conn:
+        conn.execute("INSERT INTO t (v) VALUES ('kept')")
+    with db.connect(path) as conn:
+        assert conn.execute("SELECT v FROM t").fetchall() == [('kept',)]
+    assert db.metrics()[os.path.abspath(path)]['in_use'] == 0
+
+
+def test_open_reader_never_blocks_writer(path):
+    reader = db.connect(path)
+    reader.execute("BEGIN")
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0   # Holds a read snapshot
+
+    done = threading.Event()
+
+    def write():
+        writer = db.dedicated(path)    # Like the attendance writer thread
+        writer.execute("INSERT INTO t (v) VALUES ('ai')")
+        writer.commit()
+        writer.close()
+        done.set()
+
+    start = time.monotonic()
+    threading.Thread(target=write).start()
+    assert done.wait(2)
+    assert time.monotonic() - start < 1.0
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0   # Snapshot unchanged
+    reader.rollback()
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    reader.close()
+
+
+def test_replaced_file_is_not_served_from_pool(path):
+    db.connect(path).close()
+    db.close_all()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    with db.connect(path) as conn:
+        conn.execute("CREATE TABLE fresh (x)")
+
+    stale = db.connect(path)
+    os.replace(path, path + '.old')          # e.g. a restored backup moved into place
+    with sqlite3.connect(path) as other:
+        other.execute("CREATE TABLE restored (x)")
+    stale.close()
+
+    with db.connect(path) as conn:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {'restored'}
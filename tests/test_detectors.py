@@ -0,0 +1,48 @@
+import os
+import cv2
+import numpy as np
+
+from ai_module.detectors import BaseDetector, DlibDetector
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class BrightSpotDetector(BaseDetector):
+    """Reports every 20x20 white square as a 'face'; records each call's input size."""
+    def __init__(self, mosaic):
+        self.supports_mosaic = mosaic
+        self.calls = []
+
+    def detect_faces(self, frame):
+        self.calls.append(frame.shape[:2])
+        mask = (frame[:, :, 0] == 255).astype(np.uint8)
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        return [(y, x + w, y + h, x) for x, y, w, h, _ in stats[1:]]
+
+
+def _frame():
+    frame = np.zeros((540, 960, 3), dtype=np.uint8)
+    frame[100:120, 100:120] = 255
+    frame[400:420, 700:720] = 255
+    frame[10:30, 900:920] = 255   # not tracked, must not be found in ROI mode
+    return frame
+
+
+def test_roi_crops_map_back_to_frame_coords():
+    for mosaic in (False, True):
+        det = BrightSpotDetector(mosaic)
+        boxes = det.detect_rois(_frame(), [(100, 120, 120, 100), (400, 720, 420, 700)])
+        assert sorted(boxes) == [(100, 120, 120, 100), (400, 720, 420, 700)]
+        assert len(det.calls) == (1 if mosaic else 2)
+        assert all(h * w < 540 * 960 / 10 for h, w in det.calls)
+
+
+def test_dlib_roi_matches_full_frame():
+    img = cv2.imread(os.path.join(DATA_DIR, 'obama_1.jpg'))
+    det = DlibDetector()
+    full = det.detect_faces(img)
+    assert full
+    roi = det.detect_rois(img, full)
+    assert len(roi) == len(full)
+    for (t1, r1, b1, l1), (t2, r2, b2, l2) in zip(sorted(full), sorted(roi)):
+        assert abs(t1 - t2) < 15 and abs(l1 - l2) < 15
@@ -0,0 +1,152 @@
+import json
+import os
+import pickle
+import numpy as np
+from ai_module.encoding_store import EncodingStore, migrate_from_pickle, HEADER_FILE, NAMES_FILE
+from ai_module.gallery import GalleryMatcher
+
+
+def test_append_and_load(tmp_path):
+    store = EncodingStore(str(tmp_path / "store"))
+    assert store.load()["names"] == []
+
+    store.append("alice", np.full(128, 0.1))
+    store.extend(["bob", "carol"], [np.full(128, 0.2), np.full(128, 0.3)])
+
+    data = store.load()
+    assert data["names"] == ["alice", "bob", "carol"]
+    assert data["encodings"].shape == (3, 128)
+    assert data["encodings"].dtype == np.float32
+    assert np.allclose(data["encodings"][1], 0.2)
+    assert store.read_header()["count"] == 3
+
+
+def test_torn_write_is_ignored(tmp_path):
+    """Bytes past the committed header count are dropped by readers and writers."""
+    store = EncodingStore(str(tmp_path / "store"))
+    store.append("alice", np.full(128, 0.1))
+    with open(os.path.join(store.path, NAMES_FILE), "ab") as f:
+        f.write(b'{"name": "ghost"')
+
+    assert store.load()["names"] == ["alice"]
+    store.append("bob", np.full(128, 0.2))
+    assert store.load()["names"] == ["alice", "bob"]
+
+
+def test_remove_and_compact(tmp_path):
+    store = EncodingStore(str(tmp_path / "store"))
+    store.extend(["alice", "bob", "alice"], np.random.rand(3, 128))
+    assert store.remove("alice") == 2
+    assert store.load()["names"] == ["bob"]
+
+    before = store.load()                   # A reader's mapping of the old files
+    store.compact()
+    header = store.read_header()
+    assert header["count"] == 1 and header["deleted"] == []
+    assert store.load()["names"] == ["bob"]
+    assert before["names"] == ["bob"] and before["encodings"].shape == (1, 128)
+
+    store.append("dave", np.random.rand(128))
+    store.remove("bob")
+    store.compact()
+    assert store.load()["names"] == ["dave"]
+    assert sorted(e for e in os.listdir(store.path) if e.startswith("gen-")) == ["gen-000002"]
+
+
+def test_crashed_compaction_leaves_store_intact(tmp_path, monkeypatch):
+    """Until CURRENT is switched, readers keep the old generation whole."""
+    store = EncodingStore(str(tmp_path / "store"))
+    store.extend(["alice", "bob"], np.random.rand(2, 128))
+    store.remove("alice")
+
+    replace = EncodingStore._replace
+
+    def crash_on_switch(path, text):
+        if path.endswith("CURRENT"):
+            raise OSError("power cut")
+        replace(path, text)
+    monkeypatch.setattr(EncodingStore, '_replace', staticmethod(crash_on_switch))
+    try:
+        store.compact()
+    except OSError:
+        pass
+    monkeypatch.undo()
+    assert os.path.exists(os.path.join(store.path, "gen-000001", HEADER_FILE))   # Fully written, never switched to
+
+    header = store.read_header()
+    assert header["count"] == 2 and header["deleted"] == [0]
+    assert store.load()["names"] == ["bob"]
+    store.compact()                         # The half-written generation is rebuilt
+    assert store.load()["names"] == ["bob"] and store.read_header()["count"] == 1
+
+
+def test_concurrent_appends_from_two_processes(tmp_path):
+    """Appends from separate processes (CLI enroller + web app) never overwrite each other."""
+    import subprocess
+    import sys
+    path = str(tmp_path / "store")
+    EncodingStore(path).create()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = ("import sys, numpy as np\n"
+              "from ai_module.encoding_store import EncodingStore\n"
+              "store = EncodingStore(sys.argv[1])\n"
+              "for i in range(40):\n"
+              "    store.append(f'{sys.argv[2]}{i}', np.full(128, i, dtype=np.float32))\n")
+    procs = [subprocess.Popen([sys.executable, '-c', script, path, prefix], cwd=root) for prefix in 'ab']
+    assert [p.wait(timeout=60) for p in procs] == [0, 0]
+
+    store = EncodingStore(path)
+    data = store.load()
+    assert store.read_header()["count"] == 80
+    assert sorted(data["names"]) == sorted(f"{p}{i}" for p in 'ab' for i in range(40))
+    for name, vector in zip(data["names"], data["encodings"]):
+        assert np.all(vector == int(name[1:]))   # Each name still sits next to its own row
+
+
+def test_migrate_from_pickle(tmp_path):
+    pickle_path = str(tmp_path / "encodings.pickle")
+    encodings = [np.random.rand(128) for _ in range(3)]
+    with open(pickle_path, "wb") as f:
+        pickle.dump({"names": ["a", "b", "c"], "encodings": encodings}, f)
+
+    store = EncodingStore(str(tmp_path / "store"))
+    assert migrate_from_pickle(pickle_path, store) == 3
+    assert not os.path.exists(pickle_path)
+    assert os.path.exists(pickle_path + ".migrated")
+
+    data = store.load()
+    assert data["names"] == ["a", "b", "c"]
+    assert np.allclose(data["encodings"], np.array(encodings, dtype=np.float32))
+    with open(os.path.join(store.path, HEADER_FILE)) as f:
+        assert json.load(f)["version"] == 1
+
+
+def test_gallery_adopts_memmap(tmp_path):
+    store = EncodingStore(str(tmp_path / "store"))
+    store.extend(["alice", "bob"], [np.full(128, 0.1), np.full(128, 0.2)])
+    data = store.load()
+
+    gallery = GalleryMatcher(data["encodings"], data["names"])
+    assert np.shares_memory(gallery._matrix, data["encodings"])
+    assert gallery.name_of(gallery.match([np.full(128, 0.2)])[0].index) == "bob"
+    gallery.add("carol", np.full(128, 0.3))
+    assert gallery.name_of(gallery.match([np.full(128, 0.3)])[0].index) == "carol"
+
+
+def test_enroll_sees_faces_enrolled_elsewhere(auth_client, tmp_path, monkeypatch):
+    import base64
+    import cv2
+    import face_recognition
+    from ai_module import common
+    monkeypatch.setattr(common, 'ENCODINGS_STORE_DIR', str(tmp_path / "store"))
+    face = np.full(128, 0.1)
+    monkeypatch.setattr(face_recognition, 'face_locations', lambda rgb, model=None: [(0, 10, 10, 0)])
+    monkeypatch.setattr(face_recognition, 'face_encodings', lambda rgb, boxes: [face + 0.001])
+
+    EncodingStore().append("alice", face)     # e.g. enroll_student.py, after this process started
+    image = 'data:image/jpeg;base64,' + base64.b64encode(
+        cv2.imencode('.jpg', np.zeros((16, 16, 3), np.uint8))[1].tobytes()).decode()
+    resp = auth_client.post('/api/enroll', json={'name': 'alicia', 'student_id': 'S-9',
+                                                 'email': 'a@school.test', 'image': image})
+    assert resp.status_code == 409
+    assert resp.get_json()['matched_name'] == 'alice'
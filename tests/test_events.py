@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+
+from ai_module import common
+from ai_module import events
+from ai_module.attendance_writer import AttendanceWriter
+from ai_module.events import EventBus
+
+
+def test_since_and_resume():
+    bus = EventBus(history=3)
+    ids = [bus.publish(events.SCHEDULE, {'id': i}) for i in range(5)]
+    assert bus.since(ids[-1]) == []
+    assert [e.data['id'] for e in bus.since(ids[1])] == [2, 3, 4]
+    assert bus.since(0) is None      # Fell out of the ring: caller must resync
+
+
+def test_stream_replays_snapshots_then_follows():
+    bus = EventBus()
+    bus.publish(events.SCHEDULE, {'id': 1})
+    bus.publish(events.STATS, {'present_today': 1})
+    bus.publish(events.STATS, {'present_today': 2})
+    bus.publish(events.STATUS, {'ai_running': True})
+
+    running = threading.Event()
+    running.set()
+    stream = bus.stream(is_running=running.is_set, keepalive=0.05)
+    assert next(stream).startswith('retry:')
+    first, second = next(stream), next(stream)
+    # Only the newest status/stats, in publish order; the schedule edit is history
+    assert 'event: stats' in first and '"present_today":2' in first
+    assert 'event: status' in second
+
+    assert next(stream) == ': keepalive\n\n'
+    bus.publish(events.ATTENDANCE, {'action': 'deleted', 'id': 7})
+    chunk = next(stream)
+    assert 'event: attendance' in chunk and '"id":7' in chunk
+    assert bus.metrics()['subscribers'] == 1
+    stream.close()
+    assert bus.metrics()['subscribers'] == 0
+
+
+def test_stream_resets_client_that_fell_behind():
+    bus = EventBus(history=2)
+    for i in range(5):
+        bus.publish(events.SCHEDULE, {'id': i})
+    stream = bus.stream(last_id=1, is_running=lambda: False)
+    next(stream)
+    assert 'event: reset' in next(stream)
+
+
+def test_writer_publishes_new_rows_and_stats(app):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        conn.execute("INSERT INTO students (name) VALUES ('alice')")
+    head = events.bus.last_id
+    writer = AttendanceWriter()
+    writer.start()
+    writer.log_attendance("alice", 'On Time', None, '2026-01-01T09:00:00')
+    writer.update_last_seen([("alice", None, '2026-01-01T09:05:00')])
+    writer.stop(flush=True)
+
+    published = events.bus.since(head)
+    kinds = [e.kind for e in published]
+    assert kinds == [events.ATTENDANCE, events.STATS]
+    rows = published[0].data['rows']
+    assert [(r['name'], r['status'], r['source']) for r in rows] == [('alice', 'On Time', 'ai')]
+    assert published[1].data['total_logs'] == 1
+
+
+def test_events_endpoint_requires_login(client):
+    assert client.get('/api/events').status_code == 401
+
+
+def test_events_endpoint(auth_client):
+    rv = auth_client.get('/api/events', buffered=False)
+    assert rv.status_code == 200
+    assert rv.mimetype == 'text/event-stream'
+    chunks = iter(rv.response)
+    assert next(chunks).startswith(b'retry:')
+    assert b'event: stats' in next(chunks)
+    rv.close()
+
+
+def test_manual_entry_publishes_delta(auth_client):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name) VALUES ('bob')").lastrowid
+    head = events.bus.last_id
+
+    assert auth_client.post('/api/attendance', json={'student_id': sid, 'status': 'Present'}).status_code == 201
+    created, stats = events.bus.since(head)
+    assert created.data['action'] == 'created'
+    assert created.data['rows'][0]['name'] == 'bob'
+    assert stats.data['present_today'] == 1
+
+    log_id = created.data['rows'][0]['id']
+    head = events.bus.last_id
+    assert auth_client.delete(f'/api/attendance/{log_id}').status_code == 200
+    deleted, stats = events.bus.since(head)
+    assert deleted.data == {'action': 'deleted', 'id': log_id}
+    assert stats.data['total_logs'] == 0
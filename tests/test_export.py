@@ -0,0 +1,41 @@
+import csv
+import sqlite3
+from io import BytesIO, StringIO
+
+import pytest
+from openpyxl import load_workbook
+
+from ai_module import common
+
+
+@pytest.fixture
+def export_client(auth_client, monkeypatch):
+    monkeypatch.setattr(common, 'EXPORT_FETCH_ROWS', 7)    # Force several batches
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name, student_id) VALUES ('kim', 'S-1')").lastrowid
+        conn.executemany("INSERT INTO attendance_logs (student_id, timestamp, notes) VALUES (?, ?, ?)",
+                         [(sid, f'2026-03-{1 + n // 1000:02d} {n // 3600 % 24:02d}:{n // 60 % 60:02d}:{n % 60:02d}',
+                           'n,"q"' if n == 0 else None) for n in range(1205)])
+    return auth_client
+
+
+def test_csv_streams_every_row(export_client):
+    resp = export_client.get('/api/export?format=csv')
+    assert resp.is_streamed
+    assert 'attendance_all.csv' in resp.headers['Content-Disposition']
+    rows = list(csv.reader(StringIO(resp.get_data(as_text=True))))
+    assert rows[0][0] == 'Student Name'
+    assert len(rows) == 1 + 1205            # No 1000-row cap
+    assert rows[-1][1:3] == ['S-1', '2026-03-01 00:00:00'] and rows[-1][5] == 'n,"q"'
+
+
+def test_xlsx_write_only(export_client):
+    resp = export_client.get('/api/export?format=xlsx&from=2026-03-01&to=2026-03-02')
+    assert resp.status_code == 200
+    ws = load_workbook(BytesIO(resp.get_data()), read_only=True)['Attendance']
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0] == ('Student Name', 'Student ID', 'Timestamp', 'Status', 'Source', 'Notes')
+    with sqlite3.connect(common.DB_PATH) as conn:
+        expected = conn.execute("SELECT COUNT(*) FROM attendance_logs "
+                                "WHERE log_date BETWEEN '2026-03-01' AND '2026-03-02'").fetchone()[0]
+    assert len(rows) - 1 == expected
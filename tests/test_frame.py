@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from ai_module.frame import Frame
+
+
+def _frame():
+    return Frame(np.random.default_rng(0).integers(0, 255, size=(540, 960, 3), dtype=np.uint8))
+
+
+def test_views_are_cached_and_read_only():
+    frame = _frame()
+    small = frame.small_bgr(0.5)
+    assert small.shape == (270, 480, 3)
+    assert frame.small_bgr(0.5) is small
+    assert frame.small_rgb(0.5) is frame.small_rgb(0.5)
+    assert np.array_equal(frame.small_rgb(0.5)[..., ::-1], small)
+    assert frame.gray(0.5).shape == (270, 480)
+    assert frame.small_bgr(1.0) is frame.bgr
+
+    for view in (frame.bgr, small, frame.small_rgb(0.5), frame.gray(0.5)):
+        with pytest.raises(ValueError):
+            view[0, 0] = 0
+
+
+def test_annotated_is_a_private_copy():
+    frame = _frame()
+    canvas = frame.annotated()
+    canvas[:] = 0
+    assert frame.bgr.any()
@@ -0,0 +1,101 @@
+import numpy as np
+from ai_module.gallery import GalleryMatcher
+
+
+def _random_gallery(n, seed=0):
+    rng = np.random.default_rng(seed)
+    encodings = [rng.normal(0, 0.1, 128) for _ in range(n)]
+    names = [f"student_{i}" for i in range(n)]
+    return encodings, names
+
+
+def test_distances_match_reference():
+    """Batched distances equal per-face Euclidean distances."""
+    encodings, names = _random_gallery(50)
+    gallery = GalleryMatcher(encodings, names)
+    probes = np.array(encodings[:5]) + 0.01
+
+    dist = gallery.distances(probes)
+    expected = np.linalg.norm(np.array(encodings)[None, :, :] - probes[:, None, :], axis=2)
+    assert dist.shape == (5, 50)
+    assert np.allclose(dist, expected, atol=1e-4)
+
+
+def test_match_best_index_and_margin():
+    encodings, names = _random_gallery(20)
+    gallery = GalleryMatcher(encodings, names)
+
+    matches = gallery.match([encodings[3], encodings[7]])
+    assert [m.index for m in matches] == [3, 7]
+    assert matches[0].distance < 1e-3
+    assert matches[0].margin > 0
+    assert gallery.name_of(matches[1].index) == "student_7"
+
+
+def test_margin_ignores_same_student():
+    """A second photo of the same student must not count as runner-up."""
+    base = np.full(128, 0.05)
+    gallery = GalleryMatcher([base, base + 0.001, base + 0.5], ["alice", "alice", "bob"])
+    match = gallery.match([base])[0]
+    assert match.index == 0
+    assert match.margin > 1.0
+
+
+def test_add_and_empty_gallery():
+    gallery = GalleryMatcher()
+    assert gallery.match([np.zeros(128)])[0].index == -1
+
+    for i in range(100):
+        gallery.add(f"s{i}", np.full(128, i / 100.0))
+    assert len(gallery) == 100
+    assert gallery.match([np.full(128, 0.42)])[0].index == 42
+
+
+def test_remove_tombstones_student():
+    encodings, names = _random_gallery(10)
+    gallery = GalleryMatcher(encodings, names)
+    assert gallery.remove("student_4") == 1
+    assert gallery.remove("student_4") == 0
+    assert len(gallery) == 9
+    assert gallery.match([encodings[4]])[0].index != 4
+    assert gallery.match([encodings[5]])[0].index == 5
+
+
+def test_ivf_index_agrees_with_brute_force():
+    from ai_module.face_index import IVFIndex
+
+    rng = np.random.default_rng(1)
+    identities = rng.normal(0, 0.09, (500, 128))
+    encodings = list(identities + rng.normal(0, 0.02, identities.shape))
+    names = [f"s{i}" for i in range(500)]
+    exact = GalleryMatcher(encodings, names)
+    ivf = IVFIndex(encodings, names)
+
+    probes = identities[:50] + rng.normal(0, 0.02, (50, 128))
+    truth = [m.index for m in exact.match(probes)]
+    approx = [m.index for m in ivf.match(probes)]
+    assert np.mean(np.array(truth) == np.array(approx)) >= 0.95
+    assert [m.index for m in ivf.match(probes, exact=True)] == truth
+
+
+def test_ivf_incremental_insert_and_delete():
+    from ai_module.face_index import IVFIndex
+
+    encodings, names = _random_gallery(200)
+    ivf = IVFIndex(encodings, names)
+    newcomer = np.full(128, 0.3)
+    ivf.add("newcomer", newcomer)
+    assert ivf.name_of(ivf.match([newcomer])[0].index) == "newcomer"
+
+    ivf.remove("newcomer")
+    assert ivf.name_of(ivf.match([newcomer])[0].index) != "newcomer"
+    assert len(ivf) == 200
+
+
+def test_build_index_selects_kind():
+    from ai_module.face_index import build_index, IVFIndex
+
+    encodings, names = _random_gallery(20)
+    assert isinstance(build_index(encodings, names, kind='exact'), GalleryMatcher)
+    assert isinstance(build_index(encodings, names, kind='ivf'), IVFIndex)
+    assert isinstance(build_index(encodings, names, kind='auto'), GalleryMatcher)
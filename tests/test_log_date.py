@@ -0,0 +1,68 @@
+import sqlite3
+
+from ai_module import common
+from web_app.database.init_db import init_db
+
+
+def test_migration_backfills_log_date_and_summary(tmp_path, monkeypatch):
+    from web_app.database import daily_summary
+    rebuilds = []
+    rebuild = daily_summary.rebuild
+    monkeypatch.setattr(daily_summary, 'rebuild', lambda conn, since=None: rebuilds.append(1) or rebuild(conn, since))
+
+    path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(path) as conn:
+        # attendance_logs as it was before log_date existed
+        conn.executescript("""
+            CREATE TABLE students (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE,
+                                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            CREATE TABLE attendance_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER NOT NULL,
+                                          timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                          status TEXT NOT NULL DEFAULT 'Present');
+            INSERT INTO students (name) VALUES ('gina');
+            INSERT INTO attendance_logs (student_id, status, timestamp) VALUES (1, 'Late', '2026-03-02 09:20:00');
+        """)
+
+    init_db(path)
+    init_db(path)   # Re-running is a no-op
+    assert len(rebuilds) == 1   # Summary built once, after the log_date backfill
+
+    with sqlite3.connect(path) as conn:
+        expected = conn.execute("SELECT DATE('2026-03-02 09:20:00', 'localtime')").fetchone()[0]
+        assert conn.execute("SELECT log_date FROM attendance_logs").fetchall() == [(expected,)]
+        assert conn.execute("SELECT date, best_status FROM daily_attendance_summary").fetchall() == \
+            [(expected, 'Late')]
+
+
+def test_log_date_follows_timestamp(app):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name) VALUES ('hank')").lastrowid
+        log_id = conn.execute("INSERT INTO attendance_logs (student_id) VALUES (?)", (sid,)).lastrowid
+        today = conn.execute("SELECT DATE('now', 'localtime')").fetchone()[0]
+        assert conn.execute("SELECT log_date FROM attendance_logs WHERE id = ?", (log_id,)).fetchone()[0] == today
+
+        conn.execute("UPDATE attendance_logs SET timestamp = '2026-01-10 12:00:00' WHERE id = ?", (log_id,))
+        moved = conn.execute("SELECT DATE('2026-01-10 12:00:00', 'localtime')").fetchone()[0]
+        assert conn.execute("SELECT log_date FROM attendance_logs WHERE id = ?", (log_id,)).fetchone()[0] == moved
+
+
+def test_date_filters_use_indexes(app):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        def plan(sql, *params):
+            return ' '.join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+        assert 'idx_attendance_date' in plan(
+            "SELECT COUNT(*) FROM attendance_logs WHERE log_date = ? AND status = 'Late'", '2026-03-02')
+        assert 'idx_attendance_schedule_date' in plan(
+            "SELECT * FROM attendance_logs WHERE schedule_id = ? AND log_date = ?", 1, '2026-03-02')
+
+
+def test_attendance_date_filter(auth_client):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name) VALUES ('ivy')").lastrowid
+        conn.execute("INSERT INTO attendance_logs (student_id, timestamp) VALUES (?, '2026-03-02 09:00:00')", (sid,))
+        conn.execute("INSERT INTO attendance_logs (student_id, timestamp) VALUES (?, '2026-03-05 09:00:00')", (sid,))
+        day = conn.execute("SELECT DATE('2026-03-02 09:00:00', 'localtime')").fetchone()[0]
+
+    rows = auth_client.get(f'/api/attendance?date={day}').get_json()['rows']
+    assert [r['log_date'] for r in rows] == [day]
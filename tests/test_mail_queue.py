@@ -0,0 +1,163 @@
+import email
+import socketserver
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from ai_module import common
+from web_app import mail_queue
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, QUIT."""
+
+    def reply(self, text):
+        self.wfile.write(text.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stand-in ESMTP')
+        rcpts = []
+        for line in self.rfile:
+            cmd = line.decode().strip()
+            verb = cmd.split(' ')[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-stand-in')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'AUTH':
+                with server.lock:
+                    server.logins += 1
+                self.reply('235 Authenticated')
+            elif verb in ('MAIL', 'RSET'):
+                rcpts = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                addr = cmd[cmd.index('<') + 1:cmd.index('>')]
+                with server.lock:
+                    if addr in server.reject:
+                        self.reply('550 No such user')
+                        continue
+                    if addr in server.fail_once:
+                        server.fail_once.discard(addr)
+                        self.reply('451 Try again later')
+                        continue
+                rcpts.append(addr)
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                with server.lock:
+                    server.messages.extend((to, data.decode()) for to in rcpts)
+                self.reply('250 Queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+        self.fail_once = set()
+        self.reject = set()
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    mail_queue.stop_all()   # The app's own queue would race the tests' queues for rows
+    server = SMTPStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for key, value in {'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': str(server.server_address[1]),
+                       'SMTP_LOGIN': 'user', 'SMTP_KEY': 'key', 'SMTP_SENDER': 'noreply@school.test',
+                       'SMTP_STARTTLS': '0', 'ADMIN_EMAIL': 'admin@school.test'}.items():
+        monkeypatch.setenv(key, value)
+    yield server
+    mail_queue.stop_all()
+    server.shutdown()
+    server.server_close()
+
+
+def _wait(queue, job_id, until=lambda job: job['done']):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = queue.job_status(job_id)
+        if until(job):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job did not settle: {queue.job_status(job_id)}")
+
+
+def test_one_session_for_many_messages(smtp):
+    queue = mail_queue.MailQueue(common.DB_PATH, workers=1)
+    job_id = queue.enqueue([('student', f's{n}@school.test', f'Report {n}', '<p>hi</p>') for n in range(5)])
+    job = _wait(queue, job_id)
+    queue.stop()
+
+    assert job['sent'] == job['total'] == 5 and job['error_report'] is None
+    assert smtp.connections == 1 and smtp.logins == 1
+    assert sorted(to for to, _ in smtp.messages) == [f's{n}@school.test' for n in range(5)]
+
+
+def test_retry_with_backoff_and_failure_report(smtp):
+    smtp.fail_once.add('slow@school.test')
+    smtp.reject.add('bad@school.test')
+    queue = mail_queue.MailQueue(common.DB_PATH, workers=2, backoff=0.05)
+    job_id = queue.enqueue([('student', to, 'Report', '<p>hi</p>')
+                            for to in ('ok@school.test', 'slow@school.test', 'bad@school.test')], label='Physics')
+    job = _wait(queue, job_id, lambda job: job['done'] and job['error_report'] == 'sent')
+    queue.stop()
+
+    assert (job['sent'], job['failed']) == (2, 1)
+    assert job['errors'][0]['recipient'] == 'bad@school.test' and job['errors'][0]['attempts'] == 1
+    with sqlite3.connect(common.DB_PATH) as conn:
+        assert conn.execute("SELECT attempts FROM mail_outbox WHERE recipient = 'slow@school.test'").fetchone()[0] == 2
+    report = [email.message_from_string(data) for to, data in smtp.messages if to == 'admin@school.test']
+    assert len(report) == 1
+    body = report[0].get_payload()[0].get_payload(decode=True).decode()
+    assert 'Physics' in body and 'bad@school.test' in body
+
+
+def test_interrupted_sends_are_requeued(smtp):
+    from web_app.app import create_app
+    mail_queue.stop_all()                       # The server died mid-send...
+    with sqlite3.connect(common.DB_PATH) as conn:
+        conn.execute("INSERT INTO mail_outbox (job_id, kind, recipient, subject, body, status, attempts) "
+                     "VALUES ('crashed', 'student', 'late@school.test', 'Report', '<p>hi</p>', 'sending', 1)")
+
+    create_app({"DB_PATH": common.DB_PATH})     # ...and booting again delivers it, no enqueue needed
+    assert _wait(mail_queue.get_queue(common.DB_PATH), 'crashed')['sent'] == 1
+    assert [to for to, _ in smtp.messages] == ['late@school.test']
+
+
+def test_class_report_returns_job_id(smtp, auth_client):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sched = conn.execute("INSERT INTO class_schedules (day_of_week, start_time, end_time, class_name, teacher_email) "
+                             "VALUES ('Monday', '09:00', '10:00', 'Chemistry', 'teacher@school.test')").lastrowid
+        sid = conn.execute("INSERT INTO students (name, email) VALUES ('mia', 'mia@school.test')").lastrowid
+        conn.execute("INSERT INTO students (name, email) VALUES ('noah', 'noah@school.test')")
+        conn.execute("INSERT INTO attendance_logs (student_id, status, schedule_id) VALUES (?, 'On Time', ?)",
+                     (sid, sched))
+
+    resp = auth_client.post(f'/api/email/class-report/{sched}')
+    assert resp.status_code == 202
+    data = resp.get_json()
+    assert (data['students_queued'], data['present'], data['absent']) == (2, 1, 1) and data['teacher_queued']
+
+    deadline = time.monotonic() + 10
+    while not (job := auth_client.get(f"/api/email/jobs/{data['job_id']}").get_json())['done']:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    assert job['sent'] == job['total'] == 3
+    assert auth_client.get('/api/email/jobs/unknown').status_code == 404
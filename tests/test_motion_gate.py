@@ -0,0 +1,42 @@
+import numpy as np
+
+from ai_module import motion_gate
+from ai_module.motion_gate import MotionGate
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(90, 110, size=(480, 640, 3), dtype=np.uint8)
+
+
+def test_static_scene_is_skipped():
+    gate = MotionGate(max_idle=60)
+    frame = _frame()
+    assert gate.check(frame, now=0)[0] == motion_gate.FULL      # first frame primes the reference
+    for t in range(1, 5):
+        assert gate.check(frame.copy(), now=t) == (motion_gate.STATIC, [])
+    assert gate.metrics()['skip_ratio'] == 0.8
+
+
+def test_local_motion_yields_padded_region():
+    gate = MotionGate(max_idle=60)
+    frame = _frame()
+    gate.check(frame, now=0)
+    moved = frame.copy()
+    moved[200:280, 300:360] = 255
+    decision, regions = gate.check(moved, now=1)
+    assert decision == motion_gate.REGIONS
+    assert len(regions) == 1
+    top, right, bottom, left = regions[0]
+    assert top <= 200 and bottom >= 280 and left <= 300 and right >= 360
+    assert motion_gate.overlaps((210, 350, 270, 310), regions)
+    assert not motion_gate.overlaps((0, 100, 100, 0), regions)
+
+
+def test_large_change_and_idle_timeout_force_full_frame():
+    gate = MotionGate(max_idle=10)
+    frame = _frame()
+    gate.check(frame, now=0)
+    assert gate.check(255 - frame, now=1)[0] == motion_gate.FULL
+    assert gate.check(255 - frame, now=2)[0] == motion_gate.STATIC
+    assert gate.check(255 - frame, now=12)[0] == motion_gate.FULL
@@ -0,0 +1,113 @@
+import sqlite3
+from datetime import datetime
+
+from ai_module.schedule_timeline import ScheduleTimeline
+
+# 2026-01-05 is a Monday
+MONDAY = datetime(2026, 1, 5)
+
+
+def _db(tmp_path, rows):
+    path = str(tmp_path / "schedule.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""CREATE TABLE class_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, day_of_week TEXT, start_time TEXT,
+            end_time TEXT, class_name TEXT, teacher_email TEXT DEFAULT '', is_active INTEGER DEFAULT 1)""")
+        conn.executemany("INSERT INTO class_schedules (day_of_week, start_time, end_time, class_name, is_active) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+    return path
+
+
+def test_active_class_lookup(tmp_path):
+    path = _db(tmp_path, [
+        ('Monday', '09:00', '10:30', 'Math', 1),
+        ('Monday', '10:00', '11:00', 'Physics', 1),   # overlaps Math
+        ('Monday', '13:00', '14:00', 'Disabled', 0),
+        ('Tuesday', '09:00', '10:00', 'Chem', 1),
+    ])
+    tl = ScheduleTimeline(path)
+
+    assert tl.active_at(MONDAY.replace(hour=8, minute=59)) is None
+    assert tl.active_at(MONDAY.replace(hour=9))['class_name'] == 'Math'
+    # Overlap: the class that started first wins; end minute is inclusive
+    assert tl.active_at(MONDAY.replace(hour=10, minute=30, second=59))['class_name'] == 'Math'
+    assert tl.active_at(MONDAY.replace(hour=10, minute=31))['class_name'] == 'Physics'
+    assert tl.active_at(MONDAY.replace(hour=11, minute=1)) is None
+    assert tl.active_at(MONDAY.replace(hour=13, minute=30)) is None
+
+
+def test_next_transition(tmp_path):
+    path = _db(tmp_path, [
+        ('Monday', '09:00', '10:00', 'Math', 1),
+        ('Tuesday', '08:00', '09:00', 'Chem', 1),
+    ])
+    tl = ScheduleTimeline(path)
+
+    assert tl.next_transition(MONDAY.replace(hour=7)) == MONDAY.replace(hour=9)
+    assert tl.next_transition(MONDAY.replace(hour=9, minute=30)) == MONDAY.replace(hour=10, minute=1)
+    assert tl.next_transition(MONDAY.replace(hour=12)) == datetime(2026, 1, 6, 8, 0)
+    assert tl.seconds_until_transition(MONDAY.replace(hour=8, minute=59, second=30)) == 30
+
+
+def test_invalidate_reloads(tmp_path):
+    path = _db(tmp_path, [('Monday', '09:00', '10:00', 'Math', 1)])
+    tl = ScheduleTimeline(path)
+    assert tl.active_at(MONDAY.replace(hour=9, minute=30))['class_name'] == 'Math'
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE class_schedules SET class_name = 'Algebra'")
+    assert tl.active_at(MONDAY.replace(hour=9, minute=30))['class_name'] == 'Math'   # still cached
+    tl.invalidate()
+    assert tl.active_at(MONDAY.replace(hour=9, minute=30))['class_name'] == 'Algebra'
+
+
+def test_invalidate_notifies_subscribers(tmp_path):
+    tl = ScheduleTimeline(_db(tmp_path, []))
+    calls = []
+    tl.subscribe(lambda: calls.append(1))
+    tl.invalidate()
+    assert calls == [1]
+
+
+def test_ai_loop_detects_at_idle_cadence_outside_class(app, tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import numpy as np
+
+    from ai_module import common, schedule_timeline
+    from ai_module.recognition_system import FaceSystemThreaded
+    monkeypatch.setattr(common, 'ENCODINGS_STORE_DIR', str(tmp_path / "store"))
+    monkeypatch.setattr(common, 'IDLE_DETECT_INTERVAL', 3600)
+
+    system = FaceSystemThreaded()
+    lookups, detections = [], []
+    monkeypatch.setattr(system, 'get_active_schedule', lambda: lookups.append(1))   # Never in class
+    monkeypatch.setattr(system.detector, 'detect', lambda frame, scale: detections.append(1) or [])
+    monkeypatch.setattr(schedule_timeline.timeline, 'seconds_until_transition', lambda: 3600)
+
+    system.is_running = True
+    loop = threading.Thread(target=system.ai_loop, daemon=True)
+    loop.start()
+    image = np.zeros((48, 64, 3), np.uint8)
+    def feed(seconds):                          # A camera feeding frames
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            system.submit_frame(image)
+            time.sleep(0.002)
+
+    try:
+        feed(0.3)
+        assert len(detections) == 1             # Recognition still runs, then pauses
+        checked = len(lookups)
+        feed(0.2)
+        assert len(lookups) == checked and len(detections) == 1
+
+        schedule_timeline.invalidate()          # A timetable edit ends the pause
+        feed(0.1)
+        assert len(lookups) > checked
+    finally:
+        system.is_running = False
+        loop.join(timeout=2)
+        system.tracker_pool.stop()
+    assert not loop.is_alive()
@@ -31,3 +31,88 @@ def test_cache_hit(app):
     # Manually corrupt DB to prove cache is used
     # (Skip this advanced test for now as we don't expose cache invalidation easily yet)
     pass
+
+def test_snapshot_is_typed(app):
+    """Snapshot exposes typed attributes and is immutable."""
+    SettingsManager.set('TOLERANCE', '0.42')
+    snap = SettingsManager.snapshot()
+    assert snap.tolerance == 0.42
+    assert snap.frame_skip == 3
+    with pytest.raises(AttributeError):
+        snap.tolerance = 0.9
+
+def test_publish_notifies_subscribers(app):
+    """publish() bumps the version only when a value really changed."""
+    seen = []
+    before = SettingsManager.snapshot()
+    SettingsManager.subscribe(seen.append)
+    try:
+        SettingsManager.set('DETECTION_SCALE', '0.75')
+        after = SettingsManager.publish()
+        assert after.version == before.version + 1
+        assert seen[-1].detection_scale == 0.75
+
+        assert SettingsManager.publish().version == after.version
+        assert len(seen) == 1
+    finally:
+        SettingsManager.unsubscribe(seen.append)
+
+def test_external_write_invalidates(app, monkeypatch):
+    """A write from another connection is picked up through PRAGMA data_version."""
+    import sqlite3
+    from ai_module import common
+    monkeypatch.setattr(SettingsManager, 'WATCH_INTERVAL', 0)
+    assert SettingsManager.snapshot().system_mode == 'auto'
+
+    with sqlite3.connect(common.DB_PATH) as conn:
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('SYSTEM_MODE', 'force_off')")
+    assert SettingsManager.snapshot().system_mode == 'force_off'
+    assert SettingsManager.get('SYSTEM_MODE') == 'force_off'
+
+def test_ai_loop_takes_published_settings(app, tmp_path, monkeypatch):
+    """The AI loop applies snapshots pushed to its subscription instead of polling snapshot()."""
+    from ai_module import common
+    from ai_module.recognition_system import FaceSystemThreaded
+    monkeypatch.setattr(common, 'ENCODINGS_STORE_DIR', str(tmp_path / "store"))
+
+    system = FaceSystemThreaded()
+    SettingsManager.subscribe(system._on_settings_published)
+    try:
+        SettingsManager.set('FRAME_SKIP', '5')
+        SettingsManager.publish()
+    finally:
+        SettingsManager.unsubscribe(system._on_settings_published)
+    assert system._idle_until == 0                    # An idle loop re-checks at once
+
+    def no_snapshot():
+        raise AssertionError("snapshot() called per frame")
+    monkeypatch.setattr(SettingsManager, 'snapshot', no_snapshot)
+    system._check_settings_change()
+    assert system.settings.frame_skip == 5
+    assert system.cadence.frame_skip == 5
+
+    system._check_settings_change()                   # Nothing new: keeps the applied snapshot
+    assert system.settings.frame_skip == 5
+    system.tracker_pool.stop()
+
+def test_unrelated_commits_do_not_reload(app, monkeypatch):
+    """Attendance commits move data_version but not the settings marker: no re-read."""
+    import sqlite3
+    from ai_module import common
+    monkeypatch.setattr(SettingsManager, 'WATCH_INTERVAL', 0)
+    SettingsManager.snapshot()
+    reads = []
+    get_all = SettingsManager.get_all
+    monkeypatch.setattr(SettingsManager, 'get_all', classmethod(lambda cls: reads.append(1) or get_all()))
+
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name) VALUES ('eve')").lastrowid
+        conn.execute("INSERT INTO attendance_logs (student_id) VALUES (?)", (sid,))
+    SettingsManager.poll()
+    assert reads == []
+
+    with sqlite3.connect(common.DB_PATH) as conn:
+        conn.execute("UPDATE settings SET value = '7' WHERE key = 'FRAME_SKIP'")
+    SettingsManager.poll()
+    assert reads == [1]
+    assert SettingsManager.snapshot().frame_skip == 7
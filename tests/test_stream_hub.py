@@ -0,0 +1,98 @@
+import threading
+import time
+import numpy as np
+
+from web_app.stream_hub import BroadcastHub, Profile
+
+
+def _image(value):
+    img = np.full((120, 160, 3), value, dtype=np.uint8)
+    img.flags.writeable = False
+    return img
+
+
+def test_one_encode_per_frame_for_many_clients():
+    hub = BroadcastHub(profiles={'hd': Profile(None, 80, 1000)})
+    running = True
+    received = [[] for _ in range(4)]
+
+    def client(out):
+        for chunk in hub.stream(lambda: running):
+            out.append(chunk)
+            if len(out) == 3:
+                break
+
+    threads = [threading.Thread(target=client, args=(out,)) for out in received]
+    for t in threads:
+        t.start()
+    while hub.clients < 4:
+        time.sleep(0.01)
+
+    for value in (10, 20, 30):
+        hub.publish(_image(value))
+        while any(len(out) < value // 10 for out in received):
+            time.sleep(0.01)
+    for t in threads:
+        t.join(2)
+
+    assert all(len(out) == 3 for out in received)
+    assert all(chunk.startswith(b'--frame\r\n') for out in received for chunk in out)
+    assert hub.encodes == 3
+    assert hub.metrics()['clients'] == 0
+
+
+def test_slow_client_jumps_to_latest_frame():
+    hub = BroadcastHub()
+    for value in range(5):
+        hub.publish(_image(value))
+    seq, frame = hub.wait_next(0, timeout=0.1)
+    assert seq == 5 and frame[0, 0, 0] == 4
+    assert hub.wait_next(5, timeout=0.05) == (5, None)
+
+
+def test_close_wakes_waiting_clients():
+    hub = BroadcastHub()
+    result = []
+    t = threading.Thread(target=lambda: result.append(hub.wait_next(0, timeout=5)))
+    t.start()
+    time.sleep(0.05)
+    start = time.time()
+    hub.close()
+    t.join(2)
+    assert result == [(0, None)] and time.time() - start < 1
+
+
+def test_profiles_encode_once_each_and_resize():
+    import cv2
+    hub = BroadcastHub()
+    img = np.random.default_rng(0).integers(0, 255, size=(1080, 1920, 3), dtype=np.uint8)
+    hub.publish(img)
+    seq, frame = hub.wait_next(0, timeout=0.1)
+
+    thumb = hub.jpeg(seq, frame, 'thumb')
+    assert hub.jpeg(seq, frame, 'thumb') is thumb
+    hd = hub.jpeg(seq, frame, 'hd')
+    assert hub.encodes == 2
+    assert cv2.imdecode(np.frombuffer(thumb, np.uint8), cv2.IMREAD_COLOR).shape == (180, 320, 3)
+    assert cv2.imdecode(np.frombuffer(hd, np.uint8), cv2.IMREAD_COLOR).shape == (1080, 1920, 3)
+    assert len(thumb) < len(hd)
+
+
+def test_bandwidth_estimator_steps_down_then_throttles():
+    from web_app.stream_hub import BandwidthEstimator
+    est = BandwidthEstimator('hd')
+    for _ in range(5):
+        est.record(300_000, 0.5)         # 600 KB/s link, 300 KB frames → 2 fps sustainable
+    assert est.profile == 'thumb'
+    for _ in range(10):
+        est.record(20_000, 1.0)          # even thumbs only manage 1 fps
+    assert est.profile == 'thumb' and est.fps < 2
+
+    fast = BandwidthEstimator('sd')
+    for _ in range(5):
+        fast.record(50_000, 0.001)
+    assert fast.profile == 'sd'          # never above the requested profile
+
+
+def test_video_feed_rejects_unknown_profile(auth_client):
+    assert auth_client.get('/video_feed?profile=4k').status_code == 400
@@ -0,0 +1,48 @@
+import sqlite3
+
+from ai_module import common
+
+
+def _seed():
+    with sqlite3.connect(common.DB_PATH) as conn:
+        sid = conn.execute("INSERT INTO students (name, student_id) VALUES ('carol', 'S-100')").lastrowid
+        conn.executemany(
+            "INSERT INTO attendance_logs (student_id, status, timestamp, notes) VALUES (?, ?, ?, 'private')",
+            [(sid, status, f'2026-03-{day:02d} 09:00:00') for day, status in enumerate(
+                ['On Time', 'Present', 'Late', 'Absent', 'Disappeared', 'Late'], start=1)])
+    return sid
+
+
+def test_student_detail_and_lookup_share_stats(auth_client):
+    sid = _seed()
+    expected = {'total_classes': 6, 'present': 2, 'late': 2, 'absent': 1, 'attendance_rate': 66.7}
+
+    detail = auth_client.get(f'/api/students/{sid}').get_json()
+    assert detail['stats'] == expected
+    assert [r['timestamp'][:10] for r in detail['recent_attendance']][:2] == ['2026-03-06', '2026-03-05']
+    assert detail['recent_attendance'][0]['notes'] == 'private'
+
+    lookup = auth_client.post('/api/lookup', json={'student_id': 'S-100'}).get_json()
+    assert lookup['stats'] == expected
+    assert len(lookup['recent_attendance']) == 6
+    assert set(lookup['recent_attendance'][0]) == {'timestamp', 'status', 'source'}
+
+
+def test_student_without_logs(auth_client):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        conn.execute("INSERT INTO students (name, student_id) VALUES ('dave', 'S-200')")
+    lookup = auth_client.post('/api/lookup', json={'student_id': 'S-200'}).get_json()
+    assert lookup['stats'] == {'total_classes': 0, 'present': 0, 'late': 0, 'absent': 0, 'attendance_rate': 0}
+    assert lookup['recent_attendance'] == []
+
+
+def test_summary_queries_use_indexes(app):
+    with sqlite3.connect(common.DB_PATH) as conn:
+        def plan(sql):
+            return ' '.join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, (1,)))
+
+        counts = plan("SELECT COUNT(*), SUM(status = 'Late') FROM attendance_logs WHERE student_id = ?")
+        assert 'COVERING INDEX idx_attendance_student_status' in counts
+        recent = plan("SELECT id, timestamp, status FROM attendance_logs WHERE student_id = ? "
+                      "ORDER BY timestamp DESC LIMIT 50")
+        assert 'idx_attendance_student_time' in recent and 'TEMP B-TREE' not in recent
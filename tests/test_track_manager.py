@@ -0,0 +1,51 @@
+from ai_module.track_manager import TrackManager, iou
+
+
+def test_iou():
+    assert iou((0, 10, 10, 0), (0, 10, 10, 0)) == 1.0
+    assert iou((0, 10, 10, 0), (20, 30, 30, 20)) == 0.0
+    assert abs(iou((0, 10, 10, 0), (0, 15, 10, 5)) - 1 / 3) < 1e-9
+
+
+def test_settled_track_is_not_re_encoded():
+    tm = TrackManager(min_confidence=0.6, reverify_interval=10)
+    (track,) = tm.associate([(100, 200, 200, 100)], now=0)
+    assert tm.needs_encoding(track, now=0)
+    tm.record_match(track, "alice", 0.3, 0.5, now=0)
+
+    for t in range(1, 10):
+        (same,) = tm.associate([(100 + t, 200 + t, 200 + t, 100 + t)], now=t)
+        assert same is track
+        assert not tm.needs_encoding(same, now=t)
+    assert track.name == "alice"
+
+    # Re-verify timer fires
+    (same,) = tm.associate([(110, 210, 210, 110)], now=10)
+    assert tm.needs_encoding(same, now=10)
+    assert tm.metrics()['reused_identities'] == 9
+
+
+def test_conflicting_votes_lower_confidence():
+    tm = TrackManager(min_confidence=0.6, reverify_interval=100)
+    (track,) = tm.associate([(0, 100, 100, 0)], now=0)
+    tm.record_match(track, "alice", 0.3, 0.5, now=0)
+    tm.record_match(track, "bob", 0.3, 0.5, now=1)
+    assert track.confidence < 0.6
+    assert tm.needs_encoding(track, now=2)
+
+
+def test_new_and_lost_tracks():
+    tm = TrackManager(max_misses=1)
+    a, b = tm.associate([(0, 100, 100, 0), (0, 400, 100, 300)], now=0)
+    assert a is not b
+    tm.associate([(0, 100, 100, 0)], now=1)
+    tm.associate([(0, 100, 100, 0)], now=2)
+    assert [t.id for t in tm.tracks] == [a.id]
+
+
+def test_forget_clears_identity():
+    tm = TrackManager()
+    (track,) = tm.associate([(0, 100, 100, 0)], now=0)
+    tm.record_match(track, "alice", 0.2, 0.5, now=0)
+    tm.forget("alice")
+    assert track.name == "Unknown" and tm.needs_encoding(track, now=1)
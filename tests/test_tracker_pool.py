@@ -0,0 +1,53 @@
+import os
+import time
+import cv2
+import numpy as np
+
+from ai_module.frame import Frame
+from ai_module.tracker_pool import TrackerPool
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def _scene(dx):
+    face = cv2.resize(cv2.imread(os.path.join(DATA_DIR, 'obama_1.jpg')), (200, 250))
+    frame = np.full((720, 1280, 3), 90, dtype=np.uint8)
+    frame[200:450, 300 + dx:500 + dx] = face
+    return Frame(frame)
+
+
+def _wait_rounds(pool, n, timeout=5.0):
+    deadline = time.time() + timeout
+    while pool.rounds < n and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_trackers_follow_motion_on_downscaled_frame():
+    updates = []
+    pool = TrackerPool(scale=0.5, workers=2, timeout=1.0,
+                       on_update=lambda conf, boxes: updates.append((conf, boxes)))
+    try:
+        pool.reset(_scene(0), [((220, 480, 420, 320), "alice")])
+        for i, dx in enumerate(range(4, 44, 4)):
+            pool.submit(_scene(dx))
+            _wait_rounds(pool, i + 1)
+
+        (box, name), = pool.positions()
+        assert name == "alice"
+        assert 30 <= box[3] - 320 <= 50       # moved ~40 px to the right in full-frame pixels
+        assert updates and updates[-1][0][0] > 7.0
+    finally:
+        pool.stop()
+
+
+def test_newest_frame_wins_and_reset_replaces_trackers():
+    pool = TrackerPool(scale=0.5, workers=1, timeout=1.0)
+    try:
+        pool.reset(_scene(0), [((220, 480, 420, 320), "a"), ((0, 100, 100, 0), "b")])
+        assert [n for _, n in pool.positions()] == ["a", "b"]
+        pool.reset(_scene(0), [])
+        pool.submit(_scene(0))
+        _wait_rounds(pool, 1)
+        assert pool.positions() == []
+    finally:
+        pool.stop()
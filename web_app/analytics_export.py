@@ -0,0 +1,247 @@
+"""
+Columnar export of the attendance history for analysis.
+
+attendance_logs joined with students and class_schedules is written as
+Parquet or Arrow IPC when pyarrow is installed, otherwise as a NumPy .npz
+(numeric columns as int64 / datetime64, text columns dictionary-encoded).
+Rows are read from the cursor in EXPORT_FETCH_ROWS chunks and written as
+they arrive, so memory does not grow with the date range.
+
+snapshot() keeps a directory of part files up to date: each run appends
+one part holding the complete days exported since the last run.
+
+    python -m web_app.analytics_export --out DIR [--format parquet|arrow|npz] [--until YYYY-MM-DD] [--db PATH]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_module import common
+from ai_module import db
+
+log = common.get_logger('analytics_export')
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow', 'npz': '.npz'}
+MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+    'npz': 'application/octet-stream',
+}
+MANIFEST = '_manifest.json'
+
+# Column order of the query below; text columns are dictionary-encoded in .npz
+COLUMNS = ['id', 'timestamp', 'log_date', 'student_id', 'student_name', 'student_code',
+           'status', 'source', 'schedule_id', 'class_name', 'notes']
+TEXT_COLUMNS = {'student_name', 'student_code', 'status', 'source', 'class_name', 'notes'}
+NPZ_DTYPES = {'id': 'int64', 'timestamp': 'datetime64[s]', 'log_date': 'datetime64[D]',
+              'student_id': 'int64', 'schedule_id': 'int64'}
+
+# Timestamps are stored in UTC; julianday 2440587.5 is the Unix epoch
+_SELECT = """
+    SELECT al.id, CAST(strftime('%s', al.timestamp) AS INTEGER),
+           CAST(julianday(al.log_date) - 2440587.5 AS INTEGER),
+           al.student_id, s.name, IFNULL(s.student_id, ''),
+           al.status, al.source, al.schedule_id, cs.class_name, IFNULL(al.notes, '')
+    FROM attendance_logs al
+    JOIN students s ON s.id = al.student_id
+    LEFT JOIN class_schedules cs ON cs.id = al.schedule_id
+"""
+
+
+def resolve_format(fmt):
+    """`fmt` if it can be written here; Parquet/Arrow fall back to npz without pyarrow."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {sorted(FORMATS)}")
+    if fmt != 'npz' and pa is None:
+        log.warning(f"pyarrow is not installed; writing .npz instead of {fmt}")
+        return 'npz'
+    return fmt
+
+
+def _where(since, until):
+    clauses, params = [], []
+    if since:
+        clauses.append("al.log_date >= ?")
+        params.append(since)
+    if until:
+        clauses.append("al.log_date <= ?")
+        params.append(until)
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _chunks(cursor):
+    """Column lists of up to EXPORT_FETCH_ROWS rows at a time."""
+    while True:
+        rows = cursor.fetchmany(common.EXPORT_FETCH_ROWS)
+        if not rows:
+            return
+        yield dict(zip(COLUMNS, (list(col) for col in zip(*rows))))
+
+
+def _write_arrow(cursor, out, fmt):
+    schema = pa.schema([
+        ('id', pa.int64()), ('timestamp', pa.timestamp('s', tz='UTC')), ('log_date', pa.date32()),
+        ('student_id', pa.int64()), ('student_name', pa.string()), ('student_code', pa.string()),
+        ('status', pa.string()), ('source', pa.string()), ('schedule_id', pa.int64()),
+        ('class_name', pa.string()), ('notes', pa.string()),
+    ])
+    # Epoch seconds / days from the query, cast to the logical types
+    storage = {'timestamp': pa.int64(), 'log_date': pa.int32()}
+    if fmt == 'parquet':
+        # Parquet dictionary-encodes the repetitive text columns itself
+        writer = pa.parquet.ParquetWriter(out, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(out, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+    rows = 0
+    try:
+        for chunk in _chunks(cursor):
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(chunk[f.name], type=storage.get(f.name, f.type)).cast(f.type) for f in schema],
+                schema=schema))
+            rows += len(chunk['id'])
+    finally:
+        writer.close()
+    return rows
+
+
+def _write_npz(cursor, out, count):
+    """
+    Fill one preallocated .npy memmap per column chunk by chunk, then zip
+    them up as an .npz. Text columns become int32 codes into a
+    `<name>_values` array; schedule_id is -1 for logs without a class.
+    """
+    tmp = tempfile.mkdtemp(prefix='analytics_')
+    try:
+        arrays = {name: np.lib.format.open_memmap(os.path.join(tmp, name + '.npy'), mode='w+',
+                                                  dtype=NPZ_DTYPES.get(name, 'int32'), shape=(count,))
+                  for name in COLUMNS}
+        codes = {name: {} for name in TEXT_COLUMNS}
+        rows = 0
+        for chunk in _chunks(cursor):
+            end = rows + len(chunk['id'])
+            for name in COLUMNS:
+                values = chunk[name]
+                if name in TEXT_COLUMNS:
+                    lookup = codes[name]
+                    values = [lookup.setdefault(v or '', len(lookup)) for v in values]
+                elif name == 'schedule_id':
+                    values = [-1 if v is None else v for v in values]
+                if arrays[name].dtype.kind == 'M':
+                    values = np.asarray(values, dtype='int64').view(arrays[name].dtype)
+                arrays[name][rows:end] = values
+            rows = end
+        for array in arrays.values():
+            array.flush()
+        del arrays
+
+        with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+            for name in COLUMNS:
+                zf.write(os.path.join(tmp, name + '.npy'), name + '.npy')
+            for name in sorted(TEXT_COLUMNS):
+                with zf.open(f'{name}_values.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.array(list(codes[name]), dtype=str))
+        return rows
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def write(conn, out, fmt, since=None, until=None):
+    """
+    Write attendance rows with log_date in [since, until] (either end open)
+    to `out` (path or binary file object) as `fmt`. Returns the row count.
+    """
+    where, params = _where(since, until)
+    conn.execute("BEGIN")   # One read snapshot for the row count and the rows
+    try:
+        cursor = conn.execute(f"{_SELECT} {where} ORDER BY al.log_date, al.id", params)
+        if fmt == 'npz':
+            count = conn.execute(f"SELECT COUNT(*) FROM attendance_logs al {where}", params).fetchone()[0]
+            return _write_npz(cursor, out, count)
+        return _write_arrow(cursor, out, fmt)
+    finally:
+        conn.rollback()
+
+
+def load_npz(path):
+    """Columns of an .npz export as NumPy arrays, text columns decoded."""
+    with np.load(path) as data:
+        columns = {name: data[name] for name in COLUMNS}
+        for name in TEXT_COLUMNS:
+            columns[name] = data[f'{name}_values'][columns[name]]
+    return columns
+
+
+def _read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {'format': None, 'last_date': None, 'parts': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def snapshot(out_dir, fmt='parquet', db_path=None, until=None):
+    """
+    Append the complete days (up to `until`, default yesterday) that are not
+    in `out_dir` yet as one new part file. Returns the part's manifest
+    entry, or None when there is nothing new. Logs edited after their day
+    was exported are not revisited; delete the directory to start over.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    fmt = manifest['format'] or resolve_format(fmt)
+    until = until or (date.today() - timedelta(days=1)).isoformat()
+
+    with db.connect(db_path) as conn:
+        first = conn.execute("SELECT MIN(log_date) FROM attendance_logs WHERE log_date > ? AND log_date <= ?",
+                             (manifest['last_date'] or '', until)).fetchone()[0]
+        if first is None:
+            return None
+        name = f"attendance_{first}_{until}{FORMATS[fmt]}"
+        path = os.path.join(out_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            rows = write(conn, f, fmt, since=first, until=until)
+        os.replace(path + '.tmp', path)
+
+    part = {'file': name, 'from': first, 'to': until, 'rows': rows}
+    manifest.update(format=fmt, last_date=until)
+    manifest['parts'].append(part)
+    with open(os.path.join(out_dir, MANIFEST + '.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(out_dir, MANIFEST + '.tmp'), os.path.join(out_dir, MANIFEST))
+    log.info(f"Exported {rows} rows ({first} → {until}) to {path}")
+    return part
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new days of attendance to a columnar export.")
+    parser.add_argument('--out', required=True, help="export directory")
+    parser.add_argument('--format', default='parquet', choices=sorted(FORMATS),
+                        help="file format (parquet / arrow need pyarrow, else npz is written)")
+    parser.add_argument('--until', help="last day to include, YYYY-MM-DD (default yesterday)")
+    parser.add_argument('--db', default=common.DB_PATH, help="database path")
+    args = parser.parse_args(argv)
+
+    part = snapshot(args.out, args.format, args.db, args.until)
+    if part:
+        print(f"[SUCCESS] Wrote {part['rows']} rows to {part['file']}.")
+    else:
+        print("[INFO] No new days to export.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import sqlite3
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -8,15 +9,18 @@ from web_app.config import Config
 from web_app.routes.api import api_bp
 from web_app.routes.views import views_bp
 from web_app.video_stream import video_stream
+from web_app import mail_queue
 from ai_module import common
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__,
                 template_folder=os.path.join(os.path.dirname(__file__), 'templates'),
                 static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
     app.config['PROJECT_ROOT'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'smartpresence-secret-change-me')
 
@@ -69,6 +73,12 @@ def create_app():
     # Ensure crash reports directory exists
     os.makedirs(common.CRASH_REPORTS_DIR, exist_ok=True)
 
+    # ── Mail Queue: deliver emails left in the outbox by the last run ──
+    try:
+        mail_queue.get_queue(app.config['DB_PATH']).start()
+    except sqlite3.Error as e:
+        common.get_logger('server').error(f"Mail queue not started ({e}); run init_db.py to migrate the database")
+
     return app
 
 
@@ -102,4 +112,5 @@ if __name__ == '__main__':
         app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
     finally:
         video_stream.stop()
+        mail_queue.stop_all()
         log.info("Server Stopped.")
@@ -0,0 +1,136 @@
+"""
+Materialized per-day attendance: daily_attendance_summary.
+
+One row per (date, schedule_id, student_id) holding the best status the
+student reached in that class that day (common.STATUS_PRIORITY; schedule_id
+is 0 for logs without a class). SQLite triggers on attendance_logs keep it
+current for every writer — the AI attendance writer, manual entry, override
+and delete — so summary views read O(days × students) rows instead of
+re-aggregating the raw log.
+
+    python -m web_app.database.daily_summary --rebuild [--since YYYY-MM-DD] [--db PATH]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from ai_module import common
+from ai_module import db
+
+# Local day a log row belongs to (same as attendance_logs.log_date)
+DATE_EXPR = "DATE({row}timestamp, 'localtime')"
+
+
+def rank_sql(column):
+    """SQL expression ranking `column` by common.STATUS_PRIORITY (unknown → 0)."""
+    cases = ' '.join(f"WHEN '{status}' THEN {rank}" for status, rank in common.STATUS_PRIORITY.items())
+    return f"CASE {column} {cases} ELSE 0 END"
+
+
+def _date(row=''):
+    return DATE_EXPR.format(row=row)
+
+
+def _recompute(row):
+    """
+    Trigger body that re-derives the summary row of `row`'s (date, class,
+    student) group. It compares DATE(timestamp) rather than log_date: on an
+    UPDATE the moved row's log_date may not have been refreshed yet.
+    """
+    return f"""
+        DELETE FROM daily_attendance_summary
+        WHERE date = {_date(row)} AND schedule_id = IFNULL({row}schedule_id, 0) AND student_id = {row}student_id;
+        INSERT INTO daily_attendance_summary (date, schedule_id, student_id, best_status, best_rank)
+        SELECT {_date(row)}, IFNULL({row}schedule_id, 0), {row}student_id, status, {rank_sql('status')}
+        FROM attendance_logs
+        WHERE student_id = {row}student_id AND IFNULL(schedule_id, 0) = IFNULL({row}schedule_id, 0)
+          AND {_date()} = {_date(row)}
+        ORDER BY 5 DESC LIMIT 1;
+    """
+
+
+def _upsert(row):
+    """Trigger body that merges one new log into its summary row (keeps the higher rank)."""
+    return f"""
+        INSERT INTO daily_attendance_summary (date, schedule_id, student_id, best_status, best_rank)
+        VALUES ({_date(row)}, IFNULL({row}schedule_id, 0), {row}student_id, {row}status, {rank_sql(row + 'status')})
+        ON CONFLICT (date, schedule_id, student_id) DO UPDATE
+            SET best_status = excluded.best_status, best_rank = excluded.best_rank
+            WHERE excluded.best_rank > daily_attendance_summary.best_rank;
+    """
+
+
+def install(conn):
+    """
+    Create the summary table and (re)create its triggers. Returns True if
+    the table was just created: the caller must then rebuild() it once the
+    logs it reads (log_date included) are in place.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_attendance_summary'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_attendance_summary (
+            date TEXT NOT NULL,
+            schedule_id INTEGER NOT NULL DEFAULT 0,
+            student_id INTEGER NOT NULL,
+            best_status TEXT NOT NULL,
+            best_rank INTEGER NOT NULL,
+            PRIMARY KEY (date, schedule_id, student_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summary_schedule ON daily_attendance_summary(schedule_id, date)")
+
+    # Dropped and recreated so edits to STATUS_PRIORITY reach existing databases
+    for name in ('trg_summary_insert', 'trg_summary_delete', 'trg_summary_update'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(f"""
+        CREATE TRIGGER trg_summary_insert AFTER INSERT ON attendance_logs
+        BEGIN {_upsert('NEW.')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_summary_delete AFTER DELETE ON attendance_logs
+        BEGIN {_recompute('OLD.')} END
+    """)
+    # last_seen heartbeats and note edits do not touch the summary
+    conn.execute(f"""
+        CREATE TRIGGER trg_summary_update AFTER UPDATE OF student_id, timestamp, status, schedule_id
+        ON attendance_logs
+        BEGIN {_recompute('OLD.')} {_upsert('NEW.')} END
+    """)
+
+    return not exists
+
+
+def rebuild(conn, since=None):
+    """Recompute the summary from attendance_logs (all days, or from `since`). Returns rows written."""
+    where, params = ("WHERE date >= ?", (since,)) if since else ("", ())
+    conn.execute(f"DELETE FROM daily_attendance_summary {where}", params)
+    log_where = "WHERE log_date >= ?" if since else ""
+    # SQLite returns the bare `status` from the row holding MAX(rank)
+    cur = conn.execute(f"""
+        INSERT INTO daily_attendance_summary (date, schedule_id, student_id, best_status, best_rank)
+        SELECT log_date AS day, IFNULL(schedule_id, 0) AS sched, student_id, status, MAX({rank_sql('status')})
+        FROM attendance_logs {log_where}
+        GROUP BY day, sched, student_id
+    """, params)
+    return cur.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain daily_attendance_summary.")
+    parser.add_argument('--rebuild', action='store_true', help="recompute the summary from attendance_logs")
+    parser.add_argument('--since', help="only rebuild days on or after YYYY-MM-DD")
+    parser.add_argument('--db', default=common.DB_PATH, help="database path")
+    args = parser.parse_args(argv)
+
+    with db.connect(args.db) as conn:
+        created = install(conn)
+        if created or args.rebuild:
+            count = rebuild(conn, None if created else args.since)
+            print(f"[SUCCESS] Rebuilt {count} summary rows.")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    main()
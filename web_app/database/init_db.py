@@ -1,20 +1,22 @@
 import sqlite3
 import os
-import pickle
+import sys
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "attendance.db")
 SCHEMA_PATH = os.path.join(BASE_DIR, "schema.sql")
 PROJECT_ROOT = os.path.dirname(os.path.dirname(BASE_DIR))
-ENCODINGS_PATH = os.path.join(PROJECT_ROOT, "ai_module", "encodings.pickle")
 
+sys.path.append(PROJECT_ROOT)
+from ai_module import db
 
-def init_db():
-    print(f"[INFO] Initializing database at {DB_PATH}...")
 
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("PRAGMA foreign_keys = ON")
+def init_db(db_path=None):
+    db_path = db_path or DB_PATH
+    print(f"[INFO] Initializing database at {db_path}...")
 
+    # Pooled connections run in WAL mode; the first one switches the file over
+    with db.connect(db_path) as conn:
         # Apply schema (IF NOT EXISTS safe for re-runs)
         with open(SCHEMA_PATH, 'r') as f:
             conn.executescript(f.read())
@@ -39,11 +41,27 @@ def init_db():
         for col, typedef in [('source', "TEXT NOT NULL DEFAULT 'ai'"),
                              ('notes', "TEXT DEFAULT ''"),
                              ('last_seen', "TIMESTAMP"),
-                             ('schedule_id', "INTEGER")]:
+                             ('schedule_id', "INTEGER"),
+                             ('log_date', "TEXT")]:
             if col not in log_cols:
                 cursor.execute(f"ALTER TABLE attendance_logs ADD COLUMN {col} {typedef}")
                 print(f"[MIGRATE] Added '{col}' to attendance_logs")
 
+        # ── log_date: local calendar day of timestamp, kept by triggers ──
+        # (a generated column cannot use 'localtime', it is not deterministic)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_log_date_insert AFTER INSERT ON attendance_logs
+            BEGIN UPDATE attendance_logs SET log_date = DATE(NEW.timestamp, 'localtime') WHERE id = NEW.id; END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_log_date_update AFTER UPDATE OF timestamp ON attendance_logs
+            BEGIN UPDATE attendance_logs SET log_date = DATE(NEW.timestamp, 'localtime') WHERE id = NEW.id; END
+        """)
+        backfilled = cursor.execute(
+            "UPDATE attendance_logs SET log_date = DATE(timestamp, 'localtime') WHERE log_date IS NULL").rowcount
+        if backfilled:
+            print(f"[MIGRATE] Backfilled log_date on {backfilled} attendance rows")
+
         # ── Migrate class_schedules table ──
         cursor.execute("PRAGMA table_info(class_schedules)")
         sched_cols = [col[1] for col in cursor.fetchall()]
@@ -55,12 +73,22 @@ def init_db():
         # ── Indexes (safe to re-run) ──
         try:
             cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_student_name ON students(name)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance_logs(student_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student_status ON attendance_logs(student_id, status, timestamp)")
+            cursor.execute("DROP INDEX IF EXISTS idx_attendance_student")   # Prefix of the one above
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student_time ON attendance_logs(student_id, timestamp)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance_logs(timestamp)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance_logs(log_date, status, student_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_schedule_date ON attendance_logs(schedule_id, log_date)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_schedule_day ON class_schedules(day_of_week)")
         except sqlite3.OperationalError:
             pass
 
+        # ── Daily attendance summary (trigger-maintained, backfilled once) ──
+        from web_app.database import daily_summary
+        # Built once, after the log_date backfill; a pre-log_date summary used UTC days
+        if daily_summary.install(conn) or 'log_date' not in log_cols:
+            daily_summary.rebuild(conn)
+
         # ── Cameras Table (Migration) ──
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS cameras (
@@ -98,7 +126,8 @@ def init_db():
             'DISAPPEAR_THRESHOLD': '15',
             'RECHECK_INTERVAL': '300',
             'SYSTEM_MODE': 'auto',
-            'FRAME_SKIP': '3'             # For MediaPipe/performance tuning
+            'FRAME_SKIP': '3',            # For MediaPipe/performance tuning
+            'MATCH_INDEX': 'auto'         # 'auto' | 'exact' | 'ivf'
         }
         for k, v in defaults.items():
             cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (k, v))
@@ -120,16 +149,17 @@ def init_db():
 
 
 def migrate_students():
-    print("[INFO] Checking for existing students in pickle file...")
+    print("[INFO] Checking for existing students in the encoding store...")
 
-    if not os.path.exists(ENCODINGS_PATH):
-        print("[INFO] No encodings.pickle found. Skipping migration.")
+    # Converts a legacy encodings.pickle into the binary store on first run
+    from ai_module.encoding_store import open_store
+    store = open_store()
+    if not store.exists():
+        print("[INFO] No encoding store found. Skipping migration.")
         return
 
     try:
-        with open(ENCODINGS_PATH, "rb") as f:
-            data = pickle.load(f)
-            names = data.get("names", [])
+        names = store.load()["names"]
     except Exception as e:
         print(f"[ERROR] Could not load encodings: {e}")
         return
@@ -138,7 +168,7 @@ def migrate_students():
         print("[INFO] No students found in encodings.")
         return
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with db.connect(DB_PATH) as conn:
         cursor = conn.cursor()
         count = 0
         for name in set(names):
@@ -38,17 +38,44 @@ CREATE TABLE IF NOT EXISTS attendance_logs (
     notes TEXT DEFAULT '',
     last_seen TIMESTAMP,
     schedule_id INTEGER,
+    log_date TEXT,            -- DATE(timestamp, 'localtime'), set by trigger (see init_db)
     FOREIGN KEY (student_id) REFERENCES students (id) ON DELETE CASCADE,
     FOREIGN KEY (schedule_id) REFERENCES class_schedules (id)
 );
 
 -- Performance indexes
-CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance_logs (student_id);
+-- Covers per-student stats (GROUP BY status);
+-- also serves every plain student_id lookup, so no separate (student_id) index
+CREATE INDEX IF NOT EXISTS idx_attendance_student_status ON attendance_logs (student_id, status, timestamp);
+
+-- A student's recent history (ORDER BY timestamp DESC LIMIT n) without a sort
+CREATE INDEX IF NOT EXISTS idx_attendance_student_time ON attendance_logs (student_id, timestamp);
 
 CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance_logs (timestamp);
 
 CREATE INDEX IF NOT EXISTS idx_schedule_day ON class_schedules (day_of_week);
 
+-- Outgoing email, delivered by web_app/mail_queue.py
+CREATE TABLE IF NOT EXISTS mail_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    label TEXT DEFAULT '',              -- e.g. the class name, used in failure reports
+    kind TEXT NOT NULL,                 -- 'student' | 'teacher' | 'error'
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued', -- 'queued' | 'sending' | 'sent' | 'failed'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0, -- Unix time
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_mail_outbox_due ON mail_outbox (status, next_attempt_at);
+
+CREATE INDEX IF NOT EXISTS idx_mail_outbox_job ON mail_outbox (job_id);
+
 -- Camera Configuration
 CREATE TABLE IF NOT EXISTS cameras (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -64,4 +91,18 @@ CREATE TABLE IF NOT EXISTS settings (
     key TEXT PRIMARY KEY,
     value TEXT NOT NULL,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- Bumped by every write to settings, so SettingsManager can tell a settings
+-- change from the attendance writer's commits without re-reading the table
+CREATE TABLE IF NOT EXISTS settings_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS trg_settings_version_insert AFTER INSERT ON settings
+BEGIN UPDATE settings_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_settings_version_update AFTER UPDATE ON settings
+BEGIN UPDATE settings_version SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_settings_version_delete AFTER DELETE ON settings
+BEGIN UPDATE settings_version SET version = version + 1 WHERE id = 1; END;
\ No newline at end of file
@@ -5,6 +5,9 @@ Handles three types of emails:
  1. Student reports  → individual attendance status after each class
  2. Teacher summaries → class attendance overview (present/absent counts)
  3. Error reports    → bugs/crashes → admin email
+
+Class reports are not sent from the request: web_app/mail_queue.py queues
+them and delivers over a reused SMTPSession.
 """
 
 import os
@@ -23,36 +26,109 @@ def _get_smtp_config():
         'key': os.environ.get('SMTP_KEY', ''),
         'sender': os.environ.get('SMTP_SENDER', ''),
         'admin_email': os.environ.get('ADMIN_EMAIL', ''),
+        'starttls': os.environ.get('SMTP_STARTTLS', '1') != '0',
     }
 
 
+def config_error(cfg=None):
+    """Why SMTP cannot be used, or None if it is configured."""
+    cfg = cfg or _get_smtp_config()
+    if not cfg['login'] or not cfg['key'] or not cfg['sender']:
+        return "SMTP not configured (missing SMTP_LOGIN, SMTP_KEY, or SMTP_SENDER in .env)"
+    return None
+
+
+def describe_error(e):
+    """Human-readable reason for a failed send."""
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return "SMTP authentication failed — check SMTP_LOGIN and SMTP_KEY"
+    if isinstance(e, smtplib.SMTPException):
+        return f"SMTP error: {str(e)}"
+    return f"Email send failed: {str(e)}"
+
+
+class SMTPSession:
+    """
+    One SMTP connection reused for many messages: the TCP connect, STARTTLS
+    and login happen on the first send only. If the server dropped an idle
+    connection, the next send reconnects once.
+    """
+
+    def __init__(self, cfg=None, timeout=15):
+        self.cfg = cfg or _get_smtp_config()
+        self.timeout = timeout
+        self._smtp = None
+        self.connects = 0
+
+    def _connect(self):
+        error = config_error(self.cfg)
+        if error:
+            raise ValueError(error)
+        smtp = smtplib.SMTP(self.cfg['server'], self.cfg['port'], timeout=self.timeout)
+        try:
+            if self.cfg['starttls']:
+                smtp.starttls()
+            smtp.login(self.cfg['login'], self.cfg['key'])
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.connects += 1
+
+    def send(self, to_email, subject, html_body):
+        """Send one message; raises smtplib / socket errors on failure."""
+        if not to_email:
+            raise ValueError("No recipient email provided")
+        msg = MIMEMultipart('alternative')
+        msg['From'] = f"SmartPresence <{self.cfg['sender']}>"
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html_body, 'html'))
+
+        reused = self._smtp is not None
+        if not reused:
+            self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            if not reused:
+                raise
+            self._connect()
+            self._smtp.send_message(msg)
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def _send_email(to_email, subject, html_body):
     """Send a single email via SMTP. Returns (success: bool, error: str|None)."""
     cfg = _get_smtp_config()
-    if not cfg['login'] or not cfg['key'] or not cfg['sender']:
-        return False, "SMTP not configured (missing SMTP_LOGIN, SMTP_KEY, or SMTP_SENDER in .env)"
+    error = config_error(cfg)
+    if error:
+        return False, error
 
     if not to_email:
         return False, "No recipient email provided"
 
-    msg = MIMEMultipart('alternative')
-    msg['From'] = f"SmartPresence <{cfg['sender']}>"
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(html_body, 'html'))
-
     try:
-        with smtplib.SMTP(cfg['server'], cfg['port'], timeout=15) as server:
-            server.starttls()
-            server.login(cfg['login'], cfg['key'])
-            server.send_message(msg)
+        with SMTPSession(cfg) as session:
+            session.send(to_email, subject, html_body)
         return True, None
-    except smtplib.SMTPAuthenticationError:
-        return False, "SMTP authentication failed — check SMTP_LOGIN and SMTP_KEY"
-    except smtplib.SMTPException as e:
-        return False, f"SMTP error: {str(e)}"
     except Exception as e:
-        return False, f"Email send failed: {str(e)}"
+        return False, describe_error(e)
 
 
 def send_test_email():
@@ -71,8 +147,8 @@ def send_test_email():
     return _send_email(cfg['admin_email'], "SmartPresence — SMTP Test ✅", html)
 
 
-def send_student_report(student_email, student_name, class_name, status, date_str):
-    """Send individual attendance status to a student after class."""
+def student_report(student_name, class_name, status, date_str):
+    """(subject, html) of a student's attendance status after class."""
     status_colors = {
         'Present': '#2ecc71', 'On Time': '#2ecc71', 'Late': '#f39c12',
         'Absent': '#e74c3c', 'Excused': '#888', 'Early Leave': '#3498db'
@@ -92,11 +168,16 @@ def send_student_report(student_email, student_name, class_name, status, date_st
         <p style="font-size:13px;color:#888;">This is an automated message from SmartPresence.</p>
     </div>
     """
-    return _send_email(student_email, f"Attendance: {status} — {class_name} ({date_str})", html)
+    return f"Attendance: {status} — {class_name} ({date_str})", html
 
 
-def send_teacher_summary(teacher_email, class_name, date_str, present_list, absent_list):
-    """Send class attendance summary to the teacher."""
+def send_student_report(student_email, student_name, class_name, status, date_str):
+    """Send individual attendance status to a student after class."""
+    return _send_email(student_email, *student_report(student_name, class_name, status, date_str))
+
+
+def teacher_summary(class_name, date_str, present_list, absent_list):
+    """(subject, html) of the class attendance summary for the teacher."""
     total = len(present_list) + len(absent_list)
     present_count = len(present_list)
     absent_count = len(absent_list)
@@ -134,15 +215,16 @@ def send_teacher_summary(teacher_email, class_name, date_str, present_list, abse
         <p style="font-size:13px;color:#888;margin-top:16px;">SmartPresence — Automated Class Report</p>
     </div>
     """
-    return _send_email(teacher_email, f"Class Report: {class_name} — {date_str} ({present_count}/{total} present)", html)
+    return f"Class Report: {class_name} — {date_str} ({present_count}/{total} present)", html
 
 
-def send_error_report(error_title, error_details):
-    """Send error/bug report to admin email."""
-    cfg = _get_smtp_config()
-    if not cfg['admin_email']:
-        return False, "ADMIN_EMAIL not set"
+def send_teacher_summary(teacher_email, class_name, date_str, present_list, absent_list):
+    """Send class attendance summary to the teacher."""
+    return _send_email(teacher_email, *teacher_summary(class_name, date_str, present_list, absent_list))
+
 
+def error_report(error_title, error_details):
+    """(subject, html) of an error/bug report for the admin."""
     html = f"""
     <div style="font-family:Arial,sans-serif;max-width:520px;margin:0 auto;padding:24px;background:#1a1a2e;color:#e0e0e0;border-radius:12px;">
         <h2 style="color:#e74c3c;margin-top:0;">🐛 Error Report</h2>
@@ -151,4 +233,12 @@ def send_error_report(error_title, error_details):
         <p style="font-size:13px;color:#888;">Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
     </div>
     """
-    return _send_email(cfg['admin_email'], f"SmartPresence Error: {error_title}", html)
+    return f"SmartPresence Error: {error_title}", html
+
+
+def send_error_report(error_title, error_details):
+    """Send error/bug report to admin email."""
+    cfg = _get_smtp_config()
+    if not cfg['admin_email']:
+        return False, "ADMIN_EMAIL not set"
+    return _send_email(cfg['admin_email'], *error_report(error_title, error_details))
@@ -0,0 +1,291 @@
+"""
+Background email delivery through the mail_outbox table.
+
+enqueue() stores one row per message and returns a job id at once, so a
+200-student class report no longer holds the HTTP request open. A bounded
+pool of sender threads (MAIL_WORKERS) claims due rows and delivers them,
+each over its own persistent SMTP session: STARTTLS and login happen once
+per connection instead of once per message. Transient failures (dropped
+connections, 4xx replies) are retried with exponential backoff up to
+MAIL_MAX_ATTEMPTS; 5xx replies fail at once. When every message of a job
+has settled, any failures are mailed to ADMIN_EMAIL as one error report.
+
+The outbox survives restarts: create_app() starts the queue, and rows left
+'sending' by a crash are queued again on start().
+"""
+import atexit
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+
+from ai_module import common
+from ai_module import db
+from web_app import email_service
+
+log = common.get_logger('mail_queue')
+
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+ERROR_REPORT = 'error'   # kind of the admin failure report, not counted in job totals
+
+
+def is_permanent(e):
+    """True if retrying `e` cannot help (5xx reply, bad config or address)."""
+    if isinstance(e, ValueError):
+        return True
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    return False
+
+
+class MailQueue:
+    """Outbox of one database plus the sender threads that drain it."""
+
+    def __init__(self, db_path=None, workers=None, max_attempts=None, backoff=None, session_factory=None):
+        self.db_path = db_path
+        self.workers = workers or common.MAIL_WORKERS
+        self.max_attempts = max_attempts or common.MAIL_MAX_ATTEMPTS
+        self.backoff = common.MAIL_BACKOFF if backoff is None else backoff
+        self.session_factory = session_factory or email_service.SMTPSession
+        self._threads = []
+        self._running = False
+        self._start_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._signal = 0          # Bumped on every enqueue so idle senders re-check
+        self._stats_lock = threading.Lock()
+        self._stats = {'sent': 0, 'failed': 0, 'retried': 0, 'sessions': 0}
+
+    # ── Lifecycle ─────────────────────────────────────
+
+    def start(self):
+        with self._start_lock:
+            if self._running:
+                return
+            with db.connect(self.db_path) as conn:
+                recovered = conn.execute("UPDATE mail_outbox SET status = ? WHERE status = ?",
+                                         (QUEUED, SENDING)).rowcount
+            if recovered:
+                log.warning(f"Re-queued {recovered} emails interrupted mid-send")
+            self._running = True
+            self._threads = [threading.Thread(target=self._run, daemon=True, name=f"mail-sender-{n}")
+                             for n in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+        log.info(f"Mail queue started with {self.workers} senders.")
+
+    def stop(self, timeout=5.0):
+        if not self._running:
+            return
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        log.info("Mail queue stopped.")
+
+    # ── Producer API ──────────────────────────────────
+
+    def enqueue(self, messages, label=''):
+        """
+        Queue [(kind, recipient, subject, html), ...] as one job and return its
+        id. Delivery happens in the background; see job_status().
+        """
+        job_id = uuid.uuid4().hex
+        with db.connect(self.db_path) as conn:
+            conn.executemany(
+                "INSERT INTO mail_outbox (job_id, label, kind, recipient, subject, body) VALUES (?, ?, ?, ?, ?, ?)",
+                [(job_id, label, kind, to, subject, body) for kind, to, subject, body in messages])
+        self.start()
+        self._wake()
+        return job_id
+
+    def job_status(self, job_id):
+        """Progress of a job, or None if the id is unknown."""
+        conn = db.connect(self.db_path)
+        try:
+            rows = conn.execute("""
+                SELECT kind, recipient, status, attempts, last_error FROM mail_outbox
+                WHERE job_id = ? ORDER BY id
+            """, (job_id,)).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return None
+
+        messages = [r for r in rows if r[0] != ERROR_REPORT]
+        counts = {status: 0 for status in (QUEUED, SENDING, SENT, FAILED)}
+        for row in messages:
+            counts[row[2]] += 1
+        report = next((r[2] for r in rows if r[0] == ERROR_REPORT), None)
+        return {
+            "job_id": job_id,
+            "total": len(messages),
+            **counts,
+            "done": counts[QUEUED] + counts[SENDING] == 0,
+            "errors": [{"recipient": r[1], "attempts": r[3], "error": r[4]}
+                       for r in messages if r[2] == FAILED],
+            "error_report": report,
+        }
+
+    def metrics(self):
+        with self._stats_lock:
+            data = dict(self._stats)
+        data['running'] = self._running
+        data['workers'] = len(self._threads)
+        return data
+
+    # ── Sender threads ────────────────────────────────
+
+    def _wake(self):
+        with self._cond:
+            self._signal += 1
+            self._cond.notify_all()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _run(self):
+        # Each sender owns one connection and one SMTP session for its lifetime
+        conn = db.dedicated(self.db_path or common.DB_PATH)
+        session, idle_since = None, time.monotonic()
+        try:
+            while self._running:
+                try:
+                    signal = self._signal
+                    row = self._claim(conn)
+                    if row is None:
+                        if session and time.monotonic() - idle_since > common.MAIL_SESSION_IDLE:
+                            session.close()
+                            session = None
+                        self._wait(conn, signal)
+                        continue
+                    if session is None:
+                        session = self.session_factory()
+                        self._count('sessions')
+                    if not self._deliver(conn, session, row):
+                        session.close()   # Unknown connection state: reconnect for the next message
+                    idle_since = time.monotonic()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    log.error(f"Mail outbox error: {e}")
+                    time.sleep(1)
+        finally:
+            if session:
+                session.close()
+            conn.close()
+
+    def _claim(self, conn):
+        """Atomically mark the next due message 'sending' and return it."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("""
+                SELECT id, job_id, label, kind, recipient, subject, body, attempts FROM mail_outbox
+                WHERE status = ? AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id LIMIT 1
+            """, (QUEUED, time.time())).fetchone()
+            if row:
+                conn.execute("UPDATE mail_outbox SET status = ?, attempts = attempts + 1 WHERE id = ?",
+                             (SENDING, row[0]))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return row
+
+    def _wait(self, conn, signal):
+        """Sleep until an enqueue, the next retry falls due, or the poll interval."""
+        due = conn.execute("SELECT MIN(next_attempt_at) FROM mail_outbox WHERE status = ?", (QUEUED,)).fetchone()[0]
+        delay = common.MAIL_POLL_INTERVAL if due is None else min(max(due - time.time(), 0), common.MAIL_POLL_INTERVAL)
+        with self._cond:
+            if self._running and self._signal == signal:
+                self._cond.wait(delay)
+
+    def _deliver(self, conn, session, row):
+        """Send one claimed message and record the outcome. False if the session should be dropped."""
+        msg_id, job_id, label, kind, recipient, subject, body, attempts = row
+        attempts += 1
+        try:
+            session.send(recipient, subject, body)
+        except Exception as e:
+            error = email_service.describe_error(e)
+            if is_permanent(e) or attempts >= self.max_attempts:
+                conn.execute("UPDATE mail_outbox SET status = ?, last_error = ? WHERE id = ?",
+                             (FAILED, error, msg_id))
+                conn.commit()
+                self._count('failed')
+                log.warning(f"Email to {recipient} failed after {attempts} attempt(s): {error}")
+                if kind != ERROR_REPORT:
+                    self._report_failures(conn, job_id, label)
+            else:
+                delay = min(self.backoff * 2 ** (attempts - 1), common.MAIL_BACKOFF_MAX)
+                conn.execute("UPDATE mail_outbox SET status = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                             (QUEUED, error, time.time() + delay, msg_id))
+                conn.commit()
+                self._count('retried')
+                log.info(f"Email to {recipient} will be retried in {delay:.0f}s: {error}")
+                self._wake()   # An idle sender may need to shorten its sleep
+            # The server answered (and smtplib reset the transaction): the session is still good
+            return isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException, ValueError))
+
+        conn.execute("UPDATE mail_outbox SET status = ?, last_error = NULL, sent_at = CURRENT_TIMESTAMP WHERE id = ?",
+                     (SENT, msg_id))
+        conn.commit()
+        self._count('sent')
+        if kind != ERROR_REPORT:
+            self._report_failures(conn, job_id, label)
+        return True
+
+    def _report_failures(self, conn, job_id, label):
+        """Once every message of a job has settled, queue one admin report of its failures."""
+        admin = email_service._get_smtp_config()['admin_email']
+        conn.execute("BEGIN IMMEDIATE")   # Two senders may settle a job's last messages together
+        try:
+            pending, reported = conn.execute("""
+                SELECT SUM(status IN (?, ?) AND kind != ?), SUM(kind = ?) FROM mail_outbox WHERE job_id = ?
+            """, (QUEUED, SENDING, ERROR_REPORT, ERROR_REPORT, job_id)).fetchone()
+            failures = [] if pending or reported else conn.execute("""
+                SELECT recipient, last_error FROM mail_outbox WHERE job_id = ? AND status = ? AND kind != ?
+            """, (job_id, FAILED, ERROR_REPORT)).fetchall()
+            if failures and admin:
+                subject, body = email_service.error_report(
+                    f"Email Report Errors — {label}", '\n'.join(f"{to}: {err}" for to, err in failures))
+                conn.execute(
+                    "INSERT INTO mail_outbox (job_id, label, kind, recipient, subject, body) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, label, ERROR_REPORT, admin, subject, body))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(db_path=None):
+    """The shared MailQueue for `db_path` (default common.DB_PATH)."""
+    path = db_path or common.DB_PATH
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = MailQueue(path)
+        return _queues[path]
+
+
+def stop_all():
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for queue in queues:
+        queue.stop()
+
+
+atexit.register(stop_all)   # Let senders finish the message in hand on shutdown
@@ -2,17 +2,20 @@ import sqlite3
 import os
 import sys
 import json
-import pickle
 import base64
 import hmac
 import requests as http_requests
 import numpy as np
-from flask import Blueprint, jsonify, request, send_file, current_app, session
+from flask import Blueprint, jsonify, request, send_file, current_app, session, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from io import BytesIO
 from functools import wraps
 from ai_module import common as _common_module
+from ai_module import schedule_timeline
+from ai_module import events
+from ai_module import db
+from web_app import mail_queue
 
 log = _common_module.get_logger('api')
 
@@ -52,11 +55,8 @@ def _get_limiter():
 
 
 def get_db():
-    db_path = current_app.config['DB_PATH']
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+    """Pooled WAL connection (see ai_module.db); conn.close() returns it to the pool."""
+    return db.connect(current_app.config['DB_PATH'], row_factory=sqlite3.Row)
 
 
 # ── Auth Helpers ──
@@ -306,10 +306,45 @@ def add_student():
     except sqlite3.IntegrityError:
         conn.close()
         return jsonify({"error": "Student already exists"}), 409
+    events.publish_stats(conn)
     conn.close()
     return jsonify({"success": True, "name": name}), 201
 
 
+def _student_summary(conn, sid, recent_limit=50):
+    """
+    Attendance stats and the most recent rows for one student.
+
+    The counts are one grouped aggregation answered from the covering
+    (student_id, status, timestamp) index alone; the recent rows are read
+    newest first from the (student_id, timestamp) index, so LIMIT stops the
+    scan without sorting. Returns (stats dict, [row dicts]).
+    """
+    counts = conn.execute("""
+        SELECT COUNT(*),
+               SUM(CASE WHEN status IN ('Present', 'On Time') THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'Late' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'Absent' THEN 1 ELSE 0 END)
+        FROM attendance_logs WHERE student_id = ?
+    """, (sid,)).fetchone()
+    total, present, late, absent = (c or 0 for c in counts)
+
+    recent = conn.execute("""
+        SELECT id, timestamp, status, source, notes
+        FROM attendance_logs WHERE student_id = ?
+        ORDER BY timestamp DESC LIMIT ?
+    """, (sid, recent_limit)).fetchall()
+
+    stats = {
+        'total_classes': total,
+        'present': present,
+        'late': late,
+        'absent': absent,
+        'attendance_rate': round((present + late) / total * 100, 1) if total > 0 else 0
+    }
+    return stats, [dict(r) for r in recent]
+
+
 @api_bp.route('/students/<int:sid>', methods=['GET'])
 @api_login_required
 def get_student(sid):
@@ -319,39 +354,12 @@ def get_student(sid):
         conn.close()
         return jsonify({"error": "Student not found"}), 404
 
-    # Include attendance summary
-    total_classes = conn.execute(
-        "SELECT COUNT(*) FROM attendance_logs WHERE student_id = ?", (sid,)).fetchone()[0]
-    present_count = conn.execute(
-        "SELECT COUNT(*) FROM attendance_logs WHERE student_id = ? AND status IN ('Present', 'On Time')",
-        (sid,)).fetchone()[0]
-    late_count = conn.execute(
-        "SELECT COUNT(*) FROM attendance_logs WHERE student_id = ? AND status = 'Late'",
-        (sid,)).fetchone()[0]
-    absent_count = conn.execute(
-        "SELECT COUNT(*) FROM attendance_logs WHERE student_id = ? AND status = 'Absent'",
-        (sid,)).fetchone()[0]
-
-    # Recent attendance
-    recent = conn.execute("""
-        SELECT al.id, al.timestamp, al.status, al.source, al.notes
-        FROM attendance_logs al WHERE al.student_id = ?
-        ORDER BY al.timestamp DESC LIMIT 50
-    """, (sid,)).fetchall()
-
+    stats, recent = _student_summary(conn, sid, recent_limit=50)
     conn.close()
 
-    attendance_rate = round((present_count + late_count) / total_classes * 100, 1) if total_classes > 0 else 0
-
     result = dict(student)
-    result['stats'] = {
-        'total_classes': total_classes,
-        'present': present_count,
-        'late': late_count,
-        'absent': absent_count,
-        'attendance_rate': attendance_rate
-    }
-    result['recent_attendance'] = [dict(r) for r in recent]
+    result['stats'] = stats
+    result['recent_attendance'] = recent
     return jsonify(result)
 
 
@@ -379,17 +387,34 @@ def update_student(sid):
 @api_login_required
 def delete_student(sid):
     conn = get_db()
-    student = conn.execute("SELECT id FROM students WHERE id = ?", (sid,)).fetchone()
+    student = conn.execute("SELECT id, name FROM students WHERE id = ?", (sid,)).fetchone()
     if not student:
         conn.close()
         return jsonify({"error": "Student not found"}), 404
     conn.execute("DELETE FROM attendance_logs WHERE student_id = ?", (sid,))
     conn.execute("DELETE FROM students WHERE id = ?", (sid,))
     conn.commit()
+    events.publish_stats(conn)
     conn.close()
+    _forget_face(student['name'])
     return jsonify({"success": True})
 
 
+def _forget_face(name):
+    """Drop a deleted student's encodings from disk and from the live match index."""
+    try:
+        from ai_module.encoding_store import open_store
+        open_store().remove(name)
+    except Exception as e:
+        log.warning(f"Could not remove encodings for {name}: {e}")
+
+    try:
+        from web_app.video_stream import video_stream
+        video_stream.face_system.remove_known_face(name)
+    except Exception:
+        pass
+
+
 # ══════════════════════════════════════════════════════
 #  ENROLLMENT — Web-based
 # ══════════════════════════════════════════════════════
@@ -439,34 +464,28 @@ def enroll_student():
         new_encoding = encodings[0]
 
         from ai_module import common
-        enc_path = common.ENCODINGS_PATH
-
-        # Duplicate face prevention: compare against existing encodings
-        if os.path.exists(enc_path):
-            with open(enc_path, "rb") as f:
-                enc_data = pickle.load(f)
-
-            if enc_data["encodings"] and not force:
-                distances = face_recognition.face_distance(enc_data["encodings"], new_encoding)
-                tolerance = getattr(common, 'TOLERANCE', 0.45)
-                min_dist_idx = int(np.argmin(distances))
-                min_dist = float(distances[min_dist_idx])
-                if min_dist < tolerance:
-                    matched_name = enc_data["names"][min_dist_idx]
-                    return jsonify({
-                        "error": f"This face closely matches '{matched_name}' (similarity: {round((1 - min_dist) * 100, 1)}%). "
-                                 f"If this is a different person, re-submit with the override option.",
-                        "duplicate": True,
-                        "matched_name": matched_name,
-                        "similarity": round((1 - min_dist) * 100, 1)
-                    }), 409
-        else:
-            enc_data = {"names": [], "encodings": []}
-
-        enc_data["names"].append(name)
-        enc_data["encodings"].append(new_encoding)
-        with open(enc_path, "wb") as f:
-            pickle.dump(enc_data, f)
+        from ai_module.encoding_store import open_store
+
+        # Duplicate face prevention: compare against the store on disk, which also holds
+        # faces enrolled by enroll_student.py or another process since this one started
+        known = open_store().load()
+        if len(known['names']) and not force:
+            distances = face_recognition.face_distance(known['encodings'], new_encoding)
+            tolerance = getattr(common, 'TOLERANCE', 0.45)
+            min_dist_idx = int(np.argmin(distances))
+            min_dist = float(distances[min_dist_idx])
+            if min_dist < tolerance:
+                matched_name = known['names'][min_dist_idx]
+                return jsonify({
+                    "error": f"This face closely matches '{matched_name}' (similarity: {round((1 - min_dist) * 100, 1)}%). "
+                             f"If this is a different person, re-submit with the override option.",
+                    "duplicate": True,
+                    "matched_name": matched_name,
+                    "similarity": round((1 - min_dist) * 100, 1)
+                }), 409
+
+        # O(1) append + atomic header bump (no full-gallery rewrite)
+        open_store().append(name, new_encoding)
 
         conn = get_db()
         try:
@@ -476,13 +495,12 @@ def enroll_student():
         except sqlite3.IntegrityError:
             conn.close()
             return jsonify({"error": "Student already exists in database", "name": name}), 409
+        events.publish_stats(conn)
         conn.close()
 
         try:
             from web_app.video_stream import video_stream
-            if video_stream.is_running:
-                video_stream.face_system.known_names.append(name)
-                video_stream.face_system.known_encodings.append(new_encoding)
+            video_stream.face_system.add_known_face(name, new_encoding)
         except Exception:
             pass
 
@@ -512,36 +530,13 @@ def student_lookup():
         conn.close()
         return jsonify({"error": "No student found with that ID"}), 404
 
-    sid = student['id']
-    total = conn.execute("SELECT COUNT(*) FROM attendance_logs WHERE student_id = ?", (sid,)).fetchone()[0]
-    present = conn.execute(
-        "SELECT COUNT(*) FROM attendance_logs WHERE student_id = ? AND status IN ('Present', 'On Time')",
-        (sid,)).fetchone()[0]
-    late = conn.execute(
-        "SELECT COUNT(*) FROM attendance_logs WHERE student_id = ? AND status = 'Late'",
-        (sid,)).fetchone()[0]
-    absent = conn.execute(
-        "SELECT COUNT(*) FROM attendance_logs WHERE student_id = ? AND status = 'Absent'",
-        (sid,)).fetchone()[0]
-
-    recent = conn.execute("""
-        SELECT timestamp, status, source FROM attendance_logs
-        WHERE student_id = ? ORDER BY timestamp DESC LIMIT 20
-    """, (sid,)).fetchall()
+    stats, recent = _student_summary(conn, student['id'], recent_limit=20)
     conn.close()
 
-    rate = round((present + late) / total * 100, 1) if total > 0 else 0
-
     return jsonify({
         "name": student['name'],
         "student_id": student['student_id'],
-        "stats": {
-            "total_classes": total,
-            "present": present,
-            "late": late,
-            "absent": absent,
-            "attendance_rate": rate
-        },
+        "stats": stats,
         "recent_attendance": [{"timestamp": r['timestamp'], "status": r['status'], "source": r['source']} for r in recent]
     })
 
@@ -550,33 +545,108 @@ def student_lookup():
 #  ATTENDANCE — Read + Manual Entry/Override
 # ══════════════════════════════════════════════════════
 
+def _attendance_row(conn, log_id):
+    """One attendance row in the /api/attendance shape, for /api/events deltas."""
+    row = conn.execute("""
+        SELECT al.id, s.name, al.timestamp, al.log_date, al.status, al.source, al.notes, al.schedule_id
+        FROM attendance_logs al JOIN students s ON al.student_id = s.id
+        WHERE al.id = ?
+    """, (log_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _encode_cursor(row):
+    """Opaque keyset cursor for the (timestamp, id) of the last row on a page."""
+    raw = json.dumps([row['timestamp'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """(timestamp, id) from _encode_cursor(), or None if it is malformed."""
+    try:
+        ts, log_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(ts), int(log_id)
+    except (ValueError, TypeError):
+        return None
+
+
 @api_bp.route('/attendance', methods=['GET'])
 @api_login_required
 def get_attendance():
-    date_filter = request.args.get('date')
-    student_id = request.args.get('student_id')
-    conn = get_db()
-
-    if student_id:
-        rows = conn.execute("""
-            SELECT al.id, s.name, al.timestamp, al.status, al.source, al.notes
-            FROM attendance_logs al JOIN students s ON al.student_id = s.id
-            WHERE al.student_id = ? ORDER BY al.timestamp DESC LIMIT 200
-        """, (student_id,)).fetchall()
-    elif date_filter:
-        rows = conn.execute("""
-            SELECT al.id, s.name, al.timestamp, al.status, al.source, al.notes
-            FROM attendance_logs al JOIN students s ON al.student_id = s.id
-            WHERE DATE(al.timestamp) = ? ORDER BY al.timestamp DESC
-        """, (date_filter,)).fetchall()
+    """
+    Attendance rows, newest first, one page at a time.
+
+    Filters: date (or from/to, inclusive local dates), status (comma list),
+    source, schedule_id (0 = no class), student_id. Paging is keyset on
+    (timestamp, id): pass the returned next_cursor back as ?cursor= for the
+    next page, so deep pages cost the same as the first. ?since_id=N instead
+    returns only rows with id > N, oldest first, for clients that already
+    hold everything up to their last seen id.
+    """
+    args = request.args
+    try:
+        limit = min(max(int(args.get('limit', _common_module.ATTENDANCE_PAGE_SIZE)), 1),
+                    _common_module.ATTENDANCE_PAGE_MAX)
+        since_id = int(args['since_id']) if args.get('since_id') else None
+        schedule_id = int(args['schedule_id']) if args.get('schedule_id') else None
+        student_id = int(args['student_id']) if args.get('student_id') else None
+    except ValueError:
+        return jsonify({"error": "limit, since_id, schedule_id and student_id must be integers"}), 400
+
+    where, params = [], []
+    if args.get('date'):
+        where.append("al.log_date = ?")
+        params.append(args['date'])
+    if args.get('from'):
+        where.append("al.log_date >= ?")
+        params.append(args['from'])
+    if args.get('to'):
+        where.append("al.log_date <= ?")
+        params.append(args['to'])
+    statuses = [s.strip() for s in args.get('status', '').split(',') if s.strip()]
+    if statuses:
+        where.append(f"al.status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if args.get('source'):
+        where.append("al.source = ?")
+        params.append(args['source'])
+    if schedule_id is not None:
+        where.append("IFNULL(al.schedule_id, 0) = ?" if schedule_id == 0 else "al.schedule_id = ?")
+        params.append(schedule_id)
+    if student_id is not None:
+        where.append("al.student_id = ?")
+        params.append(student_id)
+
+    if since_id is not None:
+        where.append("al.id > ?")
+        params.append(since_id)
+        order = "al.id ASC"
     else:
-        rows = conn.execute("""
-            SELECT al.id, s.name, al.timestamp, al.status, al.source, al.notes
-            FROM attendance_logs al JOIN students s ON al.student_id = s.id
-            ORDER BY al.timestamp DESC LIMIT 200
-        """).fetchall()
+        if args.get('cursor'):
+            cursor = _decode_cursor(args['cursor'])
+            if cursor is None:
+                return jsonify({"error": "Invalid cursor"}), 400
+            where.append("(al.timestamp, al.id) < (?, ?)")
+            params.extend(cursor)
+        order = "al.timestamp DESC, al.id DESC"
+
+    conn = get_db()
+    rows = conn.execute(f"""
+        SELECT al.id, s.name, al.timestamp, al.log_date, al.status, al.source, al.notes, al.schedule_id
+        FROM attendance_logs al JOIN students s ON al.student_id = s.id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY {order} LIMIT ?
+    """, params + [limit + 1]).fetchall()
     conn.close()
-    return jsonify([dict(r) for r in rows])
+
+    has_more = len(rows) > limit
+    rows = [dict(r) for r in rows[:limit]]
+    return jsonify({
+        "rows": rows,
+        "has_more": has_more,
+        "next_cursor": _encode_cursor(rows[-1]) if has_more and since_id is None else None,
+        "last_id": max([r['id'] for r in rows], default=since_id),
+    })
 
 
 @api_bp.route('/attendance', methods=['POST'])
@@ -604,7 +674,7 @@ def manual_attendance():
         return jsonify({"error": "Student not found"}), 404
 
     today_statuses = [r[0] for r in conn.execute(
-        "SELECT DISTINCT status FROM attendance_logs WHERE student_id = ? AND DATE(timestamp) = DATE('now', 'localtime')",
+        "SELECT DISTINCT status FROM attendance_logs WHERE student_id = ? AND log_date = DATE('now', 'localtime')",
         (student_id,)
     ).fetchall()]
 
@@ -618,9 +688,11 @@ def manual_attendance():
         conn.close()
         return jsonify({"error": f"Cannot mark as '{status}' — student already has a presence tag ({', '.join(s for s in today_statuses if s in PRESENCE_TAGS)}) today. Override the existing record instead."}), 409
 
-    conn.execute("INSERT INTO attendance_logs (student_id, status, source, notes) VALUES (?, ?, 'manual', ?)",
-                 (student_id, status, notes))
+    cur = conn.execute("INSERT INTO attendance_logs (student_id, status, source, notes) VALUES (?, ?, 'manual', ?)",
+                       (student_id, status, notes))
     conn.commit()
+    events.publish(events.ATTENDANCE, {'action': 'created', 'rows': [_attendance_row(conn, cur.lastrowid)]})
+    events.publish_stats(conn)
     conn.close()
     return jsonify({"success": True}), 201
 
@@ -657,6 +729,8 @@ def override_attendance(log_id):
     conn.execute("UPDATE attendance_logs SET status=?, notes=?, source='override' WHERE id=?",
                  (new_status, data.get('notes', log['notes'] or ''), log_id))
     conn.commit()
+    events.publish(events.ATTENDANCE, {'action': 'updated', 'row': _attendance_row(conn, log_id)})
+    events.publish_stats(conn)
     conn.close()
     return jsonify({"success": True})
 
@@ -671,6 +745,8 @@ def delete_attendance(log_id):
         return jsonify({"error": "Attendance record not found"}), 404
     conn.execute("DELETE FROM attendance_logs WHERE id = ?", (log_id,))
     conn.commit()
+    events.publish(events.ATTENDANCE, {'action': 'deleted', 'id': log_id})
+    events.publish_stats(conn)
     conn.close()
     return jsonify({"success": True})
 
@@ -711,10 +787,12 @@ def add_schedule():
         return jsonify({"error": "End time must be after start time"}), 400
 
     conn = get_db()
-    conn.execute("INSERT INTO class_schedules (day_of_week, start_time, end_time, class_name, teacher_email) VALUES (?, ?, ?, ?, ?)",
-                 (day, start, end, name, teacher_email))
+    cur = conn.execute("INSERT INTO class_schedules (day_of_week, start_time, end_time, class_name, teacher_email) VALUES (?, ?, ?, ?, ?)",
+                       (day, start, end, name, teacher_email))
     conn.commit()
     conn.close()
+    schedule_timeline.invalidate()
+    events.publish(events.SCHEDULE, {'action': 'created', 'id': cur.lastrowid})
     return jsonify({"success": True}), 201
 
 
@@ -739,6 +817,8 @@ def update_schedule(sid):
                   sid))
     conn.commit()
     conn.close()
+    schedule_timeline.invalidate()
+    events.publish(events.SCHEDULE, {'action': 'updated', 'id': sid})
     return jsonify({"success": True})
 
 
@@ -753,6 +833,8 @@ def delete_schedule(sid):
     conn.execute("DELETE FROM class_schedules WHERE id = ?", (sid,))
     conn.commit()
     conn.close()
+    schedule_timeline.invalidate()
+    events.publish(events.SCHEDULE, {'action': 'deleted', 'id': sid})
     return jsonify({"success": True})
 
 
@@ -767,6 +849,27 @@ def system_status():
     return jsonify(video_stream.get_status())
 
 
+@api_bp.route('/events', methods=['GET'])
+@api_login_required
+def event_stream():
+    """
+    Server-Sent Events feed of attendance, status, schedule and stats deltas.
+    Replaces client polling; browsers resume with Last-Event-ID on reconnect.
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    stats = events.bus.latest(events.STATS)
+    if stats is None or stats['date'] != datetime.now().strftime('%Y-%m-%d'):
+        conn = get_db()
+        events.publish_stats(conn)   # Seed (or roll over at midnight) the shared snapshot
+        conn.close()
+    return Response(events.bus.stream(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @api_bp.route('/system', methods=['POST'])
 @api_login_required
 def system_control():
@@ -918,22 +1021,9 @@ def submit_report():
 @api_login_required
 def get_stats():
     conn = get_db()
-    today = datetime.now().strftime('%Y-%m-%d')
-    total_students = conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
-    present_today = conn.execute("""
-        SELECT COUNT(DISTINCT student_id) FROM attendance_logs
-        WHERE DATE(timestamp) = ? AND status IN ('Present', 'On Time', 'Late')
-    """, (today,)).fetchone()[0]
-    absent_today = total_students - present_today
-    total_logs = conn.execute("SELECT COUNT(*) FROM attendance_logs").fetchone()[0]
+    stats = events.stats_snapshot(conn)
     conn.close()
-    return jsonify({
-        "total_students": total_students,
-        "present_today": present_today,
-        "absent_today": absent_today,
-        "total_logs": total_logs,
-        "date": today
-    })
+    return jsonify(stats)
 
 
 @api_bp.route('/stats/chart', methods=['GET'])
@@ -951,17 +1041,27 @@ def chart_data():
     PRESENT_STATUSES = ('Present', 'On Time', 'Early Leave', 'Permitted', 'Excused')
     LATE_STATUSES = ('Late',)
 
-    for i in range(days - 1, -1, -1):
-        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+    # One range read of the trigger-maintained daily summary (O(days × students))
+    first = datetime.now().date() - timedelta(days=days - 1)
+    statuses = PRESENT_STATUSES + LATE_STATUSES
+    rows = conn.execute("""
+        SELECT date,
+               COUNT(DISTINCT CASE WHEN best_status IN ({present}) THEN student_id END),
+               COUNT(DISTINCT CASE WHEN best_status IN ({late}) THEN student_id END)
+        FROM daily_attendance_summary
+        WHERE date >= ? AND best_status IN ({all})
+        GROUP BY date
+    """.format(present=','.join('?' * len(PRESENT_STATUSES)),
+               late=','.join('?' * len(LATE_STATUSES)),
+               all=','.join('?' * len(statuses))),
+        (*PRESENT_STATUSES, *LATE_STATUSES, first.isoformat(), *statuses)).fetchall()
+    counts = {r[0]: (r[1], r[2]) for r in rows}
+
+    # Days without any log still get a zero bar
+    for i in range(days):
+        date = (first + timedelta(days=i)).isoformat()
+        present, late = counts.get(date, (0, 0))
         labels.append(date)
-        present = conn.execute("""
-            SELECT COUNT(DISTINCT student_id) FROM attendance_logs
-            WHERE DATE(timestamp) = ? AND status IN ({})
-        """.format(','.join('?' * len(PRESENT_STATUSES))), (date, *PRESENT_STATUSES)).fetchone()[0]
-        late = conn.execute("""
-            SELECT COUNT(DISTINCT student_id) FROM attendance_logs
-            WHERE DATE(timestamp) = ? AND status IN ({})
-        """.format(','.join('?' * len(LATE_STATUSES))), (date, *LATE_STATUSES)).fetchone()[0]
         present_data.append(present)
         late_data.append(late)
         absent_data.append(max(0, total_students - present - late))
@@ -976,66 +1076,110 @@ def chart_data():
 #  EXPORT
 # ══════════════════════════════════════════════════════
 
+EXPORT_HEADERS = ["Student Name", "Student ID", "Timestamp", "Status", "Source", "Notes"]
+EXPORT_WIDTHS = [24, 14, 21, 13, 9, 40]
+
+
 @api_bp.route('/export', methods=['GET'])
 @api_login_required
 def export_data():
+    """
+    Attendance as CSV or XLSX, with no row cap. Rows are read from the
+    cursor in EXPORT_FETCH_ROWS batches: CSV is streamed to the client as it
+    is produced, XLSX is written by openpyxl in write-only mode into a
+    spooled temp file, so memory stays flat for any date range.
+    format=parquet|arrow|npz returns a columnar file (web_app/analytics_export.py).
+    """
     fmt = request.args.get('format', 'xlsx')
     date_filter = request.args.get('date')
     date_from = request.args.get('from')
     date_to = request.args.get('to')
-    conn = get_db()
+
+    from web_app import analytics_export
+    if fmt in analytics_export.FORMATS:
+        since, until = (date_filter, date_filter) if date_filter else (date_from, date_to)
+        label = f"{date_from}_to_{date_to}" if date_from and date_to else (date_filter or "all")
+        return _export_columnar(analytics_export, fmt, since, until, label)
 
     if date_from and date_to:
-        rows = conn.execute("""
-            SELECT s.name, s.student_id as sid, al.timestamp, al.status, al.source, al.notes
-            FROM attendance_logs al JOIN students s ON al.student_id = s.id
-            WHERE DATE(al.timestamp) BETWEEN ? AND ? ORDER BY al.timestamp
-        """, (date_from, date_to)).fetchall()
+        where, params, order = "WHERE al.log_date BETWEEN ? AND ?", (date_from, date_to), "ASC"
         date_label = f"{date_from}_to_{date_to}"
     elif date_filter:
-        rows = conn.execute("""
-            SELECT s.name, s.student_id as sid, al.timestamp, al.status, al.source, al.notes
-            FROM attendance_logs al JOIN students s ON al.student_id = s.id
-            WHERE DATE(al.timestamp) = ? ORDER BY al.timestamp
-        """, (date_filter,)).fetchall()
+        where, params, order = "WHERE al.log_date = ?", (date_filter,), "ASC"
         date_label = date_filter
     else:
-        rows = conn.execute("""
-            SELECT s.name, s.student_id as sid, al.timestamp, al.status, al.source, al.notes
-            FROM attendance_logs al JOIN students s ON al.student_id = s.id
-            ORDER BY al.timestamp DESC LIMIT 1000
-        """).fetchall()
+        where, params, order = "", (), "DESC"
         date_label = "all"
-    conn.close()
-
+    sql = f"""
+        SELECT s.name, s.student_id as sid, al.timestamp, al.status, al.source, al.notes
+        FROM attendance_logs al JOIN students s ON al.student_id = s.id
+        {where} ORDER BY al.timestamp {order}, al.id {order}
+    """
+    rows = _export_rows(current_app.config['DB_PATH'], sql, params)
     return _export_csv(rows, date_label) if fmt == 'csv' else _export_xlsx(rows, date_label)
 
 
+def _export_rows(db_path, sql, params):
+    """
+    Generator of export rows as plain lists. It opens its own connection so a
+    streamed response can keep reading after the request handler returns.
+    """
+    conn = db.connect(db_path)
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(_common_module.EXPORT_FETCH_ROWS)
+            if not batch:
+                break
+            for name, sid, timestamp, status, source, notes in batch:
+                yield [name, sid or '', timestamp, status, source, notes or '']
+    finally:
+        conn.close()
+
+
+def _export_columnar(analytics_export, fmt, since, until, date_label):
+    import tempfile
+    fmt = analytics_export.resolve_format(fmt)
+    output = tempfile.TemporaryFile()
+    conn = db.connect(current_app.config['DB_PATH'])
+    try:
+        analytics_export.write(conn, output, fmt, since, until)
+    finally:
+        conn.close()
+    output.seek(0)
+    return send_file(output, download_name=f"attendance_{date_label}{analytics_export.FORMATS[fmt]}",
+                     as_attachment=True, mimetype=analytics_export.MIMETYPES[fmt])
+
+
 def _export_xlsx(rows, date_label):
     try:
         from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, PatternFill, Alignment
     except ImportError:
+        rows.close()
         return jsonify({"error": "openpyxl not installed"}), 500
+    import tempfile
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Attendance"
+    # Write-only: rows go straight to a temp file, but widths and styles must be set up front
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Attendance")
+    for letter, width in zip("ABCDEF", EXPORT_WIDTHS):
+        ws.column_dimensions[letter].width = width
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="6C63FF", end_color="6C63FF", fill_type="solid")
-    headers = ["Student Name", "Student ID", "Timestamp", "Status", "Source", "Notes"]
-    ws.append(headers)
-    for cell in ws[1]:
+    header = []
+    for title in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=title)
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = Alignment(horizontal="center")
+        header.append(cell)
+    ws.append(header)
     for row in rows:
-        ws.append([row['name'], row['sid'] or '', row['timestamp'],
-                   row['status'], row['source'], row['notes'] or ''])
-    for col in ws.columns:
-        max_len = max(len(str(cell.value or '')) for cell in col)
-        ws.column_dimensions[col[0].column_letter].width = min(max_len + 2, 40)
-    output = BytesIO()
+        ws.append(row)
+
+    output = tempfile.SpooledTemporaryFile(max_size=_common_module.EXPORT_SPOOL_BYTES)
     wb.save(output)
     output.seek(0)
     return send_file(output, download_name=f"attendance_{date_label}.xlsx",
@@ -1046,16 +1190,25 @@ def _export_xlsx(rows, date_label):
 def _export_csv(rows, date_label):
     import csv
     from io import StringIO
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Student Name", "Student ID", "Timestamp", "Status", "Source", "Notes"])
-    for row in rows:
-        writer.writerow([row['name'], row['sid'] or '', row['timestamp'],
-                         row['status'], row['source'], row['notes'] or ''])
-    csv_bytes = BytesIO(output.getvalue().encode('utf-8'))
-    csv_bytes.seek(0)
-    return send_file(csv_bytes, download_name=f"attendance_{date_label}.csv",
-                     as_attachment=True, mimetype='text/csv')
+
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_HEADERS)
+        try:
+            for n, row in enumerate(rows, 1):
+                writer.writerow(row)
+                if n % _common_module.EXPORT_FETCH_ROWS == 0:
+                    yield buffer.getvalue().encode('utf-8')
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode('utf-8')
+        finally:
+            rows.close()   # Client went away: hand the connection back now, not at GC
+
+    return Response(generate(), mimetype='text/csv', headers={
+        "Content-Disposition": f"attachment; filename=attendance_{date_label}.csv",
+    })
 
 
 
@@ -1207,8 +1360,25 @@ def export_db():
     db_path = current_app.config['DB_PATH']
     if not os.path.exists(db_path):
         return jsonify({"error": "Database not found"}), 404
+    # In WAL mode recent commits may still live in the -wal file: take a
+    # consistent snapshot through the backup API instead of copying the file
+    import tempfile
+    fd, snapshot = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = get_db()
+        dest = sqlite3.connect(snapshot)
+        try:
+            conn.backup(dest)
+        finally:
+            dest.close()
+            conn.close()
+        with open(snapshot, 'rb') as f:
+            data = BytesIO(f.read())
+    finally:
+        os.remove(snapshot)
     return send_file(
-        db_path,
+        data,
         as_attachment=True,
         download_name=f'smartpresence_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db',
         mimetype='application/x-sqlite3'
@@ -1362,7 +1532,7 @@ def update_settings():
     ALLOWED_KEYS = {
         'DETECTOR_MODEL', 'TOLERANCE', 'DETECTION_SCALE', 
         'LATE_THRESHOLD', 'DISAPPEAR_THRESHOLD', 'RECHECK_INTERVAL',
-        'SYSTEM_MODE', 'FRAME_SKIP'
+        'SYSTEM_MODE', 'FRAME_SKIP', 'MATCH_INDEX'
     }
     
     for key, val in data.items():
@@ -1391,11 +1561,18 @@ def update_settings():
                 errors.append(f"{key} must be 'auto', 'force_on', or 'force_off'")
                 continue
 
+        if key == 'MATCH_INDEX':
+            if val not in ['auto', 'exact', 'ivf']:
+                errors.append(f"{key} must be 'auto', 'exact', or 'ivf'")
+                continue
+
         if SettingsManager.set(key, val):
             success_count += 1
         else:
             errors.append(f"Failed to save {key}")
 
+    if success_count:
+        SettingsManager.publish()  # One new snapshot for the whole batch
     common.get_logger('api').info(f"Settings updated: {success_count} keys changed. Errors: {errors}")
     
     return jsonify({
@@ -1464,7 +1641,9 @@ def debug_info():
             "students": student_count,
             "attendance_logs": log_count,
             "users": user_count,
-            "size_kb": db_size
+            "size_kb": db_size,
+            "pool": db.metrics(),
+            "mail": mail_queue.get_queue(current_app.config['DB_PATH']).metrics()
         },
         "ai_engine": {
             "running": video_stream.is_running,
@@ -1492,10 +1671,17 @@ def email_test():
 @api_bp.route('/email/class-report/<int:schedule_id>', methods=['POST'])
 @api_login_required
 def email_class_report(schedule_id):
-    """Send per-class attendance report: individual emails to students, summary to teacher."""
-    from web_app.email_service import send_student_report, send_teacher_summary, send_error_report
+    """
+    Queue the per-class attendance report: individual emails to students, a
+    summary to the teacher. Returns 202 with a job id for /api/email/jobs/<id>.
+    """
+    from web_app.email_service import config_error, student_report, teacher_summary
     from datetime import datetime, timedelta
 
+    error = config_error()
+    if error:
+        return jsonify({"error": error}), 503
+
     conn = get_db()
 
     # Get the schedule
@@ -1508,12 +1694,12 @@ def email_class_report(schedule_id):
     teacher_email = sched['teacher_email'] if 'teacher_email' in sched.keys() else ''
     today = datetime.now().strftime('%Y-%m-%d')
 
-    # Get all attendance logs for today linked to this schedule
+    # Best status per student for today's session of this class
     logs = conn.execute("""
-        SELECT al.*, s.name, s.email as student_email, s.student_id as sid
-        FROM attendance_logs al
-        JOIN students s ON al.student_id = s.id
-        WHERE al.schedule_id = ? AND date(al.timestamp) = ?
+        SELECT ds.student_id, ds.best_status AS status, s.name, s.email as student_email, s.student_id as sid
+        FROM daily_attendance_summary ds
+        JOIN students s ON ds.student_id = s.id
+        WHERE ds.schedule_id = ? AND ds.date = ?
     """, (schedule_id, today)).fetchall()
 
     # Get ALL enrolled students to determine who's absent
@@ -1542,42 +1728,32 @@ def email_class_report(schedule_id):
             absent_list.append(s['name'])
             student_statuses[s['id']] = (s['name'], s['email'], 'Absent')
 
-    # Send individual student emails
-    sent_count = 0
-    fail_count = 0
-    errors = []
-
-    for sid, (name, email, status) in student_statuses.items():
-        if email:
-            ok, err = send_student_report(email, name, class_name, status, today)
-            if ok:
-                sent_count += 1
-            else:
-                fail_count += 1
-                errors.append(f"{name}: {err}")
-
-    # Send teacher summary
-    teacher_sent = False
+    # Queue one email per student plus the teacher summary; senders deliver in the background
+    messages = [('student', email) + student_report(name, class_name, status, today)
+                for name, email, status in student_statuses.values() if email]
+    students_queued = len(messages)
     if teacher_email:
-        ok, err = send_teacher_summary(teacher_email, class_name, today, present_list, absent_list)
-        teacher_sent = ok
-        if not ok:
-            errors.append(f"Teacher: {err}")
-
-    # If any errors, send error report to admin
-    if errors:
-        send_error_report(
-            f"Email Report Errors — {class_name}",
-            '\n'.join(errors)
-        )
-
+        messages.append(('teacher', teacher_email) + teacher_summary(class_name, today, present_list, absent_list))
+    job_id = None
+    if messages:
+        job_id = mail_queue.get_queue(current_app.config['DB_PATH']).enqueue(messages, label=class_name)
     return jsonify({
         "success": True,
+        "job_id": job_id,
         "class_name": class_name,
         "date": today,
-        "students_emailed": sent_count,
-        "students_failed": fail_count,
-        "teacher_emailed": teacher_sent,
+        "students_queued": students_queued,
+        "teacher_queued": bool(teacher_email),
         "present": len(present_list),
         "absent": len(absent_list)
-    })
+    }), 202 if job_id else 200
+
+
+@api_bp.route('/email/jobs/<job_id>', methods=['GET'])
+@api_login_required
+def email_job_status(job_id):
+    """Delivery progress of a queued email job (see web_app/mail_queue.py)."""
+    status = mail_queue.get_queue(current_app.config['DB_PATH']).job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
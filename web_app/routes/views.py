@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, Response, session, redirect, url_for, request
 from functools import wraps
 from web_app.video_stream import video_stream
+from web_app.stream_hub import PROFILES, DEFAULT_PROFILE
 
 views_bp = Blueprint('views', __name__)
 
@@ -116,5 +117,9 @@ def debug_page():
 @views_bp.route('/video_feed')
 @login_required
 def video_feed():
-    return Response(video_stream.generate_frames(),
+    profile = request.args.get('profile', DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        return Response(f"Unknown profile. Use one of: {', '.join(PROFILES)}", status=400)
+    adaptive = request.args.get('adaptive', '').lower() in ('1', 'true', 'yes', 'on')
+    return Response(video_stream.generate_frames(profile=profile, adaptive=adaptive),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
@@ -10,10 +10,21 @@ document.addEventListener('DOMContentLoaded', () => {
         loadStats();
         loadAttendance();
 
-        setInterval(() => {
-            loadStats();
-            loadAttendance();
-        }, 5000);
+        if (liveEvents) {
+            // Pushed from /api/events instead of polling every 5 s
+            onLiveEvent('stats', renderStats);
+            onLiveEvent('attendance', applyAttendanceEvent);
+            onLiveEvent('reset', () => {
+                loadStats();
+                loadAttendance(currentDate);
+            });
+        } else {
+            // Only rows newer than the last one on screen cross the wire
+            setInterval(() => {
+                loadStats();
+                loadNewAttendance();
+            }, 5000);
+        }
     }
 
     // Date filter
@@ -36,71 +47,138 @@ function loadStats() {
         if (!r) return;
         return r.json();
     }).then(data => {
-        if (!data) return;
-        setTextSafe('totalStudents', data.total_students);
-        setTextSafe('presentToday', data.present_today);
-        setTextSafe('absentToday', data.absent_today);
-        setTextSafe('totalLogs', data.total_logs);
+        if (data) renderStats(data);
     }).catch(() => { });
 }
 
+function renderStats(data) {
+    setTextSafe('totalStudents', data.total_students);
+    setTextSafe('presentToday', data.present_today);
+    setTextSafe('absentToday', data.absent_today);
+    setTextSafe('totalLogs', data.total_logs);
+}
+
 
 // ── Load Attendance Table ────────────────────
 
+let attendanceRows = [];
+let currentDate = null;
+let nextCursor = null;   // Keyset cursor for the next (older) page
+let lastId = 0;          // Newest attendance id seen, for ?since_id=
+
+const statusColors = {
+    'Present': 'bg-present',
+    'On Time': 'bg-ontime',
+    'Late': 'bg-late',
+    'Absent': 'bg-absent',
+    'Disappeared': 'bg-disappeared',
+    'Early Leave': 'bg-earlyleave',
+    'Permitted': 'bg-permitted',
+    'Excused': 'bg-excused'
+};
+
+function attendanceUrl(params) {
+    const query = new URLSearchParams(params);
+    if (currentDate) query.set('date', currentDate);
+    return '/api/attendance?' + query.toString();
+}
+
+function fetchAttendance(params) {
+    return safeFetch(attendanceUrl(params)).then(r => r ? r.json() : null);
+}
+
+function trackLastId(rows) {
+    rows.forEach(r => { if (r.id > lastId) lastId = r.id; });
+}
+
 function loadAttendance(date) {
-    let url = '/api/attendance';
-    if (date) url += '?date=' + date;
+    currentDate = date || null;
+    fetchAttendance({}).then(data => {
+        if (!data) return;
+        attendanceRows = data.rows;
+        nextCursor = data.next_cursor;
+        lastId = 0;
+        trackLastId(data.rows);
+        renderAttendance();
+    }).catch(() => { });
+}
 
-    safeFetch(url).then(r => {
-        if (!r) return;
-        return r.json();
-    }).then(data => {
+function loadMoreAttendance() {
+    if (!nextCursor) return;
+    fetchAttendance({ cursor: nextCursor }).then(data => {
         if (!data) return;
-        const tbody = document.getElementById('attendanceTable');
-        if (!tbody) return;
+        const seen = new Set(attendanceRows.map(r => r.id));
+        attendanceRows = attendanceRows.concat(data.rows.filter(r => !seen.has(r.id)));
+        nextCursor = data.next_cursor;
+        renderAttendance();
+    }).catch(() => { });
+}
 
-        if (data.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="6" class="text-center text-muted py-4">No records found</td></tr>';
-            return;
-        }
+// Polling fallback: fetch only rows added since the newest one on screen
+function loadNewAttendance() {
+    fetchAttendance({ since_id: lastId }).then(data => {
+        if (!data || !data.rows.length) return;
+        applyAttendanceEvent({ action: 'created', rows: data.rows });
+    }).catch(() => { });
+}
+
+// Apply a pushed delta ({action, rows | row | id}) to the rows on screen
+function applyAttendanceEvent(event) {
+    if (event.action === 'created') {
+        const seen = new Set(attendanceRows.map(r => r.id));
+        const rows = event.rows.filter(r => r && !seen.has(r.id) && (!currentDate || r.log_date === currentDate));
+        trackLastId(event.rows.filter(r => r));
+        if (!rows.length) return;
+        attendanceRows = rows.reverse().concat(attendanceRows);
+    } else if (event.action === 'updated') {
+        const i = attendanceRows.findIndex(r => event.row && r.id === event.row.id);
+        if (i < 0) return;
+        attendanceRows[i] = event.row;
+    } else if (event.action === 'deleted') {
+        const before = attendanceRows.length;
+        attendanceRows = attendanceRows.filter(r => r.id !== event.id);
+        if (attendanceRows.length === before) return;
+    }
+    renderAttendance();
+}
+
+function renderAttendance() {
+    const tbody = document.getElementById('attendanceTable');
+    if (!tbody) return;
+
+    const more = document.getElementById('loadMoreAttendance');
+    if (more) more.classList.toggle('d-none', !nextCursor);
 
-        const statusColors = {
-            'Present': 'bg-present',
-            'On Time': 'bg-ontime',
-            'Late': 'bg-late',
-            'Absent': 'bg-absent',
-            'Disappeared': 'bg-disappeared',
-            'Early Leave': 'bg-earlyleave',
-            'Permitted': 'bg-permitted',
-            'Excused': 'bg-excused'
-        };
-
-        tbody.innerHTML = data.map((row, i) => {
-            const colorClass = statusColors[row.status] || 'bg-secondary';
-            const time = new Date(row.timestamp).toLocaleString();
-            const sourceIcon = row.source === 'ai' ? '<i class="bi bi-robot text-info"></i>' :
-                row.source === 'manual' ? '<i class="bi bi-pencil text-warning"></i>' :
-                    '<i class="bi bi-arrow-repeat text-danger"></i>';
-            return `
-                <tr>
-                    <td>${i + 1}</td>
-                    <td><strong>${row.name}</strong></td>
-                    <td class="text-muted small">${time}</td>
-                    <td><span class="badge ${colorClass}">${row.status}</span></td>
-                    <td>${sourceIcon}</td>
-                    <td>
-                        <button class="btn btn-outline-light btn-xs" onclick="openOverride(${row.id}, '${row.status}', '${(row.notes || '').replace(/'/g, "\\'")}')"
+    if (attendanceRows.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="6" class="text-center text-muted py-4">No records found</td></tr>';
+        return;
+    }
+
+    tbody.innerHTML = attendanceRows.map((row, i) => {
+        const colorClass = statusColors[row.status] || 'bg-secondary';
+        const time = new Date(row.timestamp).toLocaleString();
+        const sourceIcon = row.source === 'ai' ? '<i class="bi bi-robot text-info"></i>' :
+            row.source === 'manual' ? '<i class="bi bi-pencil text-warning"></i>' :
+                '<i class="bi bi-arrow-repeat text-danger"></i>';
+        return `
+            <tr>
+                <td>${i + 1}</td>
+                <td><strong>${row.name}</strong></td>
+                <td class="text-muted small">${time}</td>
+                <td><span class="badge ${colorClass}">${row.status}</span></td>
+                <td>${sourceIcon}</td>
+                <td>
+                    <button class="btn btn-outline-light btn-xs" onclick="openOverride(${row.id}, '${row.status}', '${(row.notes || '').replace(/'/g, "\\'")}')"
 >
-                            <i class="bi bi-pencil-square"></i>
-                        </button>
-                        <button class="btn btn-outline-danger btn-xs" onclick="deleteLog(${row.id})">
-                            <i class="bi bi-trash"></i>
-                        </button>
-                    </td>
-                </tr>
-            `;
-        }).join('');
-    }).catch(() => { });
+                        <i class="bi bi-pencil-square"></i>
+                    </button>
+                    <button class="btn btn-outline-danger btn-xs" onclick="deleteLog(${row.id})">
+                        <i class="bi bi-trash"></i>
+                    </button>
+                </td>
+            </tr>
+        `;
+    }).join('');
 }
 
 
@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from ai_module import common
+
+log = common.get_logger('stream_hub')
+
+# Stream profile: output width (None = native), JPEG quality, max frames per second
+Profile = namedtuple('Profile', ['width', 'quality', 'max_fps'])
+
+PROFILES = {
+    'thumb': Profile(320, 50, 5),
+    'sd':    Profile(854, 70, 15),
+    'hd':    Profile(None, 80, 30),
+}
+PROFILE_ORDER = ['thumb', 'sd', 'hd']   # Lowest → highest, used by the bandwidth estimator
+DEFAULT_PROFILE = 'hd'
+
+
+class BandwidthEstimator:
+    """
+    Per-client throughput estimate for adaptive streaming.
+
+    The time a generator spends suspended in `yield` is how long the server
+    took to push the chunk into the socket, so bytes / that time tracks the
+    client's link once its buffers are full. When the link cannot carry the
+    current profile at its frame rate the client steps down a profile; on the
+    lowest profile it is throttled to what the link sustains instead.
+    """
+
+    def __init__(self, profile, alpha=0.3):
+        self.ceiling = PROFILE_ORDER.index(profile)
+        self.level = self.ceiling
+        self.alpha = alpha
+        self.bytes_per_sec = None
+        self.frame_bytes = None
+        self.fps = PROFILES[profile].max_fps
+
+    @property
+    def profile(self):
+        return PROFILE_ORDER[self.level]
+
+    def record(self, nbytes, seconds):
+        rate = nbytes / max(seconds, 1e-3)
+        a = self.alpha
+        self.bytes_per_sec = rate if self.bytes_per_sec is None else (1 - a) * self.bytes_per_sec + a * rate
+        self.frame_bytes = nbytes if self.frame_bytes is None else (1 - a) * self.frame_bytes + a * nbytes
+        self._adapt()
+
+    def _adapt(self):
+        sustainable = self.bytes_per_sec / self.frame_bytes
+        wanted = PROFILES[self.profile].max_fps
+        if sustainable < 0.8 * wanted and self.level > 0:
+            self.level -= 1
+            self.frame_bytes = None          # Re-learn the size at the new profile
+            self.fps = PROFILES[self.profile].max_fps
+        elif sustainable > 3 * wanted and self.level < self.ceiling:
+            self.level += 1
+            self.frame_bytes = None
+            self.fps = PROFILES[self.profile].max_fps
+        else:
+            self.fps = max(1.0, min(wanted, sustainable))
+
+
+class BroadcastHub:
+    """
+    Fan-out of annotated frames to every /video_feed client.
+
+    The capture loop publishes each frame with a sequence number. For every
+    profile the resize + JPEG encode of a sequence happens at most once — by
+    whichever client asks for it first — and is shared by all others. Clients
+    block on a Condition until a newer sequence exists and then jump straight
+    to the latest one, so a slow client simply skips frames instead of
+    building a backlog, and never delays encoding for anyone else.
+    """
+
+    def __init__(self, profiles=None):
+        self.profiles = profiles or PROFILES
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._generation = 0     # Bumped by close() to wake waiting clients
+
+        self._encode_locks = {name: threading.Lock() for name in self.profiles}
+        self._encoded = {}       # profile -> (seq, jpeg bytes)
+
+        self.clients = 0
+        self.encodes = 0
+        self.sent = 0
+        self.skipped = 0
+
+    # ── Producer ──────────────────────────────────────
+
+    def publish(self, frame):
+        """Publish a new read-only annotated BGR frame and wake all clients."""
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """Wake every client so its generator can exit."""
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+
+    # ── Consumers ─────────────────────────────────────
+
+    def wait_next(self, last_seq, timeout=1.0):
+        """
+        Block until a frame newer than `last_seq` is published.
+        Returns (seq, frame), or (last_seq, None) on timeout / close.
+        """
+        with self._cond:
+            generation = self._generation
+            self._cond.wait_for(lambda: self._seq > last_seq or self._generation != generation, timeout)
+            if self._seq <= last_seq or self._frame is None:
+                return last_seq, None
+            return self._seq, self._frame
+
+    def jpeg(self, seq, frame, profile=DEFAULT_PROFILE):
+        """JPEG bytes for frame `seq` in `profile`, encoded only by the first caller."""
+        with self._encode_locks[profile]:
+            cached = self._encoded.get(profile)
+            if cached and cached[0] == seq:
+                return cached[1]
+            width, quality, _ = self.profiles[profile]
+            if width and frame.shape[1] > width:
+                height = int(frame.shape[0] * width / frame.shape[1])
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                return None
+            data = buffer.tobytes()
+            self._encoded[profile] = (seq, data)
+            self.encodes += 1
+            return data
+
+    def stream(self, is_running, profile=DEFAULT_PROFILE, adaptive=False):
+        """
+        MJPEG multipart generator for one client; ends when `is_running()` is
+        False. With `adaptive`, a BandwidthEstimator may step the client down
+        from `profile` and cap its frame rate.
+        """
+        estimator = BandwidthEstimator(profile) if adaptive else None
+        with self._cond:
+            self.clients += 1
+        last_seq, next_due = 0, 0.0
+        try:
+            while is_running():
+                seq, frame = self.wait_next(last_seq)
+                if frame is None:
+                    continue
+                current = estimator.profile if estimator else profile
+                fps = estimator.fps if estimator else self.profiles[current].max_fps
+                now = time.monotonic()
+                if last_seq and seq > last_seq + 1:
+                    self.skipped += seq - last_seq - 1
+                last_seq = seq
+                if now < next_due:
+                    self.skipped += 1    # Over this client's frame rate: drop
+                    continue
+                next_due = now + 1.0 / fps
+
+                data = self.jpeg(seq, frame, current)
+                if data is None:
+                    continue
+                self.sent += 1
+                sent_at = time.monotonic()
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n')
+                if estimator:
+                    estimator.record(len(data), time.monotonic() - sent_at)
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def metrics(self):
+        return {
+            'clients': self.clients,
+            'frames': self._seq,
+            'encodes': self.encodes,
+            'sent': self.sent,
+            'skipped': self.skipped,
+        }
@@ -8,6 +8,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from ai_module import common
 from ai_module.recognition_system import FaceSystemThreaded
 from ai_module.settings import SettingsManager
+from ai_module import events
+from ai_module import db
+from web_app.stream_hub import BroadcastHub
 
 log = common.get_logger('stream')
 
@@ -21,6 +24,7 @@ class VideoStream:
     def __init__(self):
         self.face_system = FaceSystemThreaded()
         self.output_frame = None
+        self.hub = BroadcastHub()
         self.lock = threading.Lock()
         self._stop_event = threading.Event()
         self.is_running = False
@@ -44,6 +48,7 @@ class VideoStream:
         capture_thread.start()
 
         self._threads = [ai_thread, capture_thread]
+        self.face_system.publish_status(self.face_system.get_active_schedule())
         log.info("Video stream started.")
 
     def stop(self):
@@ -53,6 +58,10 @@ class VideoStream:
         self.is_running = False
         self.face_system.is_running = False
         self._stop_event.set()
+        # Commit any queued attendance before the system is torn down
+        self.face_system.writer.stop(flush=True)
+        self.face_system.tracker_pool.stop()
+        self.hub.close()
 
         if self._cap and self._cap.isOpened():
             try:
@@ -62,6 +71,7 @@ class VideoStream:
             self._cap = None
 
         self._threads.clear()
+        self.face_system.publish_status(None)
         log.info("Video stream stopped.")
 
     def restart(self):
@@ -80,15 +90,25 @@ class VideoStream:
         except Exception:
             schedule = None
 
+        settings = SettingsManager.snapshot()
         return {
             'ai_running': self.is_running,
-            'system_mode': SettingsManager.get('SYSTEM_MODE', default='auto'),
+            'system_mode': settings.system_mode,
             'active_schedule': schedule,
             'students_loaded': len(self.face_system.known_names),
             'session_logged': len(self.face_system.session_logged),
-            'detection_scale': SettingsManager.get('DETECTION_SCALE', type_cast=float),
-            'tolerance': SettingsManager.get('TOLERANCE', type_cast=float),
-            'detector': SettingsManager.get('DETECTOR_MODEL', default='dlib')
+            'detection_scale': settings.detection_scale,
+            'tolerance': settings.tolerance,
+            'detector': settings.detector_model,
+            'settings_version': settings.version,
+            'writer': self.face_system.writer.metrics(),
+            'cadence': self.face_system.cadence.metrics(),
+            'motion': self.face_system.motion_gate.metrics(),
+            'tracks': self.face_system.tracks.metrics(),
+            'tracker_pool': self.face_system.tracker_pool.metrics(),
+            'stream': self.hub.metrics(),
+            'events': events.bus.metrics(),
+            'db': db.metrics()
         }
 
     def _safe_ai_loop(self):
@@ -185,40 +205,28 @@ class VideoStream:
             consecutive_failures = 0
             frame = cv2.flip(frame, 1)
 
-            # Update shared frame for AI
-            with self.face_system.lock:
-                self.face_system.latest_frame = frame
-                current_trackers = list(self.face_system.trackers)
-                current_names = list(self.face_system.tracking_names)
-
-            # Draw tracker annotations (with crash protection)
-            for i, tracker in enumerate(current_trackers):
-                try:
-                    tracker.update(frame)
-                    pos = tracker.get_position()
-                    left = int(pos.left())
-                    top = int(pos.top())
-                    right = int(pos.right())
-                    bottom = int(pos.bottom())
-                    name = current_names[i] if i < len(current_names) else "?"
-                    color = common.COLOR_GREEN if name != "Unknown" else common.COLOR_RED
-                    cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                    cv2.putText(frame, name, (left, top - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                except Exception:
-                    # Tracker can fail on edge-of-frame or corrupted data — skip silently
-                    pass
+            # Share the frame read-only with AI / tracker pool; annotate the one copy
+            shared, tracked = self.face_system.submit_frame(frame)
+            frame = shared.annotated()
+
+            # Draw tracker annotations (positions come from the tracker pool)
+            for (top, right, bottom, left), name in tracked:
+                color = common.COLOR_GREEN if name != "Unknown" else common.COLOR_RED
+                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                cv2.putText(frame, name, (left, top - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
             # Status overlay
-            from ai_module.settings import SettingsManager
-            scale = SettingsManager.get('DETECTION_SCALE', type_cast=float)
-            mode = SettingsManager.get('SYSTEM_MODE', default='auto')
+            settings = SettingsManager.snapshot()
+            scale, mode = settings.detection_scale, settings.system_mode
             mode_label = {'auto': 'AUTO', 'force_on': 'ON', 'force_off': 'OFF'}.get(mode, mode.upper())
             cv2.putText(frame, f"Scale: {scale}x | Mode: {mode_label}", (10, 20),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
 
+            frame.flags.writeable = False   # Published: the hub encodes it without copying
             with self.lock:
-                self.output_frame = frame.copy()
+                self.output_frame = frame
+            self.hub.publish(frame)
 
             time.sleep(0.03)
 
@@ -230,26 +238,9 @@ class VideoStream:
                 pass
             self._cap = None
 
-    def generate_frames(self):
-        """Generator that yields MJPEG frames for Flask streaming."""
-        while self.is_running:
-            with self.lock:
-                if self.output_frame is None:
-                    time.sleep(0.01)
-                    continue
-                frame = self.output_frame.copy()
-
-            try:
-                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                if not ret:
-                    continue
-            except Exception:
-                continue
-
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-
-            time.sleep(0.033)
+    def generate_frames(self, profile='hd', adaptive=False):
+        """Generator that yields MJPEG frames for Flask streaming (shared encoder)."""
+        return self.hub.stream(lambda: self.is_running, profile=profile, adaptive=adaptive)
 
 
 # Singleton instance